@@ -0,0 +1,102 @@
+"""
+种子文件下载基准测试：调整前RequestUtils不传会话时每次请求新建连接，与SessionPool共用会话的吞吐量及建立连接次数对比
+
+使用本地HTTP服务模拟站点，返回随机内容的种子文件；指定证书时使用HTTPS，建立连接次数即TLS握手次数
+
+运行：python benchmarks/bench_http_session.py --requests 500 --threads 8
+      python benchmarks/bench_http_session.py --certfile cert.pem --keyfile key.pem
+"""
+import argparse
+import os
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from hubstation.utils.http_utils import RequestUtils, SessionPool
+
+
+class TorrentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和内容分开写入，长连接下需关闭Nagle算法，避免与延迟确认叠加产生40ms等待
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        body = self.server.torrent
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-bittorrent")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(size, certfile=None, keyfile=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TorrentHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    pieces = os.urandom(size)
+    server.torrent = b"d4:infod6:lengthi%de4:name4:test6:pieces%d:" % (size * 1000, len(pieces)) + pieces + b"ee"
+    scheme = "http"
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_port}"
+
+
+def legacy_get(url):
+    """
+    调整前RequestUtils.get_res不传会话时的请求方式
+    """
+    return requests.get(url, verify=False, headers={"User-Agent": "bench"}, timeout=20)
+
+
+def pooled_get(url):
+    return RequestUtils(headers="bench", timeout=20).get_res(url)
+
+
+def run(func, base_url, total, threads):
+    urls = [f"{base_url}/download.php?id={i}" for i in range(total)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(func, urls))
+    elapsed = time.perf_counter() - start
+    assert all(res is not None and res.status_code == 200 for res in results)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--size", type=int, default=20 * 1024, help="种子文件pieces部分的字节数")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.size, args.certfile, args.keyfile)
+    print(f"{'mode':<10}{'requests':>10}{'seconds':>10}{'req/s':>10}{'connections':>14}")
+    for name, func in (("legacy", legacy_get), ("pooled", pooled_get)):
+        server.connections = 0
+        elapsed = run(func, base_url, args.requests, args.threads)
+        print(f"{name:<10}{args.requests:>10}{elapsed:>10.2f}{args.requests / elapsed:>10.0f}{server.connections:>14}")
+    SessionPool().close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
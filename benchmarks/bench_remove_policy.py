@@ -0,0 +1,157 @@
+"""
+自动删种策略基准测试：逐个种子判断的旧实现与按列过滤的RemovePolicy对比，并校验两者结果一致
+
+旧实现的辅种查找为O(n·m)，50000个种子时需运行数分钟
+
+运行：python benchmarks/bench_remove_policy.py --sizes 10000 50000
+"""
+import argparse
+import random
+import re
+import time
+from datetime import datetime
+
+from hubstation.downloader.remove_policy import RemovePolicy, TorrentColumns
+from hubstation.downloader.torrent_snapshot import TorrentItem
+
+CONFIG = {
+    "ratio": 1,
+    "seeding_time": 24,
+    "size": [1, 100],
+    "upload_avs": 500,
+    "savepath_key": "/downloads/(movie|tv)",
+    "tracker_key": "tracker[0-9]+\\.example",
+    "qb_state": ["uploading", "stalledUP", "pausedUP"],
+    "qb_category": ["movie", "tv"],
+    "samedata": True,
+}
+
+
+def make_torrents(n):
+    now = int(time.time())
+    states = ["uploading", "stalledUP", "pausedUP", "downloading", "stalledDL"]
+    categories = ["movie", "tv", "music", ""]
+    torrents = []
+    for i in range(n):
+        # 约5%的种子与其它种子同名同大小（辅种）
+        j = random.randint(0, n - 1) if random.random() < 0.05 else i
+        size = (j % 200 + 1) * 1024 * 1024 * 1024 // 2
+        added_on = now - random.randint(0, 90 * 86400)
+        completed = random.random() < 0.9
+        torrents.append(TorrentItem({
+            "hash": "%040x" % i,
+            "name": f"torrent-{j}",
+            "size": size,
+            "ratio": random.random() * 5,
+            "added_on": added_on,
+            "completion_on": added_on + random.randint(0, 86400) if completed else -1,
+            "uploaded": int(size * random.random() * 5),
+            "save_path": random.choice(["/downloads/movie", "/downloads/tv", "/downloads/other"]),
+            "tracker": f"https://tracker{random.randint(0, 20)}.example.org/announce" if random.random() < 0.95
+            else f"https://other{i % 5}.org/announce",
+            "state": random.choice(states),
+            "category": random.choice(categories),
+        }))
+    return torrents
+
+
+def legacy(torrents, config):
+    """
+    调整前Qbittorrent.get_remove_torrents的实现
+    """
+    remove_torrents = []
+    remove_torrents_ids = []
+    ratio = config.get("ratio")
+    seeding_time = config.get("seeding_time")
+    size = config.get("size")
+    minsize = size[0] * 1024 * 1024 * 1024 if size else 0
+    maxsize = size[-1] * 1024 * 1024 * 1024 if size else 0
+    upload_avs = config.get("upload_avs")
+    savepath_key = config.get("savepath_key")
+    tracker_key = config.get("tracker_key")
+    qb_state = config.get("qb_state")
+    qb_category = config.get("qb_category")
+    for torrent in torrents:
+        date_done = torrent.completion_on if torrent.completion_on > 0 else torrent.added_on
+        date_now = int(time.mktime(datetime.now().timetuple()))
+        torrent_seeding_time = date_now - date_done if date_done else 0
+        torrent_upload_avs = torrent.uploaded / torrent_seeding_time if torrent_seeding_time else 0
+        if ratio and torrent.ratio <= ratio:
+            continue
+        if seeding_time and torrent_seeding_time <= seeding_time * 3600:
+            continue
+        if size and (torrent.size >= maxsize or torrent.size <= minsize):
+            continue
+        if upload_avs and torrent_upload_avs >= upload_avs * 1024:
+            continue
+        if savepath_key and not re.findall(savepath_key, torrent.save_path, re.I):
+            continue
+        if tracker_key and not re.findall(tracker_key, torrent.tracker, re.I):
+            continue
+        if qb_state and torrent.state not in qb_state:
+            continue
+        if qb_category and torrent.category not in qb_category:
+            continue
+        remove_torrents.append({"id": torrent.hash, "name": torrent.name, "size": torrent.size})
+        remove_torrents_ids.append(torrent.hash)
+    if config.get("samedata") and remove_torrents:
+        remove_torrents_plus = []
+        for remove_torrent in remove_torrents:
+            name = remove_torrent.get("name")
+            size = remove_torrent.get("size")
+            for torrent in torrents:
+                if torrent.name == name and torrent.size == size and torrent.hash not in remove_torrents_ids:
+                    remove_torrents_plus.append({"id": torrent.hash, "name": torrent.name, "size": torrent.size})
+        remove_torrents_plus += remove_torrents
+        return remove_torrents_plus
+    return remove_torrents
+
+
+def policy(torrents, config):
+    """
+    RemovePolicy实现，与Qbittorrent.get_remove_torrents一致
+    """
+    remove_policy = RemovePolicy(config, states=config.get("qb_state"), categories=config.get("qb_category"))
+    columns = TorrentColumns()
+    for torrent in torrents:
+        columns.append(name=torrent.name,
+                       size=torrent.size,
+                       ratio=torrent.ratio,
+                       done_date=torrent.completion_on if torrent.completion_on > 0 else torrent.added_on,
+                       uploaded=torrent.uploaded,
+                       save_path=torrent.save_path,
+                       trackers=[torrent.tracker] if torrent.tracker else [],
+                       state=torrent.state,
+                       category=torrent.category)
+    return [{"id": torrents[i].hash, "name": torrents[i].name, "size": torrents[i].size}
+            for i in remove_policy.evaluate(columns)]
+
+
+def timeit(func, *args, repeat=1):
+    best, ret = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ret = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000], help="种子数量")
+    parser.add_argument("--repeat", type=int, default=1, help="重复次数，取最快一次")
+    args = parser.parse_args()
+    for n in args.sizes:
+        random.seed(n)
+        torrents = make_torrents(n)
+        # 旧实现同一辅种会被重复加入，比较时按ID去重
+        legacy_time, legacy_ret = timeit(legacy, torrents, CONFIG, repeat=args.repeat)
+        policy_time, policy_ret = timeit(policy, torrents, CONFIG, repeat=args.repeat)
+        same = {t["id"] for t in legacy_ret} == {t["id"] for t in policy_ret}
+        print(f"torrents={n:6d} legacy={legacy_time * 1000:9.1f}ms policy={policy_time * 1000:7.1f}ms "
+              f"speedup={legacy_time / policy_time:6.1f}x removed={len(policy_ret)} same={same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+SQLite连接参数基准测试：旧参数（rollback journal、100连接池）与默认调优参数对比
+通过ThreadHelper线程池并发执行读写混合负载，输出吞吐量及耗时分布
+
+运行：HUBStation_SRC_CONFIG=/path/to/config.yaml python benchmarks/bench_sqlite_profile.py
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import wait
+
+from sqlalchemy import func
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from hubstation.db.engine import create_sqlite_engine
+from hubstation.db.models import TRANSFERHISTORY, Base
+from hubstation.helper.thread_helper import ThreadHelper
+
+# 调整前main_db/media_db使用的参数
+LEGACY_PROFILE = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "mmap_size": 0,
+    "cache_size": -2000,
+    "temp_store": "DEFAULT",
+    "busy_timeout": 5000,
+    "pool_size": 100,
+    "max_overflow": 0,
+    "pool_pre_ping": True,
+    "pool_recycle": 600,
+}
+
+
+def _row(i):
+    return {
+        "MODE": "link",
+        "TYPE": "电影",
+        "CATEGORY": "",
+        "TMDBID": i,
+        "TITLE": f"title-{i % 5000}",
+        "YEAR": "2023",
+        "SEASON_EPISODE": "",
+        "SOURCE": "DownloadClient",
+        "SOURCE_PATH": f"/downloads/{i % 100}",
+        "SOURCE_FILENAME": f"file-{i}.mkv",
+        "DEST": "/media",
+        "DEST_PATH": f"/media/{i % 100}",
+        "DEST_FILENAME": f"file-{i}.mkv",
+        "DATE": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() - i)),
+    }
+
+
+def run(name, profile, rows, ops, write_ratio):
+    db_dir = tempfile.mkdtemp(prefix="hubstation-bench-")
+    engine = create_sqlite_engine(os.path.join(db_dir, "bench.db"), profile)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(TRANSFERHISTORY.__table__.insert(), [_row(i) for i in range(rows)])
+    session_factory = scoped_session(sessionmaker(bind=engine, autoflush=True, autocommit=False))
+
+    def read():
+        session = session_factory()
+        try:
+            session.query(func.count(TRANSFERHISTORY.ID)).filter(
+                TRANSFERHISTORY.TITLE == f"title-{random.randint(0, 4999)}").scalar()
+            session.query(TRANSFERHISTORY).order_by(TRANSFERHISTORY.DATE.desc()).limit(30).all()
+        finally:
+            session.rollback()
+
+    def write(i):
+        session = session_factory()
+        try:
+            session.execute(TRANSFERHISTORY.__table__.insert(), _row(rows + i))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+    def task(i):
+        start = time.perf_counter()
+        try:
+            if random.random() < write_ratio:
+                write(i)
+            else:
+                read()
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+        finally:
+            session_factory.remove()
+
+    executor = ThreadHelper().executor
+    start = time.perf_counter()
+    futures = [executor.submit(task, i) for i in range(ops)]
+    wait(futures)
+    elapsed = time.perf_counter() - start
+    results = [f.result() for f in futures]
+    latencies = sorted(r[0] for r in results)
+    errors = [r[1] for r in results if r[1]]
+    engine.dispose()
+    print(f"{name:8s} ops={ops} elapsed={elapsed:.2f}s throughput={ops / elapsed:.0f} ops/s "
+          f"p50={statistics.median(latencies) * 1000:.1f}ms "
+          f"p95={latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms "
+          f"errors={len(errors)}")
+    if errors:
+        print(f"         first error: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="预置记录数")
+    parser.add_argument("--ops", type=int, default=5000, help="并发操作数")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="写操作比例")
+    args = parser.parse_args()
+    random.seed(0)
+    run("legacy", LEGACY_PROFILE, args.rows, args.ops, args.write_ratio)
+    random.seed(0)
+    run("tuned", None, args.rows, args.ops, args.write_ratio)
+
+
+if __name__ == "__main__":
+    main()
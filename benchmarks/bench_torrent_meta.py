@@ -0,0 +1,175 @@
+"""
+种子元数据解析基准测试，语料为生成的大型季包种子（数百至数千个文件，pieces为数MB）
+
+- 文件清单：调整前的Torrent.get_torrent_files（完整解码含pieces的内容）与read_torrent_meta（mmap、跳过pieces）对比
+- 下载流程：下载后校验种子内容、read_torrent_content（读取两次文件并解码）、计算info-hash，
+  调整后同一内容只解析一次，其余步骤命中缓存
+
+运行：python benchmarks/bench_torrent_meta.py --count 20 --size-gb 200
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+from hubstation.utils.cache_manager import TorrentMetaCache
+from hubstation.utils.torrent_meta import (bdecode, get_torrent_meta,
+                                           read_torrent_meta)
+
+try:
+    # 调整前使用的bencode库，当前环境无法导入时以不跳过任何键的bdecode代替
+    from bencode import bdecode as legacy_bdecode
+except Exception:
+    def legacy_bdecode(content):
+        return bdecode(content, skip_keys=())[0]
+
+
+def bencode(value):
+    if isinstance(value, int):
+        return b"i%de" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"%d:%s" % (len(value), value)
+    if isinstance(value, list):
+        return b"l" + b"".join(bencode(v) for v in value) + b"e"
+    return b"d" + b"".join(bencode(k) + bencode(value[k]) for k in sorted(value)) + b"e"
+
+
+def make_season_pack(index, size_gb):
+    # 整季或全集合集，每集附带字幕、NFO等小文件
+    seasons = random.randint(1, 10)
+    episodes = random.randint(12, 100)
+    extras = random.choice([1, 2, 5])
+    piece_length = random.choice([1, 2, 4]) * 1024 * 1024
+    files = []
+    for season in range(1, seasons + 1):
+        for episode in range(1, episodes + 1):
+            files.append({"path": [f"Season {season:02d}", f"Show.{index}.S{season:02d}E{episode:02d}.2160p.mkv"],
+                          "length": 0})
+            for extra in range(extras):
+                files.append({"path": [f"Season {season:02d}", "Extras", f"S{season:02d}E{episode:02d}.{extra}.ass"],
+                              "length": random.randint(20000, 80000)})
+    videos = [item for item in files if not item["length"]]
+    for item in videos:
+        item["length"] = size_gb * 1024 * 1024 * 1024 // len(videos)
+    pieces = (sum(item["length"] for item in files) + piece_length - 1) // piece_length
+    info = {
+        "name": f"Show.{index}.Complete.2160p",
+        "piece length": piece_length,
+        "pieces": os.urandom(20) * pieces,
+        "files": files,
+        "private": 1,
+    }
+    return bencode({"announce": "https://tracker.example.org/announce", "created by": "bench", "info": info}), \
+        bencode(info)
+
+
+def legacy_info_hash(content):
+    """
+    调整前Torrent.get_info_hash的实现：扫描info字典的原始字节范围后计算SHA1
+    """
+    def skip(p):
+        c = content[p:p + 1]
+        if c == b"i":
+            return content.index(b"e", p) + 1
+        if c in (b"l", b"d"):
+            p += 1
+            while content[p:p + 1] != b"e":
+                p = skip(p)
+            return p + 1
+        colon = content.index(b":", p)
+        return colon + 1 + int(content[p:colon])
+
+    def spans(pos):
+        ret = {}
+        pos += 1
+        while content[pos:pos + 1] != b"e":
+            key_end = skip(pos)
+            value_end = skip(key_end)
+            ret[content[content.index(b":", pos) + 1:key_end]] = (key_end, value_end)
+            pos = value_end
+        return ret
+
+    start, end = spans(0)[b"info"]
+    return hashlib.sha1(content[start:end]).hexdigest()
+
+
+def legacy_get_torrent_files(path):
+    """
+    调整前Torrent.get_torrent_files的实现（文件未关闭）
+    """
+    torrent = legacy_bdecode(open(path, "rb").read())
+    info = torrent.get(b"info") or torrent.get("info")
+    return [item.get(b"path", item.get("path"))[0] for item in info.get(b"files") or info.get("files") or []]
+
+
+def legacy_download(path, content):
+    """
+    调整前的下载流程：校验下载内容、读取本地种子（读取两次并解码）、计算info-hash
+    """
+    legacy_bdecode(content)
+    with open(path, "rb") as f:
+        content = f.read()
+    legacy_get_torrent_files(path)
+    return legacy_info_hash(content)
+
+
+def download(path, content):
+    get_torrent_meta(content)
+    with open(path, "rb") as f:
+        content = f.read()
+    get_torrent_meta(content)
+    return get_torrent_meta(content).info_hash
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--size-gb", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = []
+        files = 0
+        total = 0
+        for i in range(args.count):
+            content, info = make_season_pack(i, args.size_gb)
+            path = os.path.join(tmp, f"{i}.torrent")
+            with open(path, "wb") as f:
+                f.write(content)
+            corpus.append((path, content))
+            meta = get_torrent_meta(content)
+            # 与调整前的实现结果一致
+            assert meta.file_names == [n.decode() if isinstance(n, bytes) else n
+                                       for n in legacy_get_torrent_files(path)]
+            assert meta.info_hash == legacy_info_hash(content) == hashlib.sha1(info).hexdigest()
+            files += len(meta.files)
+            total += len(content)
+        print(f"{args.count} torrents, {files} files, {total / 1024 / 1024:.1f} MB")
+
+        def bench(name, func, clear_cache=True):
+            best = None
+            for _ in range(args.repeat):
+                if clear_cache:
+                    TorrentMetaCache.clear()
+                start = time.perf_counter()
+                for path, content in corpus:
+                    func(path, content)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{name:<40}{best * 1000:10.1f} ms")
+
+        bench("get_torrent_files: legacy", lambda p, c: legacy_get_torrent_files(p))
+        bench("get_torrent_files: mmap", lambda p, c: read_torrent_meta(p))
+        bench("get_torrent_files: mmap, cached", lambda p, c: read_torrent_meta(p), clear_cache=False)
+        bench("download flow: legacy", legacy_download)
+        bench("download flow: parse once", download)
+
+
+if __name__ == "__main__":
+    main()
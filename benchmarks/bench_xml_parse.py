@@ -0,0 +1,130 @@
+"""
+Torznab/RSS解析基准测试：调整前的minidom + DomUtils.tag_value与XmlUtils增量解析的耗时及内存峰值对比，并校验结果一致
+
+默认使用生成的Jackett聚合搜索结果；可通过--files指定录制的Torznab或RSS响应文件
+
+运行：python benchmarks/bench_xml_parse.py --items 5000
+      python benchmarks/bench_xml_parse.py --files jackett_all.xml rss.xml
+"""
+import argparse
+import random
+import time
+import tracemalloc
+import xml.dom.minidom
+from xml.sax.saxutils import escape, quoteattr
+
+from hubstation.indexer.base.base import BaseIndex
+from hubstation.utils.dom_utils import DomUtils
+
+
+def make_torznab(n):
+    items = []
+    for i in range(n):
+        title = f"Show.{i % 300}.S{i % 10 + 1:02d}E{i % 24 + 1:02d}.2160p.WEB-DL.H265.DDP5.1-GROUP{i % 17}"
+        attrs = "".join(f'<torznab:attr name="{name}" value="{value}" />' for name, value in [
+            ("category", "5000"), ("seeders", random.randint(0, 500)), ("peers", random.randint(0, 600)),
+            ("downloadvolumefactor", random.choice([0, 0.5, 1])), ("uploadvolumefactor", 1),
+            ("imdbid", f"tt{random.randint(1000000, 9999999)}"), ("minimumratio", 1), ("minimumseedtime", 172800)])
+        items.append(
+            f"<item><title>{escape(title)}</title><guid>https://site{i % 30}.example/details/{i}</guid>"
+            f"<jackettindexer id=\"site{i % 30}\">Site {i % 30}</jackettindexer><type>private</type>"
+            f"<comments>https://site{i % 30}.example/details/{i}</comments>"
+            f"<pubDate>Mon, 02 Oct 2023 10:00:00 +0800</pubDate><size>{random.randint(10 ** 8, 10 ** 11)}</size>"
+            f"<description>{escape('官方中字 4K HDR 第' + str(i % 24 + 1) + '集 ' + 'x' * random.randint(0, 400))}"
+            f"</description><link>https://jackett/dl/site{i % 30}/?path={i}</link><category>5000</category>"
+            f"<enclosure url={quoteattr(f'https://jackett/dl/site{i % 30}/?jackett_apikey=k&path={i}&file={title}')}"
+            f" length=\"{random.randint(10 ** 8, 10 ** 11)}\" type=\"application/x-bittorrent\" />{attrs}</item>")
+    return ("<?xml version=\"1.0\" encoding=\"UTF-8\"?><rss version=\"2.0\" "
+            "xmlns:atom=\"http://www.w3.org/2005/Atom\" xmlns:torznab=\"http://torznab.com/schemas/2015/feed\">"
+            "<channel><atom:link href=\"http://jackett/api\" rel=\"self\" type=\"application/rss+xml\" />"
+            "<title>AggregateSearch</title>" + "".join(items) + "</channel></rss>").encode()
+
+
+def legacy_parse_torznab(xmls):
+    """
+    调整前BaseIndex.__parse_torznabxml的解析部分
+    """
+    torrents = []
+    dom_tree = xml.dom.minidom.parseString(xmls)
+    for item in dom_tree.documentElement.getElementsByTagName("item"):
+        indexer_id = DomUtils.tag_value(item, "jackettindexer", "id",
+                                        default=DomUtils.tag_value(item, "prowlarrindexer", "id", ""))
+        indexer = DomUtils.tag_value(item, "jackettindexer",
+                                     default=DomUtils.tag_value(item, "prowlarrindexer", default=""))
+        title = DomUtils.tag_value(item, "title", default="")
+        if not title:
+            continue
+        enclosure = DomUtils.tag_value(item, "enclosure", "url", default="")
+        if not enclosure:
+            continue
+        description = DomUtils.tag_value(item, "description", default="")
+        size = DomUtils.tag_value(item, "size", default=0)
+        page_url = DomUtils.tag_value(item, "comments", default="")
+        seeders, peers, freeleech, downloadvolumefactor, uploadvolumefactor, imdbid = 0, 0, False, 1.0, 1.0, ""
+        for torznab_attr in item.getElementsByTagName("torznab:attr"):
+            name = torznab_attr.getAttribute('name')
+            value = torznab_attr.getAttribute('value')
+            if name == "seeders":
+                seeders = value
+            if name == "peers":
+                peers = value
+            if name == "downloadvolumefactor":
+                downloadvolumefactor = value
+                if float(downloadvolumefactor) == 0:
+                    freeleech = True
+            if name == "uploadvolumefactor":
+                uploadvolumefactor = value
+            if name == "imdbid":
+                imdbid = value
+        torrents.append({'indexer_id': indexer_id, 'indexer': indexer, 'title': title, 'enclosure': enclosure,
+                         'description': description, 'size': size, 'seeders': seeders, 'peers': peers,
+                         'freeleech': freeleech, 'downloadvolumefactor': downloadvolumefactor,
+                         'uploadvolumefactor': uploadvolumefactor, 'page_url': page_url, 'imdbid': imdbid})
+    return torrents
+
+
+def parse_torznab(xmls):
+    return list(BaseIndex.iter_torznab_items(xmls))
+
+
+def measure(func, content, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--files", nargs="*", default=[])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(1)
+    feeds = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            feeds.append((path, f.read()))
+    if not feeds:
+        feeds = [(f"torznab {n} items", make_torznab(n)) for n in args.items]
+
+    print(f"{'feed':<24}{'size':>10}{'minidom':>12}{'iterparse':>12}{'minidom peak':>16}{'iterparse peak':>16}")
+    for name, content in feeds:
+        old, old_time, old_peak = measure(legacy_parse_torznab, content, args.repeat)
+        new, new_time, new_peak = measure(parse_torznab, content, args.repeat)
+        assert old == new, f"{name}: results differ"
+        print(f"{name:<24}{len(content) / 1024 / 1024:>8.1f}MB{old_time * 1000:>10.0f}ms{new_time * 1000:>10.0f}ms"
+              f"{old_peak / 1024 / 1024:>14.1f}MB{new_peak / 1024 / 1024:>14.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from hubstation.config.config import Config, APP_VERSION
 from hubstation.data.config_monitor import start_config_monitor
 from hubstation.db import init_db, update_db, init_data
 from hubstation.helper.chrome_helper import init_chrome
+from hubstation.helper.rss_helper import RssHelper
 
 warnings.filterwarnings('ignore')
 
@@ -91,6 +92,8 @@ def init_system():
     update_db()
     # 数据初始化
     init_data()
+    # RSS去重缓存预热
+    RssHelper().init_rssd_cache()
 
 
 def start_service():
@@ -103,8 +103,10 @@ class Config(object):
             return False
 
     def init_syspath(self):
-        with open(os.path.join(self.get_root_path(),
-                               "third_party.txt"), "r") as f:
+        third_party_file = os.path.join(self.get_root_path(), "third_party.txt")
+        if not os.path.exists(third_party_file):
+            return
+        with open(third_party_file, "r") as f:
             for third_party_lib in f.readlines():
                 module_path = os.path.join(self.get_root_path(),
                                            "third_party",
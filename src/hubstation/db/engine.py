@@ -0,0 +1,83 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+from hubstation.config import settings
+from hubstation.helper.thread_helper import THREAD_NUM
+
+# 同时占用连接的线程数上限：线程本地会话读取后会一直持有连接，读取都在ThreadHelper线程池中执行，另加写线程一个连接
+MAX_CONNECTIONS = THREAD_NUM + 1
+# SQLite连接参数默认值，可在settings.yml的sqlite节点中覆盖
+DEFAULT_SQLITE_PROFILE = {
+    # WAL模式下读写互不阻塞，只有写与写之间串行
+    "journal_mode": "WAL",
+    # WAL模式下NORMAL只在检查点时fsync，掉电最多丢失最近提交的事务，不会损坏数据库
+    "synchronous": "NORMAL",
+    # 内存映射读取的大小，单位字节
+    "mmap_size": 256 * 1024 * 1024,
+    # 页缓存大小，负数单位为KB
+    "cache_size": -64 * 1024,
+    # 临时表及排序使用内存
+    "temp_store": "MEMORY",
+    # 等待写锁的超时时间，单位毫秒
+    "busy_timeout": 30000,
+    # 常驻连接数；写操作已由写线程串行执行，常驻连接不宜过大
+    "pool_size": 10,
+    # 连接总数与MAX_CONNECTIONS一致，取不到连接的线程不会等待到pool_timeout，溢出连接归还时即关闭
+    "max_overflow": MAX_CONNECTIONS - 10,
+    "pool_timeout": 30,
+    # 本地文件连接不会失效，无需每次取出连接时ping
+    "pool_pre_ping": False,
+    "pool_recycle": -1,
+}
+
+
+def get_sqlite_profile(profile: dict = None):
+    """
+    获取SQLite连接参数，优先级：传入参数 > settings.yml中的sqlite节点 > 默认值
+    :param profile: 覆盖的参数
+    :return: 合并后的参数字典
+    """
+    ret = dict(DEFAULT_SQLITE_PROFILE)
+    conf = settings.get("SQLITE") or {}
+    for key in DEFAULT_SQLITE_PROFILE:
+        if conf.get(key) is not None:
+            ret[key] = conf.get(key)
+    if profile:
+        ret.update(profile)
+    return ret
+
+
+def create_sqlite_engine(db_file: str, profile: dict = None):
+    """
+    创建SQLite数据库引擎，每个新连接建立时设置PRAGMA
+    :param db_file: 数据库文件路径
+    :param profile: 覆盖的连接参数，参考DEFAULT_SQLITE_PROFILE
+    :return: Engine
+    """
+    profile = get_sqlite_profile(profile)
+    engine = create_engine(
+        f"sqlite:///{db_file}?check_same_thread=False",
+        echo=False,
+        poolclass=QueuePool,
+        pool_pre_ping=profile.get("pool_pre_ping"),
+        pool_size=profile.get("pool_size"),
+        pool_recycle=profile.get("pool_recycle"),
+        pool_timeout=profile.get("pool_timeout"),
+        max_overflow=profile.get("max_overflow"),
+        connect_args={"timeout": profile.get("busy_timeout") / 1000}
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in ["journal_mode", "synchronous", "mmap_size",
+                           "cache_size", "temp_store", "busy_timeout"]:
+                value = profile.get(pragma)
+                if value is None:
+                    continue
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        finally:
+            cursor.close()
+
+    return engine
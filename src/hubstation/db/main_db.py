@@ -1,32 +1,41 @@
 import os
 import threading
 
-from isort import Config
-from sqlalchemy import create_engine, text
+from sqlalchemy import Integer, column, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import QueuePool
 
 # from app.db.models import Base
 # from app.utils import ExceptionUtils, PathUtils
 # from config import Config
+from hubstation.config.config import Config
+from hubstation.db.engine import create_sqlite_engine
 from hubstation.db.models import Base
+from hubstation.db.writer import DbWriter
 from hubstation.utils.exception_utils import ExceptionUtils
 from hubstation.utils.path_utils import PathUtils
 
 lock = threading.Lock()
-_Engine = create_engine(
-    f"sqlite:///{os.path.join(Config().get_config_path(), 'user.db')}?check_same_thread=False",
-    echo=False,
-    poolclass=QueuePool,
-    pool_pre_ping=True,
-    pool_size=100,
-    pool_recycle=60 * 10,
-    max_overflow=0
-)
+# 全文检索影子表（FTS5 trigram），表名：(源表, 检索列)
+_FTS_TABLES = {
+    "TRANSFER_HISTORY_FTS": ("TRANSFER_HISTORY", ["TITLE", "SOURCE_FILENAME"]),
+    "TRANSFER_UNKNOWN_FTS": ("TRANSFER_UNKNOWN", ["PATH"]),
+}
+# trigram分词最少需要3个字符
+FTS_MIN_KEYWORD_LENGTH = 3
+# 按天汇总的统计表，表名：为空时从明细表回填的SQL
+_ROLLUP_TABLES = {
+    "TRANSFER_STATISTICS_DAILY": "INSERT INTO TRANSFER_STATISTICS_DAILY(DATE, TYPE, COUNT) "
+                                 "SELECT substr(DATE, 1, 10), TYPE, count(*) FROM TRANSFER_HISTORY "
+                                 "WHERE DATE IS NOT NULL GROUP BY substr(DATE, 1, 10), TYPE",
+}
+_Engine = create_sqlite_engine(os.path.join(Config().get_config_path(), 'user.db'))
 _Session = scoped_session(sessionmaker(bind=_Engine,
                                        autoflush=True,
                                        autocommit=False,
                                        expire_on_commit=False))
+# 所有DbPersist写操作经由同一个写线程串行执行并合并提交
+_Writer = DbWriter(_Session)
 
 
 class MainDb:
@@ -35,11 +44,98 @@ class MainDb:
     def session(self):
         return _Session()
 
+    _fts_enabled = None
+
     def init_db(self):
         with lock:
             Base.metadata.create_all(_Engine)
+            self.init_db_indexes()
+            self.init_db_fts()
+            self.init_db_rollups()
             self.init_db_version()
 
+    @staticmethod
+    def init_db_indexes():
+        """
+        补建已有表上新增的索引，create_all只会为新建的表创建索引
+        """
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(_Engine, checkfirst=True)
+                except Exception as err:
+                    print(str(err))
+
+    def init_db_fts(self):
+        """
+        创建全文检索影子表及同步触发器，新建时从源表重建索引
+        """
+        enabled = set()
+        for fts_table, (src_table, columns) in _FTS_TABLES.items():
+            cols = ", ".join(columns)
+            new_cols = ", ".join(f"new.{col}" for col in columns)
+            old_cols = ", ".join(f"old.{col}" for col in columns)
+            try:
+                with _Engine.begin() as conn:
+                    exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                                          {"name": fts_table}).first()
+                    if not exists:
+                        conn.execute(text(f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+                                          f"{cols}, content='{src_table}', content_rowid='ID', tokenize='trigram')"))
+                    conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_AI AFTER INSERT ON {src_table} BEGIN "
+                                      f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.ID, {new_cols}); END"))
+                    conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_AD AFTER DELETE ON {src_table} BEGIN "
+                                      f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) "
+                                      f"VALUES ('delete', old.ID, {old_cols}); END"))
+                    conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_AU AFTER UPDATE OF {cols} "
+                                      f"ON {src_table} BEGIN "
+                                      f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) "
+                                      f"VALUES ('delete', old.ID, {old_cols}); "
+                                      f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.ID, {new_cols}); END"))
+                    if not exists:
+                        conn.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+                enabled.add(fts_table)
+            except Exception as err:
+                # SQLite版本过低不支持FTS5 trigram时，检索退回LIKE
+                print(str(err))
+        MainDb._fts_enabled = enabled
+
+    @staticmethod
+    def init_db_rollups():
+        """
+        汇总统计表为空时从明细表回填，之后由写入明细的方法增量维护
+        """
+        for rollup_table, backfill_sql in _ROLLUP_TABLES.items():
+            try:
+                with _Engine.begin() as conn:
+                    if conn.execute(text(f"SELECT 1 FROM {rollup_table} LIMIT 1")).first():
+                        continue
+                    conn.execute(text(backfill_sql))
+            except Exception as err:
+                print(str(err))
+
+    def is_fts_enabled(self, fts_table):
+        """
+        全文检索影子表是否可用
+        """
+        if self._fts_enabled is None:
+            with _Engine.connect() as conn:
+                MainDb._fts_enabled = {row[0] for row in conn.execute(
+                    text("SELECT name FROM sqlite_master WHERE type = 'table'")) if row[0] in _FTS_TABLES}
+        return fts_table in self._fts_enabled
+
+    def fts_match(self, fts_table, keyword):
+        """
+        生成全文检索的rowid子查询，用于源表ID.in_()；关键字过短或影子表不可用时返回None，由调用方退回LIKE
+        :param fts_table: 影子表名
+        :param keyword: 检索关键字，按子串匹配
+        """
+        if not keyword or len(keyword) < FTS_MIN_KEYWORD_LENGTH or not self.is_fts_enabled(fts_table):
+            return None
+        keyword = '"%s"' % keyword.replace('"', '""')
+        return text(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH :keyword").bindparams(
+            keyword=keyword).columns(column("rowid", Integer))
+
     def init_db_version(self):
         """
         初始化数据库版本
@@ -84,6 +180,69 @@ class MainDb:
         else:
             self.session.add(data)
 
+    def upsert(self, model, rows: list, index_elements: list, update_columns: list = None,
+               increment_columns: list = None):
+        """
+        批量插入或更新，使用INSERT ... ON CONFLICT DO UPDATE和executemany，一次执行完成
+        :param model: 表模型
+        :param rows: 待写入数据，字典列表，键为列名
+        :param index_elements: 冲突判断的列，需存在对应的唯一索引
+        :param update_columns: 冲突时需要更新的列，默认为除冲突判断列及累加列外的所有列
+        :param increment_columns: 冲突时在原值上累加的列
+        """
+        if not rows:
+            return
+        increment_columns = increment_columns or []
+        if update_columns is None:
+            update_columns = [col for col in rows[0].keys()
+                              if col not in index_elements and col not in increment_columns]
+        stmt = sqlite_insert(model)
+        set_ = {col: stmt.excluded[col] for col in update_columns}
+        for col in increment_columns:
+            set_[col] = getattr(model, col) + stmt.excluded[col]
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+        self.session.execute(stmt, rows)
+
+    def bulk_insert(self, model, rows: list):
+        """
+        批量插入，使用executemany一次执行完成，不生成ORM对象
+        :param model: 表模型
+        :param rows: 待插入数据，字典列表，键为列名
+        """
+        if not rows:
+            return
+        self.session.execute(sqlite_insert(model), rows)
+
+    def bulk_update(self, model, rows: list):
+        """
+        按主键批量更新，使用executemany一次执行完成
+        :param model: 表模型
+        :param rows: 待更新数据，字典列表，键为列名，需包含主键
+        """
+        if not rows:
+            return
+        self.session.bulk_update_mappings(model, rows)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        将写操作提交到写线程执行，与同一时间窗口内的其它写操作合并为一个事务提交
+        :return: Future，事务提交后返回func的返回值
+        """
+        return _Writer.submit(func, *args, **kwargs)
+
+    def on_commit(self, callback):
+        """
+        登记写操作所在事务提交成功后执行的回调，回滚时不执行
+        """
+        _Writer.on_commit(callback)
+
+    @staticmethod
+    def is_writer_thread():
+        """
+        当前是否在写线程中，即处于未提交的写事务中
+        """
+        return _Writer.is_writer_thread()
+
     def query(self, *obj):
         """
         查询对象
@@ -117,7 +276,8 @@ class MainDb:
 
 class DbPersist(object):
     """
-    数据库持久化装饰器
+    数据库持久化装饰器：被装饰的函数交给写线程执行，可能与其它写操作合并为一个事务，
+    合并的事务失败时会被重新执行，函数中只能包含数据库操作，其它副作用通过MainDb.on_commit登记
     """
 
     def __init__(self, db):
@@ -126,12 +286,10 @@ class DbPersist(object):
     def __call__(self, f):
         def persist(*args, **kwargs):
             try:
-                ret = f(*args, **kwargs)
-                self.db.commit()
+                ret = self.db.submit(f, *args, **kwargs).result()
                 return True if ret is None else ret
             except Exception as e:
                 ExceptionUtils.exception_traceback(e)
-                self.db.rollback()
                 return False
 
         return persist
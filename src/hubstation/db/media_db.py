@@ -2,30 +2,140 @@ import json
 import os
 import threading
 import time
+from collections import namedtuple
 
-from cachetools import cached, TTLCache
-from sqlalchemy import create_engine
+from sqlalchemy import Text, text
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import QueuePool
 
 from hubstation.config.config import Config
+from hubstation.db.engine import create_sqlite_engine
 from hubstation.db.models import BaseMedia, MEDIASYNCITEMS, MEDIASYNCSTATISTIC
 from hubstation.utils.exception_utils import ExceptionUtils
 
 lock = threading.Lock()
-_Engine = create_engine(
-    f"sqlite:///{os.path.join(Config().get_config_path(), 'media.db')}?check_same_thread=False",
-    echo=False,
-    poolclass=QueuePool,
-    pool_pre_ping=True,
-    pool_size=100,
-    pool_recycle=60 * 10,
-    max_overflow=0
-)
+_Engine = create_sqlite_engine(os.path.join(Config().get_config_path(), 'media.db'))
 _Session = scoped_session(sessionmaker(bind=_Engine,
                                        autoflush=True,
                                        autocommit=False))
 
+# 媒体库同步数据的值对象，字段与MEDIASYNCITEMS的列名一致
+MediaSyncItem = namedtuple("MediaSyncItem", [c.name for c in MEDIASYNCITEMS.__table__.columns])
+# 文本类型的列，写入后按数据库中的文本形式放入索引
+_TEXT_FIELDS = {c.name for c in MEDIASYNCITEMS.__table__.columns if isinstance(c.type, Text)}
+
+
+class MediaSyncIndex:
+    """
+    媒体库同步数据的内存索引，按(服务器, TMDBID)、(服务器, 标题, 年份)、(服务器, 标题)查找，
+    首次查询时从MEDIASYNC_ITEMS批量加载，同步写入时增量更新，返回MediaSyncItem值对象
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._inited = False
+        # (服务器, ITEM_ID) -> MediaSyncItem
+        self._items = {}
+        # 查找键 -> [MediaSyncItem]，同一个键有多条时取ID最小的一条，与数据库查询first()的结果一致
+        self._by_tmdbid = {}
+        self._by_title_year = {}
+        self._by_title = {}
+
+    def rebuild(self, session):
+        """
+        从数据库重建索引
+        """
+        with self._lock:
+            self._items, self._by_tmdbid, self._by_title_year, self._by_title = {}, {}, {}, {}
+            for row in session.query(*MEDIASYNCITEMS.__table__.columns).order_by(MEDIASYNCITEMS.ID):
+                self.__add(MediaSyncItem(*row))
+            self._inited = True
+
+    def is_inited(self):
+        return self._inited
+
+    def invalidate(self):
+        """
+        清空索引，下次查询时重新加载
+        """
+        with self._lock:
+            self._items, self._by_tmdbid, self._by_title_year, self._by_title = {}, {}, {}, {}
+            self._inited = False
+
+    def add(self, item: MediaSyncItem):
+        """
+        新增一条记录，同服务器同ITEM_ID的旧记录会被替换
+        """
+        with self._lock:
+            if not self._inited:
+                return
+            self.__remove(self._items.get((item.SERVER, item.ITEM_ID)))
+            self.__add(item)
+
+    def remove(self, server=None, library=None):
+        """
+        按服务器、媒体库删除记录，均为空时清空
+        """
+        with self._lock:
+            if not self._inited:
+                return
+            if not server:
+                self._items, self._by_tmdbid, self._by_title_year, self._by_title = {}, {}, {}, {}
+                return
+            for item in list(self._items.values()):
+                if item.SERVER == server and (not library or item.LIBRARY == library):
+                    self.__remove(item)
+
+    def get_by_tmdbid(self, server, tmdbid):
+        with self._lock:
+            return self.__first(self._by_tmdbid, (server, str(tmdbid)))
+
+    def get_by_title(self, server, title, year=None):
+        with self._lock:
+            if year:
+                return self.__first(self._by_title_year, (server, title, str(year)))
+            return self.__first(self._by_title, (server, title))
+
+    @staticmethod
+    def __first(index, key):
+        items = index.get(key)
+        if not items:
+            return None
+        return min(items, key=lambda x: x.ID)
+
+    def __keys(self, item):
+        keys = []
+        if item.TMDBID:
+            keys.append((self._by_tmdbid, (item.SERVER, str(item.TMDBID))))
+        if item.YEAR:
+            keys.append((self._by_title_year, (item.SERVER, item.TITLE, str(item.YEAR))))
+        keys.append((self._by_title, (item.SERVER, item.TITLE)))
+        return keys
+
+    def __add(self, item):
+        self._items[(item.SERVER, item.ITEM_ID)] = item
+        for index, key in self.__keys(item):
+            index.setdefault(key, []).append(item)
+
+    def __remove(self, item):
+        if not item:
+            return
+        self._items.pop((item.SERVER, item.ITEM_ID), None)
+        for index, key in self.__keys(item):
+            items = index.get(key)
+            if not items:
+                continue
+            items = [i for i in items if i.ID != item.ID]
+            if items:
+                index[key] = items
+            else:
+                index.pop(key, None)
+
+
+_Index = MediaSyncIndex()
+
+# 批量同步时比较和写入的列
+_SYNC_COLUMNS = ["LIBRARY", "ITEM_TYPE", "TITLE", "ORGIN_TITLE", "YEAR", "TMDBID", "IMDBID", "PATH", "JSON"]
+
 
 class MediaDb:
 
@@ -45,7 +155,7 @@ class MediaDb:
             self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type,
                                                       MEDIASYNCITEMS.ITEM_ID == iteminfo.get("id")).delete()
             self.session.flush()
-            self.session.add(MEDIASYNCITEMS(
+            item = MEDIASYNCITEMS(
                 SERVER=server_type,
                 LIBRARY=iteminfo.get("library"),
                 ITEM_ID=iteminfo.get("id"),
@@ -57,14 +167,126 @@ class MediaDb:
                 IMDBID=iteminfo.get("imdbid"),
                 PATH=iteminfo.get("path"),
                 JSON=json.dumps(seasoninfo)
-            ))
+            )
+            self.session.add(item)
+            self.session.flush()
+            value = self.__to_sync_item(item)
             self.session.commit()
+            _Index.add(value)
             return True
         except Exception as e:
             ExceptionUtils.exception_traceback(e)
             self.session.rollback()
         return False
 
+    @staticmethod
+    def __to_sync_item(item):
+        """
+        ORM对象转换为MediaSyncItem，文本列的值转为字符串，与从数据库加载的记录一致
+        """
+        values = []
+        for field in MediaSyncItem._fields:
+            value = getattr(item, field)
+            if value is not None and field in _TEXT_FIELDS:
+                value = str(value)
+            values.append(value)
+        return MediaSyncItem(*values)
+
+    def sync_items(self, server_type, library, items, diff_only=False, batch_size=1000):
+        """
+        批量同步一个媒体库的数据：先按批次写入临时表，再在一个事务中替换或合并到MEDIASYNC_ITEMS
+        :param server_type: 媒体服务器类型
+        :param library: 媒体库ID
+        :param items: 可迭代对象，元素为(iteminfo, seasoninfo)，与insert的参数一致，可以是生成器
+        :param diff_only: 为True时只写入有变化的记录并删除已不存在的记录，否则整库替换
+        :param batch_size: 每批写入临时表的记录数
+        :return: 统计信息：total、inserted、updated、deleted、unchanged、seconds、rate（条/秒），失败时返回None
+        """
+        if not server_type:
+            return None
+        start_time = time.time()
+        columns = ", ".join(_SYNC_COLUMNS)
+        # 临时表的列类型与MEDIASYNC_ITEMS一致，整数等值按相同的亲和性转为文本，比较时才不会误判为有变化
+        column_defs = ", ".join(f"{col} {MEDIASYNCITEMS.__table__.c[col].type.compile(_Engine.dialect)}"
+                                for col in _SYNC_COLUMNS)
+        params = {"server": server_type, "library": library}
+        # 媒体库内记录，以及同服务器中ITEM_ID相同但属于其它媒体库的记录（已移动的媒体）
+        target = "SERVER = :server AND LIBRARY IS :library"
+        moved = "SERVER = :server AND LIBRARY IS NOT :library " \
+                "AND ITEM_ID IN (SELECT ITEM_ID FROM MEDIASYNC_ITEMS_STAGE)"
+        try:
+            with lock:
+                with _Engine.begin() as conn:
+                    conn.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS MEDIASYNC_ITEMS_STAGE "
+                                      f"(ITEM_ID TEXT PRIMARY KEY, {column_defs})"))
+                    conn.execute(text("DELETE FROM MEDIASYNC_ITEMS_STAGE"))
+                    stage_sql = text(f"INSERT OR REPLACE INTO MEDIASYNC_ITEMS_STAGE (ITEM_ID, {columns}) "
+                                     f"VALUES (:ITEM_ID, {', '.join(':' + col for col in _SYNC_COLUMNS)})")
+                    batch = []
+                    for iteminfo, seasoninfo in items:
+                        # 没有ID的记录无法比对，不参与同步
+                        if not iteminfo or not iteminfo.get("id"):
+                            continue
+                        batch.append({
+                            "ITEM_ID": iteminfo.get("id"),
+                            "LIBRARY": library,
+                            "ITEM_TYPE": iteminfo.get("type"),
+                            "TITLE": iteminfo.get("title"),
+                            "ORGIN_TITLE": iteminfo.get("originalTitle"),
+                            "YEAR": iteminfo.get("year"),
+                            "TMDBID": iteminfo.get("tmdbid"),
+                            "IMDBID": iteminfo.get("imdbid"),
+                            "PATH": iteminfo.get("path"),
+                            "JSON": json.dumps(seasoninfo)
+                        })
+                        if len(batch) >= batch_size:
+                            conn.execute(stage_sql, batch)
+                            batch = []
+                    if batch:
+                        conn.execute(stage_sql, batch)
+                    # 同一ITEM_ID重复出现时以最后一条为准
+                    total = conn.execute(text("SELECT count(*) FROM MEDIASYNC_ITEMS_STAGE")).scalar()
+                    deleted = conn.execute(text(f"DELETE FROM MEDIASYNC_ITEMS WHERE {moved}"), params).rowcount
+                    updated = 0
+                    if diff_only:
+                        deleted += conn.execute(text(
+                            f"DELETE FROM MEDIASYNC_ITEMS WHERE {target} AND NOT EXISTS "
+                            f"(SELECT 1 FROM MEDIASYNC_ITEMS_STAGE AS s WHERE s.ITEM_ID = MEDIASYNC_ITEMS.ITEM_ID)"),
+                            params).rowcount
+                        changed = " OR ".join(f"m.{col} IS NOT s.{col}" for col in _SYNC_COLUMNS)
+                        updated = conn.execute(text(
+                            f"UPDATE MEDIASYNC_ITEMS AS m "
+                            f"SET {', '.join(f'{col} = s.{col}' for col in _SYNC_COLUMNS)} "
+                            f"FROM MEDIASYNC_ITEMS_STAGE AS s "
+                            f"WHERE m.ITEM_ID = s.ITEM_ID AND m.SERVER = :server AND m.LIBRARY IS :library "
+                            f"AND ({changed})"), params).rowcount
+                        inserted = conn.execute(text(
+                            f"INSERT INTO MEDIASYNC_ITEMS (SERVER, ITEM_ID, {columns}) "
+                            f"SELECT :server, ITEM_ID, {columns} FROM MEDIASYNC_ITEMS_STAGE AS s "
+                            f"WHERE NOT EXISTS (SELECT 1 FROM MEDIASYNC_ITEMS AS m WHERE m.ITEM_ID = s.ITEM_ID "
+                            f"AND m.SERVER = :server AND m.LIBRARY IS :library)"),
+                            params).rowcount
+                    else:
+                        deleted += conn.execute(text(f"DELETE FROM MEDIASYNC_ITEMS WHERE {target}"), params).rowcount
+                        inserted = conn.execute(text(
+                            f"INSERT INTO MEDIASYNC_ITEMS (SERVER, ITEM_ID, {columns}) "
+                            f"SELECT :server, ITEM_ID, {columns} FROM MEDIASYNC_ITEMS_STAGE"), params).rowcount
+                    conn.execute(text("DROP TABLE MEDIASYNC_ITEMS_STAGE"))
+            _Index.invalidate()
+        except Exception as e:
+            ExceptionUtils.exception_traceback(e)
+            return None
+        seconds = round(time.time() - start_time, 3)
+        return {
+            "total": total,
+            "inserted": inserted,
+            "updated": updated,
+            "deleted": deleted,
+            "unchanged": total - inserted - updated,
+            "seconds": seconds,
+            "rate": round(total / seconds) if seconds else total
+        }
+
     def empty(self, server_type=None, library=None):
         try:
             if server_type and library:
@@ -75,6 +297,7 @@ class MediaDb:
             else:
                 self.session.query(MEDIASYNCITEMS).delete()
             self.session.commit()
+            _Index.remove(server=server_type, library=library if server_type else None)
             return True
         except Exception as e:
             ExceptionUtils.exception_traceback(e)
@@ -102,24 +325,29 @@ class MediaDb:
             self.session.rollback()
         return False
 
-    @cached(cache=TTLCache(maxsize=128, ttl=60))
+    def rebuild_index(self):
+        """
+        从数据库重建媒体库内存索引
+        """
+        _Index.rebuild(self.session)
+        self.session.rollback()
+
     def query(self, server_type, title, year, tmdbid):
+        """
+        查询媒体库中是否存在，从内存索引中查找，不访问数据库
+        :return: MediaSyncItem，不存在时返回空
+        """
         if not server_type or not title:
             return {}
+        if not _Index.is_inited():
+            self.rebuild_index()
 
         if tmdbid:
-            item = self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type,
-                                                             MEDIASYNCITEMS.TMDBID == tmdbid).first()
+            item = _Index.get_by_tmdbid(server_type, tmdbid)
             if item:
                 return item
 
-        if year:
-            item = self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type,
-                                                             MEDIASYNCITEMS.TITLE == title,
-                                                             MEDIASYNCITEMS.YEAR == year).first()
-        else:
-            item = self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type,
-                                                             MEDIASYNCITEMS.TITLE == title).first()
+        item = _Index.get_by_title(server_type, title, year)
         if item:
             if tmdbid and (not item.TMDBID or item.TMDBID != str(tmdbid)):
                 return {}
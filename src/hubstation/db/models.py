@@ -150,6 +150,10 @@ class DOWNLOADER(Base):
 
 class DOWNLOADHISTORY(Base):
     __tablename__ = 'DOWNLOAD_HISTORY'
+    __table_args__ = (
+        Index('INDX_DOWNLOAD_HISTORY_DATE_ID', 'DATE', 'ID'),
+        Index('INDX_DOWNLOAD_HISTORY_TITLE_DATE', 'TITLE', 'DATE'),
+    )
 
     ID = Column(Integer, Sequence('ID'), primary_key=True)
     TITLE = Column(Text, index=True)
@@ -494,6 +498,10 @@ class TRANSFERBLACKLIST(Base):
 
 class TRANSFERHISTORY(Base):
     __tablename__ = 'TRANSFER_HISTORY'
+    __table_args__ = (
+        Index('INDX_TRANSFER_HISTORY_DATE_ID', 'DATE', 'ID'),
+        Index('INDX_TRANSFER_HISTORY_SOURCE', 'SOURCE_PATH', 'SOURCE_FILENAME'),
+    )
 
     ID = Column(Integer, Sequence('ID'), primary_key=True)
     MODE = Column(Text)
@@ -515,6 +523,18 @@ class TRANSFERHISTORY(Base):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
 
 
+class TRANSFERSTATISTICSDAILY(Base):
+    __tablename__ = 'TRANSFER_STATISTICS_DAILY'
+    __table_args__ = (
+        Index('UN_INDX_TRANSFER_STATISTICS_DAILY_DT', 'DATE', 'TYPE', unique=True),
+    )
+
+    ID = Column(Integer, Sequence('ID'), primary_key=True)
+    DATE = Column(Text)
+    TYPE = Column(Text)
+    COUNT = Column(Integer, server_default=text("0"))
+
+
 class INDEXERSTATISTICS(Base):
     __tablename__ = 'INDEXER_STATISTICS'
 
@@ -531,6 +551,9 @@ class INDEXERSTATISTICS(Base):
 
 class TRANSFERUNKNOWN(Base):
     __tablename__ = 'TRANSFER_UNKNOWN'
+    __table_args__ = (
+        Index('INDX_TRANSFER_UNKNOWN_STATE_ID', 'STATE', 'ID'),
+    )
 
     ID = Column(Integer, Sequence('ID'), primary_key=True)
     PATH = Column(Text, index=True)
@@ -0,0 +1,196 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from hubstation.utils.exception_utils import ExceptionUtils
+
+
+class DbWriter:
+    """
+    数据库单写线程：写操作通过队列交给同一个线程串行执行，并发提交的写操作在短时间窗口内合并为一个事务提交
+    合并的事务中有写操作失败时，整批回滚后逐个重新执行，同一批次中成功的写操作会被执行两次，
+    因此提交的写操作只能包含数据库操作，缓存更新、通知等副作用需通过on_commit登记，在事务提交后执行
+    """
+    # 有其它写操作排队时，最多再等待多久合并进同一事务，单位秒
+    _window = 0.02
+    # 单个事务最多合并的写操作数
+    _max_batch = 200
+
+    def __init__(self, session_factory, window=None, max_batch=None):
+        """
+        :param session_factory: scoped_session，写线程通过它获取自己的会话
+        :param window: 合并等待时间窗口，单位秒
+        :param max_batch: 单个事务最多合并的写操作数
+        """
+        self._session_factory = session_factory
+        if window is not None:
+            self._window = window
+        if max_batch is not None:
+            self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # 当前事务中登记的提交后回调，仅写线程访问
+        self._callbacks = None
+
+    def is_writer_thread(self):
+        """
+        当前是否在写线程中
+        """
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, func, *args, **kwargs):
+        """
+        提交写操作，func在写线程中执行，所在事务提交成功后Future返回func的返回值，失败时Future抛出异常
+        在写线程中嵌套调用时直接执行，并入当前事务；func可能被重新执行，只能包含数据库操作
+        :return: Future
+        """
+        future = Future()
+        if self.is_writer_thread():
+            future.set_running_or_notify_cancel()
+            if self._callbacks is None:
+                # 提交后回调中发起的写操作，单独一个事务
+                self.__execute_single(future, func, args, kwargs)
+                return future
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self.__start()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def on_commit(self, callback):
+        """
+        登记事务提交成功后执行的回调，事务回滚时丢弃；不在写线程中调用时立即执行
+        """
+        if self.is_writer_thread() and self._callbacks is not None:
+            self._callbacks.append(callback)
+        else:
+            callback()
+
+    def stop(self, timeout=5):
+        """
+        处理完队列中已提交的写操作后停止写线程
+        """
+        with self._lock:
+            if not self._thread:
+                return
+            thread = self._thread
+            self._queue.put(None)
+        thread.join(timeout)
+
+    def __start(self):
+        """
+        按需启动写线程
+        """
+        if self._thread:
+            return
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self.__run, name="DbWriter", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def __run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            stopping = self.__collect(batch)
+            self.__execute(batch)
+            if stopping:
+                break
+        self._session_factory.remove()
+        with self._lock:
+            self._thread = None
+
+    def __collect(self, batch):
+        """
+        收集可以合并到同一事务的写操作：队列中已有排队时，在时间窗口内继续收集；队列为空则立即执行，不增加单个写操作的延迟
+        :return: 是否收到了停止信号
+        """
+        deadline = None
+        while len(batch) < self._max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                if deadline is None:
+                    if len(batch) == 1:
+                        return False
+                    deadline = time.monotonic() + self._window
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return False
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    return False
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    def __execute(self, batch):
+        """
+        在一个事务中执行一批写操作并提交；有任一操作失败时整批回滚，再逐个单独执行，只让失败的操作返回异常
+        """
+        batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        if len(batch) == 1:
+            self.__execute_single(*batch[0])
+            return
+        session = self._session_factory()
+        callbacks = []
+        results = []
+        self._callbacks = callbacks
+        try:
+            for _, func, args, kwargs in batch:
+                results.append(func(*args, **kwargs))
+            session.commit()
+            failed = False
+        except Exception:
+            session.rollback()
+            failed = True
+        finally:
+            self._callbacks = None
+        if failed:
+            for item in batch:
+                self.__execute_single(*item)
+            return
+        self.__run_callbacks(callbacks)
+        for (future, _, _, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def __execute_single(self, future, func, args, kwargs):
+        """
+        单独执行一个写操作并提交
+        """
+        session = self._session_factory()
+        callbacks = []
+        self._callbacks = callbacks
+        try:
+            result = func(*args, **kwargs)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            future.set_exception(e)
+            return
+        finally:
+            self._callbacks = None
+        self.__run_callbacks(callbacks)
+        future.set_result(result)
+
+    @staticmethod
+    def __run_callbacks(callbacks):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                ExceptionUtils.exception_traceback(e)
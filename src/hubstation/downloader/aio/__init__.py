@@ -0,0 +1,5 @@
+from hubstation.downloader.aio.base import AsyncBaseDownloader
+from hubstation.downloader.aio.facade import (AsyncDownloaderPool, AsyncLoop,
+                                              SyncDownloader)
+from hubstation.downloader.aio.qbittorrent import AsyncQbittorrent
+from hubstation.downloader.aio.transmission import AsyncTransmission
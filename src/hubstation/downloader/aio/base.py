@@ -0,0 +1,133 @@
+import asyncio
+from abc import ABCMeta, abstractmethod
+from urllib.parse import urlparse
+
+import aiohttp
+
+
+class AsyncBaseDownloader(metaclass=ABCMeta):
+    """
+    异步下载器客户端基类：每个下载器一个HTTP/1.1长连接会话，会话在首次请求时于当前事件循环中创建
+    """
+
+    # 下载器ID
+    client_id = ""
+    # 下载器类型
+    client_type = ""
+    # 下载器名称
+    client_name = ""
+
+    # 单个下载器的最大连接数
+    _connection_limit = 4
+    # 空闲连接保持时间，单位秒
+    _keepalive_timeout = 60
+    # 请求超时时间，单位秒
+    _timeout = 30
+
+    def __init__(self, config):
+        """
+        :param config: 下载器配置，与同步客户端一致，包含host、port、username、password、name
+        """
+        config = config or {}
+        self.host = config.get('host')
+        self.port = int(config.get('port')) if str(config.get('port')).isdigit() else 0
+        self.username = config.get('username')
+        self.password = config.get('password')
+        self.name = config.get('name') or ""
+        self.download_dir = config.get('download_dir') or []
+        self._session = None
+        self._login_lock = None
+
+    @property
+    def base_url(self):
+        """
+        下载器地址，未带协议时默认http
+        """
+        host = self.host or ""
+        if not host.startswith("http"):
+            host = f"http://{host}"
+        host = host.rstrip('/')
+        if self.port and urlparse(host).port is None:
+            host = f"{host}:{self.port}"
+        return host
+
+    def get_type(self):
+        return self.client_type
+
+    async def session(self):
+        """
+        获取长连接会话，连接在请求之间复用
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._connection_limit,
+                                             keepalive_timeout=self._keepalive_timeout,
+                                             ssl=False)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self._timeout),
+                                                  cookie_jar=aiohttp.CookieJar(unsafe=True))
+            self._login_lock = asyncio.Lock()
+        return self._session
+
+    async def close(self):
+        """
+        关闭会话及其连接
+        """
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @abstractmethod
+    async def get_status(self):
+        """
+        检查连通性
+        """
+        pass
+
+    @abstractmethod
+    async def get_torrents(self, ids=None, status=None, tag=None):
+        """
+        按条件读取种子信息
+        :return: 种子信息列表，是否发生错误
+        """
+        pass
+
+    @abstractmethod
+    async def get_downloading_torrents(self, ids=None, tag=None):
+        """
+        读取下载中的种子信息，发生错误时返回None
+        """
+        pass
+
+    @abstractmethod
+    async def get_completed_torrents(self, ids=None, tag=None):
+        """
+        读取下载完成的种子信息，发生错误时返回None
+        """
+        pass
+
+    @abstractmethod
+    async def get_downloading_progress(self, tag=None, ids=None):
+        """
+        获取正在下载的种子进度
+        """
+        pass
+
+    @abstractmethod
+    async def add_torrent(self, content, is_paused=False, download_dir=None, tag=None, cookie=None, **kwargs):
+        """
+        添加种子
+        :return: 是否成功
+        """
+        pass
+
+    @abstractmethod
+    async def start_torrents(self, ids):
+        pass
+
+    @abstractmethod
+    async def stop_torrents(self, ids):
+        pass
+
+    @abstractmethod
+    async def delete_torrents(self, delete_file, ids):
+        pass
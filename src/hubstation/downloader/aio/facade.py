@@ -0,0 +1,146 @@
+import asyncio
+import inspect
+import threading
+
+from hubstation.downloader.aio.qbittorrent import AsyncQbittorrent
+from hubstation.downloader.aio.transmission import AsyncTransmission
+from hubstation.utils.commons import singleton
+from hubstation.utils.exception_utils import ExceptionUtils
+
+
+@singleton
+class AsyncLoop:
+    """
+    后台事件循环线程，所有异步下载器客户端的会话都在该循环中创建和使用，同步代码通过run提交协程
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="AsyncDownloader", daemon=True)
+        self._thread.start()
+
+    @property
+    def loop(self):
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        """
+        在后台事件循环中执行协程并等待结果
+        :param coro: 协程
+        :param timeout: 等待超时时间，单位秒
+        :return: 协程的返回值
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+
+class SyncDownloader:
+    """
+    异步客户端的同步外观，协程方法在后台事件循环中执行，供原有同步调用方使用
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client
+
+    def __getattr__(self, item):
+        attr = getattr(self._client, item)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return AsyncLoop().run(attr(*args, **kwargs))
+
+        return call
+
+
+class AsyncDownloaderPool:
+    """
+    多个下载器的异步客户端，对所有下载器的同一操作并发执行
+    """
+    _schemas = [AsyncQbittorrent, AsyncTransmission]
+
+    def __init__(self, confs=None):
+        """
+        :param confs: {下载器ID: {"type": 类型, "config": 连接配置, ...}}，与Downloader中的下载器配置一致
+        """
+        self._clients = {}
+        for did, conf in (confs or {}).items():
+            client = self.build_client(conf.get("type"), {
+                **(conf.get("config") or {}),
+                "name": conf.get("name"),
+                "download_dir": conf.get("download_dir")
+            })
+            if client:
+                self._clients[str(did)] = client
+
+    @classmethod
+    def build_client(cls, ctype, config):
+        """
+        按下载器类型创建异步客户端，不支持的类型返回None
+        """
+        for schema in cls._schemas:
+            if ctype in [schema.client_id, schema.client_type, schema.client_name]:
+                return schema(config)
+        return None
+
+    @property
+    def clients(self):
+        return self._clients
+
+    def get_client(self, did):
+        """
+        获取单个下载器的同步外观
+        """
+        client = self._clients.get(str(did))
+        return SyncDownloader(client) if client else None
+
+    async def gather(self, method, *args, dids=None, **kwargs):
+        """
+        在所有（或指定）下载器上并发执行同一方法
+        :param method: 异步客户端的方法名
+        :param dids: 下载器ID列表，为空则为全部下载器
+        :return: {下载器ID: 返回值}，出错的下载器返回None
+        """
+        dids = [str(did) for did in dids] if dids else list(self._clients.keys())
+        dids = [did for did in dids if did in self._clients]
+        results = await asyncio.gather(*[getattr(self._clients[did], method)(*args, **kwargs) for did in dids],
+                                       return_exceptions=True)
+        ret = {}
+        for did, result in zip(dids, results):
+            if isinstance(result, Exception):
+                ExceptionUtils.exception_traceback(result)
+                result = None
+            ret[did] = result
+        return ret
+
+    def call_all(self, method, *args, dids=None, timeout=None, **kwargs):
+        """
+        gather的同步版本
+        """
+        return AsyncLoop().run(self.gather(method, *args, dids=dids, **kwargs), timeout)
+
+    def get_downloading_progress(self, tag=None, dids=None):
+        """
+        并发获取所有下载器正在下载的种子进度
+        :return: {下载器ID: 进度列表}
+        """
+        return self.call_all("get_downloading_progress", tag=tag, dids=dids)
+
+    def close(self):
+        """
+        关闭所有客户端的会话
+        """
+        if not self._clients:
+            return
+
+        async def __close():
+            for client in self._clients.values():
+                await client.close()
+
+        try:
+            AsyncLoop().run(__close(), timeout=5)
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
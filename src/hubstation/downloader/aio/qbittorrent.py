@@ -0,0 +1,188 @@
+import aiohttp
+
+from hubstation.constants import DownloaderType
+from hubstation.downloader.aio.base import AsyncBaseDownloader
+from hubstation.downloader.torrent_snapshot import (QbittorrentSnapshot,
+                                                    TorrentItem)
+from hubstation.utils.exception_utils import ExceptionUtils
+from hubstation.utils.string_utils import StringUtils
+
+
+class AsyncQbittorrent(AsyncBaseDownloader):
+    """
+    qBittorrent WebUI API异步客户端
+    """
+    # 下载器ID
+    client_id = "qbittorrent"
+    # 下载器类型
+    client_type = DownloaderType.QB
+    # 下载器名称
+    client_name = DownloaderType.QB.value
+
+    _logged_in = False
+
+    async def __login(self):
+        """
+        登录WebUI，SID保存在会话的Cookie中
+        """
+        session = await self.session()
+        async with session.post(f"{self.base_url}/api/v2/auth/login",
+                                data={"username": self.username or "", "password": self.password or ""}) as res:
+            text = await res.text()
+            self._logged_in = res.status == 200 and text.startswith("Ok")
+        return self._logged_in
+
+    async def __request(self, method, api, params=None, data=None):
+        """
+        调用WebUI接口，未登录或登录失效时登录后重试一次
+        :param api: 接口路径，如torrents/info
+        :return: 响应内容，json接口返回解析后的对象
+        """
+        session = await self.session()
+        for retry in range(2):
+            if not self._logged_in:
+                async with self._login_lock:
+                    if not self._logged_in and not await self.__login():
+                        raise aiohttp.ClientError(f"{self.client_name} {self.name} 登录失败")
+            async with session.request(method, f"{self.base_url}/api/v2/{api}", params=params, data=data) as res:
+                if res.status == 403 and not retry:
+                    self._logged_in = False
+                    continue
+                res.raise_for_status()
+                if res.content_type == "application/json":
+                    return await res.json()
+                return await res.text()
+
+    async def get_status(self):
+        try:
+            return True if await self.__request("GET", "app/version") else False
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return False
+
+    async def get_torrents(self, ids=None, status=None, tag=None, category=None):
+        """
+        获取种子列表，种子hash、状态、分类及第一个标签由下载器过滤，
+        WebAPI 2.8.3之前的版本会忽略标签参数，标签始终在本地按精确匹配再过滤一次
+        return: 种子列表, 是否发生异常
+        """
+        if tag and not isinstance(tag, list):
+            tag = [tag]
+        tags = [t for t in tag if t] if tag else []
+        if isinstance(status, list):
+            status = status[0] if status else None
+        if ids and isinstance(ids, list):
+            ids = "|".join(ids)
+        params = {}
+        if ids:
+            params["hashes"] = ids
+        if status:
+            params["filter"] = status
+        if category is not None:
+            params["category"] = category
+        if tags:
+            params["tag"] = tags[0]
+        try:
+            torrents = await self.__request("GET", "torrents/info", params=params) or []
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return [], True
+        torrents = [TorrentItem(torrent) for torrent in torrents]
+        if tags:
+            torrents = [torrent for torrent in torrents
+                        if set(tags).issubset(QbittorrentSnapshot.split_tags(torrent.get("tags")))]
+        return torrents, False
+
+    async def get_completed_torrents(self, ids=None, tag=None):
+        torrents, error = await self.get_torrents(status=["completed"], ids=ids, tag=tag)
+        return None if error else torrents or []
+
+    async def get_downloading_torrents(self, ids=None, tag=None):
+        torrents, error = await self.get_torrents(status=["downloading"], ids=ids, tag=tag)
+        return None if error else torrents or []
+
+    async def get_downloading_progress(self, tag=None, ids=None):
+        """
+        获取正在下载的种子进度，返回格式与Qbittorrent.get_downloading_progress一致
+        """
+        torrents = await self.get_downloading_torrents(tag=tag, ids=ids) or []
+        disp_torrents = []
+        for torrent in torrents:
+            # 进度
+            progress = round(torrent.get('progress') * 100, 1)
+            if torrent.get('state') in ['pausedDL']:
+                state = "Stoped"
+                speed = "已暂停"
+            else:
+                state = "Downloading"
+                _dlspeed = StringUtils.str_filesize(torrent.get('dlspeed'))
+                _upspeed = StringUtils.str_filesize(torrent.get('upspeed'))
+                if progress >= 100:
+                    speed = "%s%sB/s %s%sB/s" % (chr(8595), _dlspeed, chr(8593), _upspeed)
+                else:
+                    eta = StringUtils.str_timelong(torrent.get('eta'))
+                    speed = "%s%sB/s %s%sB/s %s" % (chr(8595), _dlspeed, chr(8593), _upspeed, eta)
+            disp_torrents.append({
+                'id': torrent.get('hash'),
+                'name': torrent.get('name'),
+                'speed': speed,
+                'state': state,
+                'progress': progress
+            })
+        return disp_torrents
+
+    async def add_torrent(self,
+                          content,
+                          is_paused=False,
+                          download_dir=None,
+                          tag=None,
+                          cookie=None,
+                          category=None,
+                          **kwargs):
+        """
+        添加种子
+        :param content: 种子链接或种子文件内容
+        :return: bool
+        """
+        if not content:
+            return False
+        data = aiohttp.FormData()
+        if isinstance(content, str):
+            data.add_field("urls", content)
+        else:
+            data.add_field("torrents", content, filename="file.torrent", content_type="application/x-bittorrent")
+        if download_dir:
+            data.add_field("savepath", download_dir)
+        if category:
+            data.add_field("category", category)
+        if tag:
+            data.add_field("tags", ",".join(tag) if isinstance(tag, list) else tag)
+        if cookie:
+            data.add_field("cookie", cookie)
+        data.add_field("paused", "true" if is_paused else "false")
+        try:
+            ret = await self.__request("POST", "torrents/add", data=data)
+            return True if ret and str(ret).find("Ok") != -1 else False
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return False
+
+    async def __torrents_action(self, action, ids, **kwargs):
+        if not ids:
+            return False
+        data = {"hashes": "|".join(ids) if isinstance(ids, list) else ids, **kwargs}
+        try:
+            await self.__request("POST", f"torrents/{action}", data=data)
+            return True
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return False
+
+    async def start_torrents(self, ids):
+        return await self.__torrents_action("resume", ids)
+
+    async def stop_torrents(self, ids):
+        return await self.__torrents_action("pause", ids)
+
+    async def delete_torrents(self, delete_file, ids):
+        return await self.__torrents_action("delete", ids, deleteFiles="true" if delete_file else "false")
@@ -0,0 +1,202 @@
+import base64
+
+import aiohttp
+
+from hubstation.constants import DownloaderType
+from hubstation.downloader.aio.base import AsyncBaseDownloader
+from hubstation.downloader.torrent_snapshot import TorrentItem
+from hubstation.utils.exception_utils import ExceptionUtils
+from hubstation.utils.string_utils import StringUtils
+
+
+class AsyncTransmission(AsyncBaseDownloader):
+    """
+    Transmission RPC异步客户端
+    """
+    # 下载器ID
+    client_id = "transmission"
+    # 下载器类型
+    client_type = DownloaderType.TR
+    # 下载器名称
+    client_name = DownloaderType.TR.value
+
+    # RPC返回的数字状态与transmission_rpc状态名称的对应关系
+    _STATUS = {
+        0: "stopped",
+        1: "check_pending",
+        2: "checking",
+        3: "download_pending",
+        4: "downloading",
+        5: "seed_pending",
+        6: "seeding",
+    }
+    # 默认查询的字段
+    _fields = ["id", "hashString", "name", "status", "labels", "totalSize", "percentDone", "rateDownload",
+               "rateUpload", "uploadRatio", "downloadDir", "addedDate", "doneDate", "error", "errorString"]
+
+    _session_id = ""
+
+    async def __rpc(self, method, arguments=None):
+        """
+        调用RPC接口，会话ID失效（409）时更新后重试一次
+        :return: 返回的arguments
+        """
+        session = await self.session()
+        auth = aiohttp.BasicAuth(self.username, self.password or "") if self.username else None
+        payload = {"method": method, "arguments": arguments or {}}
+        for retry in range(2):
+            async with session.post(f"{self.base_url}/transmission/rpc",
+                                    json=payload,
+                                    auth=auth,
+                                    headers={"X-Transmission-Session-Id": self._session_id}) as res:
+                if res.status == 409 and not retry:
+                    self._session_id = res.headers.get("X-Transmission-Session-Id") or ""
+                    continue
+                res.raise_for_status()
+                ret = await res.json(content_type=None)
+                if ret.get("result") != "success":
+                    raise aiohttp.ClientError(f"{self.client_name} {self.name} {method} 出错：{ret.get('result')}")
+                return ret.get("arguments") or {}
+
+    @staticmethod
+    def __parse_ids(ids):
+        """
+        统一处理种子ID，数字为种子编号，其余为hash
+        """
+        if ids is None:
+            return None
+        if not isinstance(ids, list):
+            ids = [ids]
+        return [int(x) if str(x).isdigit() else x for x in ids]
+
+    async def get_status(self):
+        try:
+            await self.__rpc("session-get", {"fields": ["version"]})
+            return True
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return False
+
+    async def get_torrents(self, ids=None, status=None, tag=None, fields=None):
+        """
+        获取种子列表，RPC只支持按ID过滤，状态和标签在本地过滤
+        :param fields: 需要返回的字段
+        返回结果 种子列表, 是否有错误
+        """
+        arguments = {"fields": fields or self._fields}
+        ids = self.__parse_ids(ids)
+        if ids:
+            arguments["ids"] = ids
+        try:
+            ret = await self.__rpc("torrent-get", arguments)
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return [], True
+        if status and not isinstance(status, list):
+            status = [status]
+        if tag and not isinstance(tag, list):
+            tag = [tag]
+        torrents = []
+        for torrent in ret.get("torrents") or []:
+            torrent = TorrentItem(torrent)
+            if "status" in torrent:
+                torrent["status"] = self._STATUS.get(torrent["status"], torrent["status"])
+            if status and torrent.get("status") not in status:
+                continue
+            labels = torrent.get("labels") or []
+            if tag and any(t and t not in labels for t in tag):
+                continue
+            torrents.append(torrent)
+        return torrents, False
+
+    async def get_completed_torrents(self, ids=None, tag=None):
+        torrents, error = await self.get_torrents(status=["seeding", "seed_pending"], ids=ids, tag=tag)
+        return None if error else torrents or []
+
+    async def get_downloading_torrents(self, ids=None, tag=None):
+        torrents, error = await self.get_torrents(status=["downloading", "download_pending"], ids=ids, tag=tag)
+        return None if error else torrents or []
+
+    async def get_downloading_progress(self, tag=None, ids=None):
+        """
+        获取正在下载及暂停中未完成的种子进度，返回格式与Transmission.get_downloading_progress一致
+        """
+        torrents, error = await self.get_torrents(status=["downloading", "download_pending", "stopped"],
+                                                  ids=ids, tag=tag)
+        if error:
+            return []
+        disp_torrents = []
+        for torrent in torrents:
+            if torrent.get("status") in ['stopped']:
+                # 已完成后暂停的不是下载任务
+                if (torrent.get("percentDone") or 0) >= 1:
+                    continue
+                state = "Stoped"
+                speed = "已暂停"
+            else:
+                state = "Downloading"
+                _dlspeed = StringUtils.str_filesize(torrent.get("rateDownload"))
+                _upspeed = StringUtils.str_filesize(torrent.get("rateUpload"))
+                speed = "%s%sB/s %s%sB/s" % (chr(8595), _dlspeed, chr(8593), _upspeed)
+            # 进度
+            progress = round((torrent.get("percentDone") or 0) * 100)
+            disp_torrents.append({
+                'id': torrent.get("hashString"),
+                'name': torrent.get("name"),
+                'speed': speed,
+                'state': state,
+                'progress': progress
+            })
+        return disp_torrents
+
+    async def add_torrent(self,
+                          content,
+                          is_paused=False,
+                          download_dir=None,
+                          tag=None,
+                          cookie=None,
+                          **kwargs):
+        """
+        添加种子
+        :param content: 种子链接或种子文件内容
+        :return: 添加的种子信息（含hashString），失败返回False
+        """
+        if not content:
+            return False
+        if isinstance(content, str):
+            arguments = {"filename": content}
+        else:
+            arguments = {"metainfo": base64.b64encode(content).decode()}
+        arguments["paused"] = bool(is_paused)
+        if download_dir:
+            arguments["download-dir"] = download_dir
+        if tag:
+            arguments["labels"] = tag if isinstance(tag, list) else [tag]
+        if cookie:
+            arguments["cookies"] = cookie
+        try:
+            ret = await self.__rpc("torrent-add", arguments)
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return False
+        torrent = ret.get("torrent-added") or ret.get("torrent-duplicate")
+        return TorrentItem(torrent) if torrent else False
+
+    async def __torrents_action(self, method, ids, **kwargs):
+        if not ids:
+            return False
+        try:
+            await self.__rpc(method, {"ids": self.__parse_ids(ids), **kwargs})
+            return True
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return False
+
+    async def start_torrents(self, ids):
+        return await self.__torrents_action("torrent-start", ids)
+
+    async def stop_torrents(self, ids):
+        return await self.__torrents_action("torrent-stop", ids)
+
+    async def delete_torrents(self, delete_file, ids):
+        return await self.__torrents_action("torrent-remove", ids, **{"delete-local-data": bool(delete_file)})
@@ -94,12 +94,20 @@ class BaseDownloader(metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def get_transfer_task(self, tag, match_path=None):
+    def get_transfer_task(self, tag, match_path=None, ids=None):
         """
         获取需要转移的种子列表
+        :param ids: 种子ID列表，为空则检查全部已完成的种子
         """
         pass
 
+    def get_completion_state(self):
+        """
+        获取下载完成状态，供CompletionWatcher增量检测新完成的种子
+        :return: 已完成种子ID集合, 是否有正在下载的种子；不支持时返回None, False，按固定间隔全量扫描
+        """
+        return None, False
+
     @abstractmethod
     def get_remove_torrents(self, config):
         """
@@ -50,26 +50,31 @@ class Pan115(BaseDownloader, ABC):
         return True
 
     def get_torrents(self, ids=None, status=None, **kwargs):
+        """
+        获取离线任务列表，只对通过ID和状态过滤的任务查询保存路径
+        """
         tlist = []
         if not self._client:
             return tlist
-        ret, tasks = self._client.gettasklist(page=1)
-        if not ret:
+        if ids and not isinstance(ids, list):
+            ids = [ids]
+        for task in self._client.itertasklist(page=1):
+            if ids and task.get("info_hash") not in ids:
+                continue
+            if status and task.get("status") not in status:
+                continue
+            tlist.append(task)
+        if self._client.err:
             log.info(f"【{self.client_type}】获取任务列表错误：{self._client.err}")
-            return tlist
-        if tasks:
-            for task in tasks:
-                if ids:
-                    if task.get("info_hash") not in ids:
-                        continue
-                if status:
-                    if task.get("status") not in status:
-                        continue
-                ret, tdir = self._client.getiddir(task.get("file_id"))
-                task["path"] = tdir
-                tlist.append(task)
-
-        return tlist or []
+            return []
+        # 同一目录只查询一次，查询结果有缓存
+        paths = {}
+        for task in tlist:
+            file_id = task.get("file_id")
+            if file_id not in paths:
+                _, paths[file_id] = self._client.getiddir(file_id)
+            task["path"] = paths[file_id]
+        return tlist
 
     def get_completed_torrents(self, **kwargs):
         return self.get_torrents(status=[2])
@@ -1,10 +1,11 @@
 import os
-import re
-from datetime import time, datetime
+import time
 
 from hubstation import log
 from hubstation.constants import DownloaderType
 from hubstation.downloader.base import BaseDownloader
+from hubstation.downloader.remove_policy import RemovePolicy, TorrentColumns
+from hubstation.downloader.torrent_snapshot import QbittorrentSnapshot
 from hubstation.utils.exception_utils import ExceptionUtils
 from hubstation.utils.string_utils import StringUtils
 
@@ -22,6 +23,8 @@ class Qbittorrent(BaseDownloader):
     _torrent_management = False
 
     qbc = None
+    # 种子快照，增量同步种子列表
+    snapshot = None
     ver = None
     host = None
     port = None
@@ -62,6 +65,7 @@ class Qbittorrent(BaseDownloader):
     def connect(self):
         if self.host and self.port:
             self.qbc = self.__login_qbittorrent()
+            self.snapshot = QbittorrentSnapshot(self.qbc) if self.qbc else None
 
     def __login_qbittorrent(self):
         """
@@ -176,34 +180,45 @@ class Qbittorrent(BaseDownloader):
                 return category_name
         return None
 
-    def get_torrents(self, ids=None, status=None, tag=None):
+    def get_torrents(self, ids=None, status=None, tag=None, category=None):
         """
-        获取种子列表
+        获取种子列表，标签按精确匹配过滤
+        :param category: 分类，None为不过滤
         return: 种子列表, 是否发生异常
         """
         if not self.qbc:
             return [], True
+        if tag and not isinstance(tag, list):
+            tag = [tag]
+        tags = [t for t in tag if t] if tag else []
         try:
-            torrents = self.qbc.torrents_info(torrent_hashes=ids,
-                                              status_filter=status)
-            if tag:
-                results = []
-                if not isinstance(tag, list):
-                    tag = [tag]
-                for torrent in torrents:
-                    include_flag = True
-                    for t in tag:
-                        if t and t not in torrent.get("tags"):
-                            include_flag = False
-                            break
-                    if include_flag:
-                        results.append(torrent)
-                return results or [], False
+            # 优先从快照读取，快照同步失败或不支持的过滤条件时查询下载器
+            torrents = self.snapshot.get_torrents(ids=ids,
+                                                  status=status,
+                                                  tags=tags,
+                                                  category=category) if self.snapshot else None
+            if torrents is None:
+                # 标签、分类、种子hash由下载器过滤，接口只支持单个标签，且WebAPI 2.8.3之前的版本会忽略标签参数，
+                # 标签始终在本地按精确匹配再过滤一次
+                torrents = self.qbc.torrents_info(torrent_hashes=ids,
+                                                  status_filter=status,
+                                                  category=category,
+                                                  tag=tags[0] if tags else None) or []
+                if tags:
+                    torrents = [torrent for torrent in torrents
+                                if set(tags).issubset(QbittorrentSnapshot.split_tags(torrent.get("tags")))]
             return torrents or [], False
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
             return [], True
 
+    def __invalidate_snapshot(self):
+        """
+        修改种子后标记快照过期，下次查询时增量同步
+        """
+        if self.snapshot:
+            self.snapshot.invalidate()
+
     def get_completed_torrents(self, ids=None, tag=None):
         """
         获取已完成的种子
@@ -233,7 +248,9 @@ class Qbittorrent(BaseDownloader):
         :param tag: 标签内容
         """
         try:
-            return self.qbc.torrents_remove_tags(torrent_hashes=ids, tags=tag)
+            ret = self.qbc.torrents_remove_tags(torrent_hashes=ids, tags=tag)
+            self.__invalidate_snapshot()
+            return ret
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
             return False
@@ -247,6 +264,7 @@ class Qbittorrent(BaseDownloader):
         try:
             # 打标签
             self.qbc.torrents_add_tags(tags="已整理", torrent_hashes=ids)
+            self.__invalidate_snapshot()
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
 
@@ -266,6 +284,7 @@ class Qbittorrent(BaseDownloader):
                 old_tags = list(map(lambda s: s.strip(), (torrent.get("tags") or "").split(",")))
                 self.qbc.torrents_remove_tags(old_tags, torrent_hashes=ids)
                 self.qbc.torrents_add_tags(tags, torrent_hashes=ids)
+            self.__invalidate_snapshot()
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
 
@@ -278,15 +297,16 @@ class Qbittorrent(BaseDownloader):
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
 
-    def get_transfer_task(self, tag=None, match_path=False):
+    def get_transfer_task(self, tag=None, match_path=False, ids=None):
         """
         获取下载文件转移任务种子
+        :param ids: 种子hash列表，为空则检查全部已完成的种子
         """
         # 处理下载完成的任务
-        torrents = self.get_completed_torrents() or []
+        torrents = self.get_completed_torrents(ids=ids, tag=tag) or []
         trans_tasks = []
         for torrent in torrents:
-            torrent_tags = torrent.get("tags") or ""
+            torrent_tags = QbittorrentSnapshot.split_tags(torrent.get("tags"))
             # 含"已整理"tag的不处理
             if "已整理" in torrent_tags:
                 continue
@@ -317,73 +337,48 @@ class Qbittorrent(BaseDownloader):
             })
         return trans_tasks
 
+    def get_completion_state(self):
+        """
+        获取下载完成状态，由快照按sync/maindata增量同步
+        """
+        if not self.snapshot:
+            return None, False
+        return self.snapshot.get_completion_state()
+
     def get_remove_torrents(self, config=None):
         """
         获取自动删种任务种子
         """
         if not config:
             return []
-        remove_torrents = []
-        remove_torrents_ids = []
+        qb_category = config.get("qb_category")
+        # 分类不由下载器过滤，同数据的种子可能在其它分类中，分类条件只在选择待删除种子时生效
         torrents, error_flag = self.get_torrents(tag=config.get("filter_tags"))
         if error_flag:
             return []
-        ratio = config.get("ratio")
-        # 做种时间 单位：小时
-        seeding_time = config.get("seeding_time")
-        # 大小 单位：GB
-        size = config.get("size")
-        minsize = size[0] * 1024 * 1024 * 1024 if size else 0
-        maxsize = size[-1] * 1024 * 1024 * 1024 if size else 0
-        # 平均上传速度 单位 KB/s
-        upload_avs = config.get("upload_avs")
-        savepath_key = config.get("savepath_key")
-        tracker_key = config.get("tracker_key")
-        qb_state = config.get("qb_state")
-        qb_category = config.get("qb_category")
+        policy = RemovePolicy(config,
+                              states=config.get("qb_state"),
+                              categories=qb_category)
+        columns = TorrentColumns()
         for torrent in torrents:
-            date_done = torrent.completion_on if torrent.completion_on > 0 else torrent.added_on
-            date_now = int(time.mktime(datetime.now().timetuple()))
-            torrent_seeding_time = date_now - date_done if date_done else 0
-            torrent_upload_avs = torrent.uploaded / torrent_seeding_time if torrent_seeding_time else 0
-            if ratio and torrent.ratio <= ratio:
-                continue
-            if seeding_time and torrent_seeding_time <= seeding_time * 3600:
-                continue
-            if size and (torrent.size >= maxsize or torrent.size <= minsize):
-                continue
-            if upload_avs and torrent_upload_avs >= upload_avs * 1024:
-                continue
-            if savepath_key and not re.findall(savepath_key, torrent.save_path, re.I):
-                continue
-            if tracker_key and not re.findall(tracker_key, torrent.tracker, re.I):
-                continue
-            if qb_state and torrent.state not in qb_state:
-                continue
-            if qb_category and torrent.category not in qb_category:
-                continue
+            columns.append(name=torrent.name,
+                           size=torrent.size,
+                           ratio=torrent.ratio,
+                           done_date=torrent.completion_on if torrent.completion_on > 0 else torrent.added_on,
+                           uploaded=torrent.uploaded,
+                           save_path=torrent.save_path,
+                           trackers=[torrent.tracker] if torrent.tracker else [],
+                           state=torrent.state,
+                           category=torrent.category)
+        remove_torrents = []
+        for i in policy.evaluate(columns):
+            torrent = torrents[i]
             remove_torrents.append({
                 "id": torrent.hash,
                 "name": torrent.name,
                 "site": StringUtils.get_url_sld(torrent.tracker),
                 "size": torrent.size
             })
-            remove_torrents_ids.append(torrent.hash)
-        if config.get("samedata") and remove_torrents:
-            remove_torrents_plus = []
-            for remove_torrent in remove_torrents:
-                name = remove_torrent.get("name")
-                size = remove_torrent.get("size")
-                for torrent in torrents:
-                    if torrent.name == name and torrent.size == size and torrent.hash not in remove_torrents_ids:
-                        remove_torrents_plus.append({
-                            "id": torrent.hash,
-                            "name": torrent.name,
-                            "site": StringUtils.get_url_sld(torrent.tracker),
-                            "size": torrent.size
-                        })
-            remove_torrents_plus += remove_torrents
-            return remove_torrents_plus
         return remove_torrents
 
     def __get_last_add_torrentid_by_tag(self, tag, status=None):
@@ -401,6 +396,24 @@ class Qbittorrent(BaseDownloader):
         else:
             return None
 
+    def get_torrent_id_by_hash(self, torrent_hash, retry=3):
+        """
+        添加下载后通过本地计算的info-hash确认种子已添加，QB处理添加请求后种子即可查到，只需查询一次
+        :param torrent_hash: 种子info-hash
+        :param retry: 未查到时的重试次数，每次等待0.5秒
+        :return: 种子ID，未查到时返回None
+        """
+        for i in range(retry + 1):
+            if i:
+                time.sleep(0.5)
+            torrents, error_flag = self.get_torrents(ids=torrent_hash)
+            if error_flag:
+                return None
+            if torrents:
+                return torrents[0].get("hash")
+            self.__invalidate_snapshot()
+        return None
+
     def get_torrent_id_by_tag(self, tag, status=None):
         """
         通过标签多次尝试获取刚添加的种子ID，并移除标签
@@ -515,6 +528,7 @@ class Qbittorrent(BaseDownloader):
                                             seeding_time_limit=seeding_time_limit,
                                             use_auto_torrent_management=is_auto,
                                             cookie=cookie)
+            self.__invalidate_snapshot()
             return True if qbc_ret and str(qbc_ret).find("Ok") != -1 else False
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
@@ -524,7 +538,9 @@ class Qbittorrent(BaseDownloader):
         if not self.qbc:
             return False
         try:
-            return self.qbc.torrents_resume(torrent_hashes=ids)
+            ret = self.qbc.torrents_resume(torrent_hashes=ids)
+            self.__invalidate_snapshot()
+            return ret
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
             return False
@@ -533,7 +549,9 @@ class Qbittorrent(BaseDownloader):
         if not self.qbc:
             return False
         try:
-            return self.qbc.torrents_pause(torrent_hashes=ids)
+            ret = self.qbc.torrents_pause(torrent_hashes=ids)
+            self.__invalidate_snapshot()
+            return ret
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
             return False
@@ -545,6 +563,7 @@ class Qbittorrent(BaseDownloader):
             return False
         try:
             self.qbc.torrents_delete(delete_files=delete_file, torrent_hashes=ids)
+            self.__invalidate_snapshot()
             return True
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
@@ -671,7 +690,9 @@ class Qbittorrent(BaseDownloader):
         if not self.qbc:
             return False
         try:
-            return self.qbc.torrents_recheck(torrent_hashes=ids)
+            ret = self.qbc.torrents_recheck(torrent_hashes=ids)
+            self.__invalidate_snapshot()
+            return ret
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
             return False
@@ -1,10 +1,10 @@
 import os
-import re
-from datetime import time, datetime
+import time
 
 from hubstation import log
 from hubstation.constants import DownloaderType
 from hubstation.downloader.base import BaseDownloader
+from hubstation.downloader.remove_policy import RemovePolicy, TorrentColumns
 from hubstation.utils.exception_utils import ExceptionUtils
 from hubstation.utils.string_utils import StringUtils
 
@@ -22,9 +22,20 @@ class Transmission(BaseDownloader):
               "leftUntilDone", "rateDownload", "rateUpload", "recheckProgress", "rateDownload", "rateUpload",
               "peersGettingFromUs", "peersSendingToUs", "uploadRatio", "uploadedEver", "downloadedEver", "downloadDir",
               "error", "errorString", "doneDate", "queuePosition", "activityDate", "trackers"]
+    # 各查询场景只需要的字段，种子较多时大幅减少RPC返回的数据量；status、labels用于本地过滤
+    _trarg_transfer = ["id", "hashString", "name", "status", "labels", "downloadDir"]
+    _trarg_progress = ["id", "hashString", "name", "status", "labels", "percentDone", "rateDownload", "rateUpload"]
+    _trarg_remove = ["id", "hashString", "name", "status", "labels", "totalSize", "addedDate", "doneDate",
+                     "uploadRatio", "downloadDir", "trackers", "trackerStats", "error", "errorString"]
+    _trarg_state = ["id", "hashString", "status"]
+    # recently-active只返回最近60秒内有变化的种子，距上次检测超过该时间时改为全量查询
+    _recently_active_window = 60
 
     # 私有属性
     _client_config = {}
+    # 种子ID-(hash, 状态)，增量检测下载完成状态用
+    _completion_state = None
+    _completion_state_at = 0
 
     trc = None
     host = None
@@ -60,6 +71,7 @@ class Transmission(BaseDownloader):
     def connect(self):
         if self.host and self.port:
             self.trc = self.__login_transmission()
+            self._completion_state = None
 
     def __login_transmission(self):
         """
@@ -94,16 +106,17 @@ class Transmission(BaseDownloader):
             ids = int(ids)
         return ids
 
-    def get_torrents(self, ids=None, status=None, tag=None):
+    def get_torrents(self, ids=None, status=None, tag=None, fields=None):
         """
-        获取种子列表
+        获取种子列表，Transmission RPC只支持按ID过滤，状态和标签在本地过滤
+        :param fields: 需要返回的字段，默认为_trarg
         返回结果 种子列表, 是否有错误
         """
         if not self.trc:
             return [], True
         ids = self.__parse_ids(ids)
         try:
-            torrents = self.trc.get_torrents(ids=ids, arguments=self._trarg)
+            torrents = self.trc.get_torrents(ids=ids, arguments=fields or self._trarg)
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
             return [], True
@@ -126,7 +139,7 @@ class Transmission(BaseDownloader):
                 ret_torrents.append(torrent)
         return ret_torrents, False
 
-    def get_completed_torrents(self, ids=None, tag=None):
+    def get_completed_torrents(self, ids=None, tag=None, fields=None):
         """
         获取已完成的种子列表
         return 种子列表, 发生错误时返回None
@@ -134,13 +147,13 @@ class Transmission(BaseDownloader):
         if not self.trc:
             return None
         try:
-            torrents, error = self.get_torrents(status=["seeding", "seed_pending"], ids=ids, tag=tag)
+            torrents, error = self.get_torrents(status=["seeding", "seed_pending"], ids=ids, tag=tag, fields=fields)
             return None if error else torrents or []
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
             return None
 
-    def get_downloading_torrents(self, ids=None, tag=None):
+    def get_downloading_torrents(self, ids=None, tag=None, fields=None):
         """
         获取正在下载的种子列表
         return 种子列表, 发生错误时返回None
@@ -150,7 +163,8 @@ class Transmission(BaseDownloader):
         try:
             torrents, error = self.get_torrents(ids=ids,
                                                 status=["downloading", "download_pending"],
-                                                tag=tag)
+                                                tag=tag,
+                                                fields=fields)
             return None if error else torrents or []
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
@@ -270,12 +284,13 @@ class Transmission(BaseDownloader):
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
 
-    def get_transfer_task(self, tag=None, match_path=None):
+    def get_transfer_task(self, tag=None, match_path=None, ids=None):
         """
         获取下载文件转移任务种子
+        :param ids: 种子ID或hash列表，为空则检查全部已完成的种子
         """
         # 处理下载完成的任务
-        torrents = self.get_completed_torrents() or []
+        torrents = self.get_completed_torrents(ids=ids, fields=self._trarg_transfer) or []
         trans_tasks = []
         for torrent in torrents:
             # 3.0版本以下的Transmission没有labels
@@ -307,81 +322,71 @@ class Transmission(BaseDownloader):
             })
         return trans_tasks
 
+    def get_completion_state(self):
+        """
+        获取下载完成状态，通过recently-active只查询最近有变化的种子，并合并到上次的状态中
+        """
+        if not self.trc:
+            return None, False
+        now = time.time()
+        try:
+            if self._completion_state is None or now - self._completion_state_at > self._recently_active_window:
+                torrents = self.trc.get_torrents(arguments=self._trarg_state)
+                removed = []
+                state = {}
+            else:
+                torrents, removed = self.trc.get_recently_active_torrents(arguments=self._trarg_state)
+                state = dict(self._completion_state)
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return None, False
+        for tid in removed or []:
+            state.pop(tid, None)
+        for torrent in torrents:
+            state[torrent.id] = (torrent.hashString, torrent.status)
+        self._completion_state = state
+        self._completion_state_at = now
+        completed = set()
+        active = False
+        for torrent_hash, status in state.values():
+            if status in ["seeding", "seed_pending"]:
+                completed.add(torrent_hash)
+            elif status in ["downloading", "download_pending"]:
+                active = True
+        return completed, active
+
     def get_remove_torrents(self, config=None):
         """
         获取自动删种任务
         """
         if not config:
             return []
-        remove_torrents = []
-        remove_torrents_ids = []
         torrents, error_flag = self.get_torrents(tag=config.get("filter_tags"),
-                                                 status=config.get("tr_state"))
+                                                 status=config.get("tr_state"),
+                                                 fields=self._trarg_remove)
         if error_flag:
             return []
-        ratio = config.get("ratio")
-        # 做种时间 单位：小时
-        seeding_time = config.get("seeding_time")
-        # 大小 单位：GB
-        size = config.get("size")
-        minsize = size[0] * 1024 * 1024 * 1024 if size else 0
-        maxsize = size[-1] * 1024 * 1024 * 1024 if size else 0
-        # 平均上传速度 单位 KB/s
-        upload_avs = config.get("upload_avs")
-        savepath_key = config.get("savepath_key")
-        tracker_key = config.get("tracker_key")
-        tr_error_key = config.get("tr_error_key")
+        policy = RemovePolicy(config, error_key=config.get("tr_error_key"))
+        columns = TorrentColumns()
         for torrent in torrents:
             date_done = torrent.date_done or torrent.date_added
-            date_now = int(time.mktime(datetime.now().timetuple()))
-            torrent_seeding_time = date_now - int(time.mktime(date_done.timetuple())) if date_done else 0
-            torrent_uploaded = torrent.ratio * torrent.total_size
-            torrent_upload_avs = torrent_uploaded / torrent_seeding_time if torrent_seeding_time else 0
-            if ratio and torrent.ratio <= ratio:
-                continue
-            if seeding_time and torrent_seeding_time <= seeding_time * 3600:
-                continue
-            if size and (torrent.total_size >= maxsize or torrent.total_size <= minsize):
-                continue
-            if upload_avs and torrent_upload_avs >= upload_avs * 1024:
-                continue
-            if savepath_key and not re.findall(savepath_key, torrent.download_dir, re.I):
-                continue
-            if tracker_key:
-                if not torrent.trackers:
-                    continue
-                else:
-                    tacker_key_flag = False
-                    for tracker in torrent.trackers:
-                        if re.findall(tracker_key, tracker.get("announce", ""), re.I):
-                            tacker_key_flag = True
-                            break
-                    if not tacker_key_flag:
-                        continue
-            if tr_error_key and not re.findall(tr_error_key, torrent.error_string, re.I):
-                continue
+            columns.append(name=torrent.name,
+                           size=torrent.total_size,
+                           ratio=torrent.ratio,
+                           done_date=int(time.mktime(date_done.timetuple())) if date_done else 0,
+                           uploaded=torrent.ratio * torrent.total_size,
+                           save_path=torrent.download_dir,
+                           trackers=[tracker.get("announce", "") for tracker in torrent.trackers or []],
+                           error=torrent.error_string)
+        remove_torrents = []
+        for i in policy.evaluate(columns):
+            torrent = torrents[i]
             remove_torrents.append({
                 "id": torrent.hashString,
                 "name": torrent.name,
                 "site": torrent.trackers[0].get("sitename") if torrent.trackers else "",
                 "size": torrent.total_size
             })
-            remove_torrents_ids.append(torrent.hashString)
-        if config.get("samedata") and remove_torrents:
-            remove_torrents_plus = []
-            for remove_torrent in remove_torrents:
-                name = remove_torrent.get("name")
-                size = remove_torrent.get("size")
-                for torrent in torrents:
-                    if torrent.name == name and torrent.total_size == size and torrent.hashString not in remove_torrents_ids:
-                        remove_torrents_plus.append({
-                            "id": torrent.hashString,
-                            "name": torrent.name,
-                            "site": torrent.trackers[0].get("sitename") if torrent.trackers else "",
-                            "size": torrent.total_size
-                        })
-            remove_torrents_plus += remove_torrents
-            return remove_torrents_plus
         return remove_torrents
 
     def add_torrent(self, content,
@@ -510,12 +515,18 @@ class Transmission(BaseDownloader):
 
     def get_downloading_progress(self, tag=None, ids=None):
         """
-        获取正在下载的种子进度
+        获取正在下载及暂停中未完成的种子进度
         """
-        Torrents = self.get_downloading_torrents(tag=tag, ids=ids) or []
+        Torrents, error = self.get_torrents(status=["downloading", "download_pending", "stopped"],
+                                            ids=ids, tag=tag, fields=self._trarg_progress)
+        if error:
+            return []
         DispTorrents = []
         for torrent in Torrents:
             if torrent.status in ['stopped']:
+                # 已完成后暂停的不是下载任务
+                if torrent.progress >= 100:
+                    continue
                 state = "Stoped"
                 speed = "已暂停"
             else:
@@ -0,0 +1,85 @@
+import time
+
+from hubstation.utils.exception_utils import ExceptionUtils
+
+
+class CompletionWatcher:
+    """
+    下载完成检测：比较下载器两次检测之间的完成状态，只对新完成的种子触发转移；
+    有正在下载的种子或刚有种子完成时按最短间隔检测，空闲时间隔逐步加倍直到最长间隔，
+    全量扫描只作为低频的兜底整理（启动时、按整理间隔、或下载器不支持增量状态时）
+    """
+    # 最短检测间隔，单位秒
+    _min_interval = 15
+    # 最长检测间隔，单位秒
+    _max_interval = 300
+    # 全量整理间隔，单位秒
+    _reconcile_interval = 3600
+
+    def __init__(self, client, min_interval=None, max_interval=None, reconcile_interval=None):
+        """
+        :param client: 下载器实例，需实现get_completion_state，未实现时每个最长间隔全量扫描一次
+        :param min_interval: 最短检测间隔
+        :param max_interval: 最长检测间隔
+        :param reconcile_interval: 全量整理间隔
+        """
+        self._client = client
+        if min_interval:
+            self._min_interval = min_interval
+        if max_interval:
+            self._max_interval = max(max_interval, self._min_interval)
+        if reconcile_interval:
+            self._reconcile_interval = reconcile_interval
+        self._interval = self._min_interval
+        self._completed = None
+        self._next_poll = 0
+        self._next_reconcile = 0
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def min_interval(self):
+        return self._min_interval
+
+    def due(self, now=None):
+        """
+        是否到了下次检测时间
+        """
+        return (now or time.time()) >= self._next_poll
+
+    def __get_state(self):
+        get_completion_state = getattr(self._client, "get_completion_state", None)
+        if not get_completion_state:
+            return None, False
+        try:
+            return get_completion_state()
+        except Exception as err:
+            ExceptionUtils.exception_traceback(err)
+            return None, False
+
+    def poll(self, now=None):
+        """
+        检测一次下载完成状态
+        :return: 新完成的种子hash列表, 是否需要全量扫描
+        """
+        now = now or time.time()
+        completed, active = self.__get_state()
+        if completed is None:
+            # 不支持增量状态或查询出错，退回为按最长间隔全量扫描
+            self._completed = None
+            self._interval = self._max_interval
+            self._next_poll = now + self._interval
+            return [], True
+        reconcile = now >= self._next_reconcile or self._completed is None
+        new_ids = [] if self._completed is None else sorted(completed - self._completed)
+        self._completed = completed
+        if reconcile:
+            self._next_reconcile = now + self._reconcile_interval
+        if new_ids or active:
+            self._interval = self._min_interval
+        else:
+            self._interval = min(self._interval * 2, self._max_interval)
+        self._next_poll = now + self._interval
+        return new_ids, reconcile
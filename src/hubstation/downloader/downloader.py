@@ -1,5 +1,6 @@
 import os
-from threading import Lock
+from concurrent.futures import as_completed, wait
+from threading import Lock, Semaphore
 from enum import Enum
 import json
 
@@ -8,6 +9,8 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from hubstation import log
 from hubstation.config.config import Config, PT_TAG, PT_TRANSFER_INTERVAL
 from hubstation.constants import DownloaderType
+from hubstation.downloader.aio import AsyncDownloaderPool
+from hubstation.downloader.completion_watcher import CompletionWatcher
 from hubstation.helper.submodule_helper import SubmoduleHelper
 from hubstation.helper.thread_helper import ThreadHelper
 from hubstation.utils.commons import singleton
@@ -32,6 +35,14 @@ class Downloader:
     # 下载器ID-名称枚举类
     _DownloaderEnum = None
     _scheduler = None
+    # 批量下载时每个站点同时下载种子文件的数量
+    _site_concurrency = 2
+    # 下载器ID-添加任务锁
+    _client_add_locks = {}
+    # 异步客户端，并发查询多个下载器
+    _async_pool = None
+    # 下载器ID-下载完成检测
+    _completion_watchers = {}
 
     def __init__(self):
         self._downloader_schema = SubmoduleHelper.import_submodules(
@@ -87,6 +98,11 @@ class Downloader:
                 "config": config,
                 "download_dir": json.loads(downloader_conf.DOWNLOAD_DIR)
             }
+        # 已启用下载器的异步客户端
+        if self._async_pool:
+            self._async_pool.close()
+        self._async_pool = AsyncDownloaderPool({did: conf for did, conf in self._downloader_confs.items()
+                                                if conf.get("enabled")})
         # 下载器ID-名称枚举类生成
         self._DownloaderEnum = Enum('DownloaderIdName',
                                     {did: conf.get("name") for did, conf in self._downloader_confs.items()})
@@ -151,21 +167,54 @@ class Downloader:
         """
         转移任务调度
         """
+        # 下载完成检测依赖文件转移，未加载文件转移时不启动检测，避免每次调度都出错
+        if not callable(getattr(self, "transfer", None)):
+            log.warn("【Downloader】未加载下载文件转移，不启动下载完成检测")
+            return
         # 移出现有任务
         self.stop_service()
         # 启动转移任务
         if not self._monitor_downloader_ids:
             return
         self._scheduler = BackgroundScheduler(timezone=Config().get_timezone())
+        self._completion_watchers = {}
         for downloader_id in self._monitor_downloader_ids:
-            self._scheduler.add_job(func=self.transfer,
+            watcher = CompletionWatcher(self.__get_client(downloader_id), max_interval=PT_TRANSFER_INTERVAL)
+            self._completion_watchers[downloader_id] = watcher
+            # 按最短检测间隔调度，实际是否检测由CompletionWatcher按下载器活跃程度决定
+            self._scheduler.add_job(func=self.__watch_completion,
                                     args=[downloader_id],
                                     trigger='interval',
-                                    seconds=PT_TRANSFER_INTERVAL)
+                                    seconds=watcher.min_interval)
         self._scheduler.print_jobs()
         self._scheduler.start()
         log.info("下载文件转移服务启动，目的目录：媒体库")
 
+    def __watch_completion(self, downloader_id):
+        """
+        检测下载器新完成的种子，只转移新完成的种子，需要全量整理时检查全部已完成的种子
+        """
+        watcher = self._completion_watchers.get(downloader_id)
+        if not watcher or not watcher.due():
+            return
+        ids, reconcile = watcher.poll()
+        if reconcile:
+            self.transfer(downloader_id)
+        elif ids:
+            log.info(f"【Downloader】下载器 {downloader_id} 有 {len(ids)} 个种子下载完成")
+            self.transfer(downloader_id, ids=ids)
+
+    def get_all_downloading_progress(self, tag=None, downloader_ids=None):
+        """
+        并发查询所有已启用下载器正在下载的种子进度
+        :param tag: 种子标签
+        :param downloader_ids: 下载器ID列表，为空则查询全部
+        :return: {下载器ID: 进度列表}，查询出错的下载器为None
+        """
+        if not self._async_pool:
+            return {}
+        return self._async_pool.get_downloading_progress(tag=tag, dids=downloader_ids)
+
     def download(self,
                  media_info,
                  is_paused=None,
@@ -195,6 +244,146 @@ class Downloader:
         :param proxy: 是否使用代理，指定该选项为 True/False 会覆盖 site_info 的设置
         :return: 下载器类型, 种子ID，错误信息
         """
+        # 下载种子文件，并读取信息
+        torrent = self.__get_torrent(media_info=media_info,
+                                     torrent_file=torrent_file,
+                                     proxy=proxy)
+        return self.__add_download(media_info=media_info,
+                                   torrent=torrent,
+                                   is_paused=is_paused,
+                                   tag=tag,
+                                   download_dir=download_dir,
+                                   download_setting=download_setting,
+                                   downloader_id=downloader_id,
+                                   upload_limit=upload_limit,
+                                   download_limit=download_limit,
+                                   in_from=in_from,
+                                   user_name=user_name)
+
+    def download_batch(self,
+                       media_infos,
+                       site_concurrency=None,
+                       proxy=None,
+                       **kwargs):
+        """
+        批量添加下载任务：并发下载种子文件，每个站点限制并发数；同一下载器的添加请求串行发送，不合并为一次请求；下载历史在全部完成后批量写入
+        :param media_infos: 需下载的媒体信息列表
+        :param site_concurrency: 每个站点同时下载种子文件的数量
+        :param proxy: 是否使用代理，同download
+        :param kwargs: 其它下载参数，同download
+        :return: 生成器，按完成顺序返回：媒体信息, 下载器ID, 种子ID, 错误信息
+        """
+        if not media_infos:
+            return
+        if not site_concurrency:
+            site_concurrency = self._site_concurrency
+        # 每个站点一个信号量，在提交任务前创建，避免并发创建
+        site_semaphores = {}
+        for media_info in media_infos:
+            site = self.__get_torrent_site(media_info)
+            if site and site not in site_semaphores:
+                site_semaphores[site] = Semaphore(site_concurrency)
+        histories = []
+
+        def __download(_media_info):
+            semaphore = site_semaphores.get(self.__get_torrent_site(_media_info))
+            if semaphore:
+                with semaphore:
+                    torrent = self.__get_torrent(media_info=_media_info, proxy=proxy)
+            else:
+                torrent = self.__get_torrent(media_info=_media_info, proxy=proxy)
+            return self.__add_download(media_info=_media_info,
+                                       torrent=torrent,
+                                       histories=histories,
+                                       **kwargs)
+
+        futures = {ThreadHelper().executor.submit(__download, media_info): media_info
+                   for media_info in media_infos}
+        try:
+            for future in as_completed(futures):
+                media_info = futures[future]
+                try:
+                    downloader_id, download_id, retmsg = future.result()
+                except Exception as e:
+                    ExceptionUtils.exception_traceback(e)
+                    downloader_id, download_id, retmsg = None, None, str(e)
+                yield media_info, downloader_id, download_id, retmsg
+        finally:
+            # 调用方提前结束迭代时，仍需等待已提交的任务完成后再登记下载历史
+            wait(futures)
+            if histories:
+                self.dbhelper.insert_download_histories(histories)
+
+    def __get_client_lock(self, downloader_id):
+        """
+        获取下载器的添加任务锁
+        """
+        with client_lock:
+            if downloader_id not in self._client_add_locks:
+                self._client_add_locks[downloader_id] = Lock()
+            return self._client_add_locks[downloader_id]
+
+    @staticmethod
+    def __get_torrent_site(media_info):
+        """
+        获取种子下载链接的站点域名，磁力链接不需要下载返回None
+        """
+        url = media_info.enclosure
+        if not url or url.startswith("magnet:"):
+            return None
+        return StringUtils.get_url_domain(url)
+
+    def __get_torrent(self, media_info, torrent_file=None, proxy=None):
+        """
+        下载种子文件或读取本地种子文件，并解析种子信息
+        :return: 种子链接、种子内容、站点信息、种子文件列表主目录、种子文件列表、错误信息
+        """
+        # 默认值
+        site_info, dl_files_folder, dl_files, retmsg = {}, "", [], ""
+        if torrent_file:
+            # 有种子文件时解析种子信息
+            url = os.path.basename(torrent_file)
+            content, dl_files_folder, dl_files, retmsg = Torrent().read_torrent_content(torrent_file)
+        else:
+            # 没有种子文件解析链接
+            url = media_info.enclosure
+            if not url:
+                return url, None, site_info, dl_files_folder, dl_files, "下载链接为空"
+            # 获取种子内容，磁力链不解析
+            if url.startswith("magnet:"):
+                content = url
+            else:
+                # 获取Cookie和ua等
+                site_info = self.sites.get_sites(siteurl=url)
+                # 下载种子文件，并读取信息
+                _, content, dl_files_folder, dl_files, retmsg = Torrent().get_torrent_info(
+                    url=url,
+                    cookie=site_info.get("cookie"),
+                    ua=site_info.get("ua"),
+                    referer=media_info.page_url if site_info.get("referer") else None,
+                    proxy=proxy if proxy is not None else site_info.get("proxy")
+                )
+        return url, content, site_info, dl_files_folder, dl_files, retmsg
+
+    def __add_download(self,
+                       media_info,
+                       torrent,
+                       is_paused=None,
+                       tag=None,
+                       download_dir=None,
+                       download_setting=None,
+                       downloader_id=None,
+                       upload_limit=None,
+                       download_limit=None,
+                       in_from=None,
+                       user_name=None,
+                       histories=None):
+        """
+        将已下载的种子添加到下载器
+        :param torrent: __get_torrent的返回值
+        :param histories: 为列表时下载历史追加到列表中由调用方批量写入，否则直接写入
+        :return: 下载器类型, 种子ID，错误信息
+        """
 
         def __download_fail(msg):
             """
@@ -222,33 +411,7 @@ class Downloader:
         title = media_info.org_string
         # 详情页面
         page_url = media_info.page_url
-        # 默认值
-        site_info, dl_files_folder, dl_files, retmsg = {}, "", [], ""
-
-        if torrent_file:
-            # 有种子文件时解析种子信息
-            url = os.path.basename(torrent_file)
-            content, dl_files_folder, dl_files, retmsg = Torrent().read_torrent_content(torrent_file)
-        else:
-            # 没有种子文件解析链接
-            url = media_info.enclosure
-            if not url:
-                __download_fail("下载链接为空")
-                return None, None, "下载链接为空"
-            # 获取种子内容，磁力链不解析
-            if url.startswith("magnet:"):
-                content = url
-            else:
-                # 获取Cookie和ua等
-                site_info = self.sites.get_sites(siteurl=url)
-                # 下载种子文件，并读取信息
-                _, content, dl_files_folder, dl_files, retmsg = Torrent().get_torrent_info(
-                    url=url,
-                    cookie=site_info.get("cookie"),
-                    ua=site_info.get("ua"),
-                    referer=page_url if site_info.get("referer") else None,
-                    proxy=proxy if proxy is not None else site_info.get("proxy")
-                )
+        url, content, site_info, dl_files_folder, dl_files, retmsg = torrent
 
         # 解析完成
         if retmsg:
@@ -340,11 +503,13 @@ class Downloader:
             # 下载ID
             download_id = None
             downloader_type = downloader.get_type()
+            # 同一下载器的添加请求串行发送，锁只覆盖添加请求本身，获取种子ID和设置种子属性不占用锁
             if downloader_type == DownloaderType.TR:
-                ret = downloader.add_torrent(content,
-                                             is_paused=is_paused,
-                                             download_dir=download_dir,
-                                             cookie=site_info.get("cookie"))
+                with self.__get_client_lock(downloader_id):
+                    ret = downloader.add_torrent(content,
+                                                 is_paused=is_paused,
+                                                 download_dir=download_dir,
+                                                 cookie=site_info.get("cookie"))
                 if ret:
                     download_id = ret.hashString
                     downloader.change_torrent(tid=download_id,
@@ -355,33 +520,45 @@ class Downloader:
                                               seeding_time_limit=seeding_time_limit)
 
             elif downloader_type == DownloaderType.QB:
-                # 加标签以获取添加下载后的编号
-                torrent_tag = "NT" + StringUtils.generate_random_str(5)
-                if tags:
-                    tags += [torrent_tag]
-                else:
-                    tags = [torrent_tag]
+                # 根据种子内容或磁力链接计算种子ID，无法计算时加标签以获取添加下载后的编号
+                torrent_hash = Torrent.get_info_hash(content)
+                torrent_tag = None
+                if not torrent_hash:
+                    torrent_tag = "NT" + StringUtils.generate_random_str(5)
+                    if tags:
+                        tags += [torrent_tag]
+                    else:
+                        tags = [torrent_tag]
                 # 布局默认原始
-                ret = downloader.add_torrent(content,
-                                             is_paused=is_paused,
-                                             download_dir=download_dir,
-                                             tag=tags,
-                                             category=category,
-                                             content_layout="Original",
-                                             upload_limit=upload_limit,
-                                             download_limit=download_limit,
-                                             ratio_limit=ratio_limit,
-                                             seeding_time_limit=seeding_time_limit,
-                                             cookie=site_info.get("cookie"))
+                with self.__get_client_lock(downloader_id):
+                    ret = downloader.add_torrent(content,
+                                                 is_paused=is_paused,
+                                                 download_dir=download_dir,
+                                                 tag=tags,
+                                                 category=category,
+                                                 content_layout="Original",
+                                                 upload_limit=upload_limit,
+                                                 download_limit=download_limit,
+                                                 ratio_limit=ratio_limit,
+                                                 seeding_time_limit=seeding_time_limit,
+                                                 cookie=site_info.get("cookie"))
                 if ret:
-                    download_id = downloader.get_torrent_id_by_tag(torrent_tag)
+                    if torrent_hash:
+                        download_id = downloader.get_torrent_id_by_hash(torrent_hash)
+                        if not download_id:
+                            # QB已接受添加请求，种子ID由内容确定，查询不到时仍以计算值为准
+                            log.debug(f"【Downloader】下载器 {downloader_name} 未查询到种子：{torrent_hash}")
+                            download_id = torrent_hash
+                    else:
+                        download_id = downloader.get_torrent_id_by_tag(torrent_tag)
             else:
                 # 其它下载器，添加下载后需返回下载ID或添加状态
-                ret = downloader.add_torrent(content,
-                                             is_paused=is_paused,
-                                             tag=tags,
-                                             download_dir=download_dir,
-                                             category=category)
+                with self.__get_client_lock(downloader_id):
+                    ret = downloader.add_torrent(content,
+                                                 is_paused=is_paused,
+                                                 tag=tags,
+                                                 download_dir=download_dir,
+                                                 category=category)
                 download_id = ret
             # 添加下载成功
             if ret:
@@ -401,10 +578,16 @@ class Downloader:
                         save_dir = None
                         subtitle_dir = visit_dir
                 # 登记下载历史，记录下载目录
-                self.dbhelper.insert_download_history(media_info=media_info,
-                                                      downloader=downloader_id,
-                                                      download_id=download_id,
-                                                      save_dir=save_dir)
+                history = {
+                    "media_info": media_info,
+                    "downloader": downloader_id,
+                    "download_id": download_id,
+                    "save_dir": save_dir
+                }
+                if histories is not None:
+                    histories.append(history)
+                else:
+                    self.dbhelper.insert_download_history(**history)
                 # 下载站点字幕文件
                 if page_url \
                     and subtitle_dir \
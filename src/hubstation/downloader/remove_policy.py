@@ -0,0 +1,159 @@
+import re
+import time
+from array import array
+
+GB = 1024 * 1024 * 1024
+
+
+class TorrentColumns:
+    """
+    按列存储的种子数据，数值列使用array存储，供删种策略按列批量计算
+    """
+
+    def __init__(self):
+        self.names = []
+        self.sizes = array("q")
+        self.ratios = array("d")
+        # 完成时间（未完成为添加时间），时间戳，0为未知
+        self.done_dates = array("q")
+        self.uploaded = array("d")
+        self.save_paths = []
+        # 每个种子的Tracker地址列表
+        self.trackers = []
+        self.states = []
+        self.categories = []
+        self.errors = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def append(self, name, size, ratio, done_date, uploaded, save_path,
+               trackers=None, state=None, category=None, error=None):
+        """
+        追加一个种子
+        :param name: 种子名称
+        :param size: 大小，单位字节
+        :param ratio: 分享率
+        :param done_date: 完成时间戳，未完成为添加时间
+        :param uploaded: 已上传量，单位字节
+        :param save_path: 保存路径
+        :param trackers: Tracker地址列表
+        :param state: 状态
+        :param category: 分类
+        :param error: 错误信息
+        """
+        self.names.append(name)
+        self.sizes.append(int(size or 0))
+        self.ratios.append(float(ratio or 0))
+        self.done_dates.append(int(done_date or 0))
+        self.uploaded.append(float(uploaded or 0))
+        self.save_paths.append(save_path or "")
+        self.trackers.append(trackers or [])
+        self.states.append(state)
+        self.categories.append(category)
+        self.errors.append(error or "")
+
+
+class RemovePolicy:
+    """
+    自动删种策略：按条件逐列过滤候选种子，已排除的种子不再参与后续条件计算；正则表达式只编译一次
+    """
+
+    def __init__(self, config, states=None, categories=None, error_key=None):
+        """
+        :param config: 删种任务配置，使用ratio、seeding_time、size、upload_avs、savepath_key、tracker_key、samedata
+        :param states: 需删除的种子状态，None为不过滤
+        :param categories: 需删除的种子分类，None为不过滤
+        :param error_key: 种子错误信息需匹配的正则表达式
+        """
+        self._ratio = config.get("ratio")
+        # 做种时间 单位：小时
+        self._seeding_time = config.get("seeding_time")
+        # 大小 单位：GB
+        size = config.get("size")
+        self._minsize = size[0] * GB if size else 0
+        self._maxsize = size[-1] * GB if size else 0
+        self._size = bool(size)
+        # 平均上传速度 单位 KB/s
+        self._upload_avs = config.get("upload_avs")
+        self._savepath_re = self.__compile(config.get("savepath_key"))
+        self._tracker_re = self.__compile(config.get("tracker_key"))
+        self._error_re = self.__compile(error_key)
+        self._states = set(states) if states else None
+        self._categories = set(categories) if categories else None
+        self._samedata = config.get("samedata")
+
+    @staticmethod
+    def __compile(pattern):
+        return re.compile(pattern, re.I) if pattern else None
+
+    def evaluate(self, columns: TorrentColumns, now=None):
+        """
+        计算需要删除的种子
+        :param columns: 种子数据
+        :param now: 当前时间戳
+        :return: 需删除种子在columns中的下标列表；开启samedata时同名同大小的其它种子排在前面
+        """
+        selected = self.select(columns, now)
+        if self._samedata and selected:
+            return self.expand_samedata(columns, selected) + selected
+        return selected
+
+    def select(self, columns: TorrentColumns, now=None):
+        """
+        按条件过滤种子
+        :return: 满足全部条件的种子下标列表
+        """
+        if now is None:
+            now = int(time.time())
+        idx = range(len(columns))
+        if self._seeding_time or self._upload_avs:
+            # 做种时间，单位秒
+            seeding = [now - d if d else 0 for d in columns.done_dates]
+        else:
+            seeding = None
+        if self._ratio:
+            ratios, ratio = columns.ratios, self._ratio
+            idx = [i for i in idx if ratios[i] > ratio]
+        if self._seeding_time:
+            limit = self._seeding_time * 3600
+            idx = [i for i in idx if seeding[i] > limit]
+        if self._size:
+            sizes, minsize, maxsize = columns.sizes, self._minsize, self._maxsize
+            idx = [i for i in idx if minsize < sizes[i] < maxsize]
+        if self._upload_avs:
+            uploaded, limit = columns.uploaded, self._upload_avs * 1024
+            idx = [i for i in idx if (uploaded[i] / seeding[i] if seeding[i] else 0) < limit]
+        if self._savepath_re:
+            save_paths, search = columns.save_paths, self._savepath_re.search
+            idx = [i for i in idx if search(save_paths[i])]
+        if self._tracker_re:
+            trackers, search = columns.trackers, self._tracker_re.search
+            idx = [i for i in idx if any(search(tracker) for tracker in trackers[i])]
+        if self._error_re:
+            errors, search = columns.errors, self._error_re.search
+            idx = [i for i in idx if search(errors[i])]
+        if self._states is not None:
+            states, allowed = columns.states, self._states
+            idx = [i for i in idx if states[i] in allowed]
+        if self._categories is not None:
+            categories, allowed = columns.categories, self._categories
+            idx = [i for i in idx if categories[i] in allowed]
+        return list(idx)
+
+    @staticmethod
+    def expand_samedata(columns: TorrentColumns, selected):
+        """
+        查找与已选种子名称、大小相同的其它种子（辅种），按(名称, 大小)哈希关联
+        :return: 辅种的下标列表，不含已选种子
+        """
+        names, sizes = columns.names, columns.sizes
+        selected_set = set(selected)
+        groups = {}
+        for i in range(len(columns)):
+            if i not in selected_set:
+                groups.setdefault((names[i], sizes[i]), []).append(i)
+        ret = []
+        for i in selected:
+            ret.extend(groups.pop((names[i], sizes[i]), []))
+        return ret
@@ -0,0 +1,210 @@
+import threading
+import time
+
+from hubstation.utils.exception_utils import ExceptionUtils
+
+
+class TorrentItem(dict):
+    """
+    快照中的种子信息，兼容qbittorrentapi的TorrentDictionary按属性读取字段
+    """
+
+    def __getattr__(self, item):
+        try:
+            return self[item]
+        except KeyError:
+            raise AttributeError(item)
+
+
+class QbittorrentSnapshot:
+    """
+    qBittorrent种子快照：通过sync/maindata的rid增量协议维护内存中的种子列表，每次同步只传输变化的字段，
+    同一下载器的所有查询共用一份快照；同时维护标签到种子的索引，按标签精确匹配
+    """
+    # 快照最长复用时间，超过后查询前先增量同步，单位秒
+    _max_age = 2
+
+    # torrents_info的status_filter与种子state的对应关系，参考qBittorrent的TorrentFilter
+    _DOWNLOADING_STATES = {"downloading", "metaDL", "forcedMetaDL", "stalledDL", "checkingDL",
+                           "pausedDL", "stoppedDL", "queuedDL", "forcedDL", "allocating", "checkingResumeData"}
+    _COMPLETED_STATES = {"uploading", "stalledUP", "checkingUP", "pausedUP", "stoppedUP", "queuedUP", "forcedUP"}
+    _PAUSED_STATES = {"pausedDL", "pausedUP", "stoppedDL", "stoppedUP"}
+    _STALLED_STATES = {"stalledUP", "stalledDL"}
+    _ERRORED_STATES = {"error", "missingFiles", "unknown"}
+    _STATUS_FILTERS = {
+        "all": lambda t: True,
+        "downloading": lambda t: t.get("state") in QbittorrentSnapshot._DOWNLOADING_STATES,
+        "completed": lambda t: t.get("state") in QbittorrentSnapshot._COMPLETED_STATES,
+        "seeding": lambda t: t.get("state") in QbittorrentSnapshot._COMPLETED_STATES,
+        "paused": lambda t: t.get("state") in QbittorrentSnapshot._PAUSED_STATES,
+        "stopped": lambda t: t.get("state") in QbittorrentSnapshot._PAUSED_STATES,
+        "resumed": lambda t: t.get("state") not in QbittorrentSnapshot._PAUSED_STATES,
+        "running": lambda t: t.get("state") not in QbittorrentSnapshot._PAUSED_STATES,
+        "active": lambda t: (t.get("dlspeed") or 0) > 0 or (t.get("upspeed") or 0) > 0,
+        "inactive": lambda t: not (t.get("dlspeed") or 0) > 0 and not (t.get("upspeed") or 0) > 0,
+        "stalled": lambda t: t.get("state") in QbittorrentSnapshot._STALLED_STATES,
+        "stalled_uploading": lambda t: t.get("state") == "stalledUP",
+        "stalled_downloading": lambda t: t.get("state") == "stalledDL",
+        "errored": lambda t: t.get("state") in QbittorrentSnapshot._ERRORED_STATES,
+    }
+
+    def __init__(self, client, max_age=None):
+        """
+        :param client: qbittorrentapi.Client
+        :param max_age: 快照最长复用时间，单位秒
+        """
+        self._client = client
+        if max_age is not None:
+            self._max_age = max_age
+        self._lock = threading.Lock()
+        self._rid = 0
+        self._torrents = {}
+        # 标签-种子hash集合
+        self._tag_index = {}
+        self._updated_at = 0
+
+    @staticmethod
+    def split_tags(tags):
+        """
+        拆分qBittorrent逗号分隔的标签字符串
+        :return: 标签集合
+        """
+        if not tags:
+            return set()
+        return {tag.strip() for tag in str(tags).split(",") if tag.strip()}
+
+    def invalidate(self):
+        """
+        标记快照过期，下次查询前先增量同步；本程序修改了种子（添加、删除、打标签等）后调用
+        """
+        self._updated_at = 0
+
+    def reset(self):
+        """
+        丢弃快照，下次查询时全量同步
+        """
+        with self._lock:
+            self._rid = 0
+            self._torrents = {}
+            self._tag_index = {}
+            self._updated_at = 0
+
+    def refresh(self, force=False):
+        """
+        从下载器增量同步快照
+        :param force: 是否忽略复用时间强制同步
+        :return: 是否同步成功
+        """
+        if not force and time.monotonic() - self._updated_at < self._max_age:
+            return True
+        with self._lock:
+            # 等待锁期间其它线程可能已完成同步
+            if not force and time.monotonic() - self._updated_at < self._max_age:
+                return True
+            try:
+                maindata = self._client.sync_maindata(rid=self._rid) or {}
+            except Exception as err:
+                ExceptionUtils.exception_traceback(err)
+                return False
+            self.__merge(maindata)
+            self._updated_at = time.monotonic()
+            return True
+
+    def __merge(self, maindata):
+        """
+        合并sync/maindata的返回数据；变化的种子生成新对象替换，已返回给调用方的种子对象不会被修改
+        标签索引同样只替换变化的标签集合，查询时无需加锁
+        """
+        if maindata.get("full_update"):
+            torrents = {}
+            tag_index = {}
+        else:
+            torrents = dict(self._torrents)
+            tag_index = dict(self._tag_index)
+        # 本次合并中已复制过的标签集合，可直接修改
+        copied = set()
+
+        def __update_tags(_hash, old_tags, new_tags):
+            for tag in old_tags - new_tags:
+                if tag not in copied:
+                    tag_index[tag] = set(tag_index.get(tag) or ())
+                    copied.add(tag)
+                tag_index[tag].discard(_hash)
+            for tag in new_tags - old_tags:
+                if tag not in copied:
+                    tag_index[tag] = set(tag_index.get(tag) or ())
+                    copied.add(tag)
+                tag_index[tag].add(_hash)
+
+        for torrent_hash, changes in (maindata.get("torrents") or {}).items():
+            old = torrents.get(torrent_hash) or {}
+            torrent = TorrentItem(old)
+            torrent.update(changes)
+            torrent["hash"] = torrent_hash
+            torrents[torrent_hash] = torrent
+            if not old or "tags" in changes:
+                __update_tags(torrent_hash, self.split_tags(old.get("tags")), self.split_tags(torrent.get("tags")))
+        for torrent_hash in maindata.get("torrents_removed") or []:
+            old = torrents.pop(torrent_hash, None)
+            if old:
+                __update_tags(torrent_hash, self.split_tags(old.get("tags")), set())
+        for tag in copied:
+            if not tag_index[tag]:
+                tag_index.pop(tag)
+        self._torrents = torrents
+        self._tag_index = tag_index
+        self._rid = maindata.get("rid") or 0
+
+    def get_torrents(self, ids=None, status=None, tags=None, category=None):
+        """
+        从快照中查询种子，参数与torrents_info的torrent_hashes、status_filter、category一致
+        :param tags: 标签列表，需包含全部标签，精确匹配
+        :return: 种子列表，同步失败或不支持的状态过滤时返回None，由调用方回退为torrents_info查询
+        """
+        if status:
+            if isinstance(status, list):
+                status = status[0] if len(status) == 1 else None
+            status_filter = self._STATUS_FILTERS.get(status)
+            if not status_filter:
+                return None
+        else:
+            status_filter = None
+        if not self.refresh():
+            return None
+        torrents = self._torrents
+        tag_index = self._tag_index
+        if ids:
+            if not isinstance(ids, list):
+                ids = str(ids).split("|")
+        # 有标签条件时从索引中取交集，只处理带标签的种子
+        for tag in tags or []:
+            tag_hashes = tag_index.get(tag) or set()
+            ids = [tid for tid in ids if tid in tag_hashes] if ids else list(tag_hashes)
+            if not ids:
+                return []
+        if ids:
+            result = [torrents[tid] for tid in ids if tid in torrents]
+        else:
+            result = list(torrents.values())
+        if category is not None:
+            result = [torrent for torrent in result if torrent.get("category") == category]
+        if status_filter:
+            result = [torrent for torrent in result if status_filter(torrent)]
+        return result
+
+    def get_completion_state(self):
+        """
+        从快照中获取下载完成状态，供CompletionWatcher比较两次检测之间新完成的种子
+        :return: 已完成种子hash集合, 是否有正在下载的种子；同步失败时返回None, False
+        """
+        if not self.refresh():
+            return None, False
+        completed = set()
+        active = False
+        for torrent_hash, torrent in self._torrents.items():
+            state = torrent.get("state")
+            if state in self._COMPLETED_STATES:
+                completed.add(torrent_hash)
+            elif state in self._DOWNLOADING_STATES and state not in self._PAUSED_STATES:
+                active = True
+        return completed, active
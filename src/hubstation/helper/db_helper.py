@@ -3,16 +3,20 @@ import os.path
 import time
 import json
 from enum import Enum
-from sqlalchemy import cast, func, and_, case
+from sqlalchemy import cast, func, case, exists, tuple_
+from sqlalchemy.orm import aliased
 
 from hubstation.constants import MediaType, RmtMode
 from hubstation.db.main_db import MainDb, DbPersist
 from hubstation.db.models import *
+from hubstation.utils.cache_manager import ExistsCache
 from hubstation.utils.string_utils import StringUtils
 
 
 class DbHelper:
     _db = MainDb()
+    # 批量查询时每条IN语句的参数个数
+    _query_chunk_size = 500
 
     @DbPersist(_db)
     def insert_search_results(self, media_items: list, title=None, ident_flag=True):
@@ -90,24 +94,72 @@ class DbHelper:
         """
         if not source_path or not source_filename or not dest_path or not dest_filename:
             return False
-        ret = self._db.query(TRANSFERHISTORY).filter(TRANSFERHISTORY.SOURCE_PATH == source_path,
-                                                     TRANSFERHISTORY.SOURCE_FILENAME == source_filename,
-                                                     TRANSFERHISTORY.DEST_PATH == dest_path,
-                                                     TRANSFERHISTORY.DEST_FILENAME == dest_filename).count()
-        return True if ret > 0 else False
+        return self.__is_exists(
+            "transfer_history",
+            (source_path, source_filename, dest_path, dest_filename),
+            lambda: self._db.query(TRANSFERHISTORY).filter(TRANSFERHISTORY.SOURCE_PATH == source_path,
+                                                           TRANSFERHISTORY.SOURCE_FILENAME == source_filename,
+                                                           TRANSFERHISTORY.DEST_PATH == dest_path,
+                                                           TRANSFERHISTORY.DEST_FILENAME == dest_filename).count() > 0
+        )
+
+    def __is_exists(self, namespace, key, loader):
+        """
+        存在性检查经由读穿缓存；在写线程中直接查询数据库，以便看到当前事务中尚未提交的变更
+        :param namespace: 缓存命名空间
+        :param key: 缓存键
+        :param loader: 查询数据库的函数，返回True/False
+        """
+        if self._db.is_writer_thread():
+            return loader()
+        return ExistsCache.get_or_load(namespace, key, loader)
+
+    @staticmethod
+    def get_exists_cache_stats():
+        """
+        查询存在性检查缓存的命中统计
+        """
+        return ExistsCache.stats()
 
     def update_transfer_history_date(self, source_path, source_filename, dest_path, dest_filename, date):
         """
         更新历史转移记录时间
         """
-        self._db.query(TRANSFERHISTORY).filter(TRANSFERHISTORY.SOURCE_PATH == source_path,
-                                               TRANSFERHISTORY.SOURCE_FILENAME == source_filename,
-                                               TRANSFERHISTORY.DEST_PATH == dest_path,
-                                               TRANSFERHISTORY.DEST_FILENAME == dest_filename).update(
+        query = self._db.query(TRANSFERHISTORY).filter(TRANSFERHISTORY.SOURCE_PATH == source_path,
+                                                       TRANSFERHISTORY.SOURCE_FILENAME == source_filename,
+                                                       TRANSFERHISTORY.DEST_PATH == dest_path,
+                                                       TRANSFERHISTORY.DEST_FILENAME == dest_filename)
+        # 记录从原日期移到新日期
+        changes = []
+        for mtype, old_date in query.with_entities(TRANSFERHISTORY.TYPE, TRANSFERHISTORY.DATE):
+            changes.append((old_date, mtype, -1))
+            changes.append((date, mtype, 1))
+        query.update(
             {
                 "DATE": date
             }
         )
+        self.__update_transfer_statistics_daily(changes)
+
+    def __update_transfer_statistics_daily(self, changes):
+        """
+        增量维护按天汇总的转移统计
+        :param changes: [(DATE, TYPE, 变化数)]，DATE可以是完整时间，按天汇总
+        """
+        deltas = {}
+        for date, mtype, delta in changes:
+            if not date:
+                continue
+            key = (date[:10], mtype)
+            deltas[key] = deltas.get(key, 0) + delta
+        self._db.upsert(TRANSFERSTATISTICSDAILY,
+                        rows=[{
+                            "DATE": date,
+                            "TYPE": mtype,
+                            "COUNT": delta
+                        } for (date, mtype), delta in deltas.items() if delta],
+                        index_elements=["DATE", "TYPE"],
+                        increment_columns=["COUNT"])
 
     @DbPersist(_db)
     def insert_transfer_history(self, in_from: Enum, rmt_mode: RmtMode, in_path, out_path, dest, media_info):
@@ -156,27 +208,38 @@ class DbHelper:
                 DATE=timestr
             )
         )
+        self.__update_transfer_statistics_daily([(timestr, media_info.type.value, 1)])
+        self._db.on_commit(lambda: ExistsCache.set("transfer_history",
+                                                   (source_path, source_filename, dest_path, dest_filename), True))
 
-    def get_transfer_history(self, search, page, rownum):
+    def get_transfer_history(self, search, page, rownum, last_date=None, last_id=None):
         """
-        查询识别转移记录
+        查询识别转移记录，按(DATE, ID)倒序
+        :param search: 检索关键字，匹配标题或源文件名
+        :param page: 页码，未传入last_date、last_id时按页码偏移
+        :param rownum: 每页条数
+        :param last_date: 上一页最后一条记录的DATE，与last_id同时传入时从该记录之后开始查询，不再使用偏移
+        :param last_id: 上一页最后一条记录的ID
+        :return: 总数（传入last_date、last_id时为None，沿用首页的总数），当前页记录
         """
-        if int(page) == 1:
-            begin_pos = 0
-        else:
-            begin_pos = (int(page) - 1) * int(rownum)
-
+        query = self._db.query(TRANSFERHISTORY)
         if search:
-            search = f"%{search}%"
-            count = self._db.query(TRANSFERHISTORY).filter((TRANSFERHISTORY.SOURCE_FILENAME.like(search))
-                                                           | (TRANSFERHISTORY.TITLE.like(search))).count()
-            data = self._db.query(TRANSFERHISTORY).filter((TRANSFERHISTORY.SOURCE_FILENAME.like(search))
-                                                          | (TRANSFERHISTORY.TITLE.like(search))).order_by(
-                TRANSFERHISTORY.DATE.desc()).limit(int(rownum)).offset(begin_pos).all()
-            return count, data
-        else:
-            return self._db.query(TRANSFERHISTORY).count(), self._db.query(TRANSFERHISTORY).order_by(
-                TRANSFERHISTORY.DATE.desc()).limit(int(rownum)).offset(begin_pos).all()
+            match = self._db.fts_match("TRANSFER_HISTORY_FTS", search)
+            if match is not None:
+                query = query.filter(TRANSFERHISTORY.ID.in_(match))
+            else:
+                search = f"%{search}%"
+                query = query.filter((TRANSFERHISTORY.SOURCE_FILENAME.like(search))
+                                     | (TRANSFERHISTORY.TITLE.like(search)))
+        count = None
+        offset = 0
+        if last_date is not None and last_id is not None:
+            query = query.filter(tuple_(TRANSFERHISTORY.DATE, TRANSFERHISTORY.ID) < tuple_(last_date, int(last_id)))
+        else:
+            count = query.count()
+            offset = (max(int(page), 1) - 1) * int(rownum)
+        return count, query.order_by(TRANSFERHISTORY.DATE.desc(),
+                                     TRANSFERHISTORY.ID.desc()).offset(offset).limit(int(rownum)).all()
 
     def get_transfer_info_by_id(self, logid):
         """
@@ -220,7 +283,17 @@ class DbHelper:
         """
         根据logid删除记录
         """
-        self._db.query(TRANSFERHISTORY).filter(TRANSFERHISTORY.ID == int(logid)).delete()
+        query = self._db.query(TRANSFERHISTORY).filter(TRANSFERHISTORY.ID == int(logid))
+        changes = []
+        keys = []
+        for item in query.with_entities(TRANSFERHISTORY.TYPE, TRANSFERHISTORY.DATE,
+                                        TRANSFERHISTORY.SOURCE_PATH, TRANSFERHISTORY.SOURCE_FILENAME,
+                                        TRANSFERHISTORY.DEST_PATH, TRANSFERHISTORY.DEST_FILENAME):
+            changes.append((item.DATE, item.TYPE, -1))
+            keys.append((item.SOURCE_PATH, item.SOURCE_FILENAME, item.DEST_PATH, item.DEST_FILENAME))
+        query.delete()
+        self.__update_transfer_statistics_daily(changes)
+        self._db.on_commit(lambda: [ExistsCache.delete("transfer_history", key) for key in keys])
 
     def get_transfer_unknown_paths(self):
         """
@@ -228,26 +301,30 @@ class DbHelper:
         """
         return self._db.query(TRANSFERUNKNOWN).filter(TRANSFERUNKNOWN.STATE == 'N').all()
 
-    def get_transfer_unknown_paths_by_page(self, search, page, rownum):
+    def get_transfer_unknown_paths_by_page(self, search, page, rownum, last_id=None):
         """
-        按页查询未识别的记录列表
+        按页查询未识别的记录列表，按ID倒序
+        :param search: 检索关键字，匹配路径
+        :param page: 页码，未传入last_id时按页码偏移
+        :param rownum: 每页条数
+        :param last_id: 上一页最后一条记录的ID，传入时从该记录之后开始查询，不再使用偏移
+        :return: 总数（传入last_id时为None，沿用首页的总数），当前页记录
         """
-        if int(page) == 1:
-            begin_pos = 0
-        else:
-            begin_pos = (int(page) - 1) * int(rownum)
+        query = self._db.query(TRANSFERUNKNOWN).filter(TRANSFERUNKNOWN.STATE == 'N')
         if search:
-            search = f"%{search}%"
-            count = self._db.query(TRANSFERUNKNOWN).filter((TRANSFERUNKNOWN.STATE == 'N')
-                                                           & (TRANSFERUNKNOWN.PATH.like(search))).count()
-            data = self._db.query(TRANSFERUNKNOWN).filter((TRANSFERUNKNOWN.STATE == 'N')
-                                                          & (TRANSFERUNKNOWN.PATH.like(search))).order_by(
-                TRANSFERUNKNOWN.ID.desc()).limit(int(rownum)).offset(begin_pos).all()
-            return count, data
+            match = self._db.fts_match("TRANSFER_UNKNOWN_FTS", search)
+            if match is not None:
+                query = query.filter(TRANSFERUNKNOWN.ID.in_(match))
+            else:
+                query = query.filter(TRANSFERUNKNOWN.PATH.like(f"%{search}%"))
+        count = None
+        offset = 0
+        if last_id is not None:
+            query = query.filter(TRANSFERUNKNOWN.ID < int(last_id))
         else:
-            return self._db.query(TRANSFERUNKNOWN).filter(TRANSFERUNKNOWN.STATE == 'N').count(), self._db.query(
-                TRANSFERUNKNOWN).filter(TRANSFERUNKNOWN.STATE == 'N').order_by(
-                TRANSFERUNKNOWN.ID.desc()).limit(int(rownum)).offset(begin_pos).all()
+            count = query.count()
+            offset = (max(int(page), 1) - 1) * int(rownum)
+        return count, query.order_by(TRANSFERUNKNOWN.ID.desc()).offset(offset).limit(int(rownum)).all()
 
     @DbPersist(_db)
     def update_transfer_unknown_state(self, path):
@@ -365,11 +442,12 @@ class DbHelper:
         """
         if not path:
             return False
-        ret = self._db.query(TRANSFERBLACKLIST).filter(TRANSFERBLACKLIST.PATH == os.path.normpath(path)).count()
-        if ret > 0:
-            return True
-        else:
-            return False
+        path = os.path.normpath(path)
+        return self.__is_exists(
+            "transfer_blacklist",
+            path,
+            lambda: self._db.query(TRANSFERBLACKLIST).filter(TRANSFERBLACKLIST.PATH == path).count() > 0
+        )
 
     def is_transfer_notin_blacklist(self, path):
         """
@@ -390,6 +468,7 @@ class DbHelper:
             self._db.insert(TRANSFERBLACKLIST(
                 PATH=os.path.normpath(path)
             ))
+            self._db.on_commit(lambda: ExistsCache.set("transfer_blacklist", os.path.normpath(path), True))
 
     @DbPersist(_db)
     def delete_transfer_blacklist(self, path):
@@ -398,6 +477,15 @@ class DbHelper:
         """
         self._db.query(TRANSFERBLACKLIST).filter(TRANSFERBLACKLIST.PATH == str(path)).delete()
         self._db.query(SYNCHISTORY).filter(SYNCHISTORY.PATH == str(path)).delete()
+        self._db.on_commit(self.__clear_blacklist_cache)
+
+    @staticmethod
+    def __clear_blacklist_cache():
+        """
+        清空黑名单及同步历史的存在性缓存
+        """
+        ExistsCache.clear("transfer_blacklist")
+        ExistsCache.clear("sync_history")
 
     @DbPersist(_db)
     def truncate_transfer_blacklist(self):
@@ -406,6 +494,7 @@ class DbHelper:
         """
         self._db.query(TRANSFERBLACKLIST).delete()
         self._db.query(SYNCHISTORY).delete()
+        self._db.on_commit(self.__clear_blacklist_cache)
 
     @DbPersist(_db)
     def truncate_rss_episodes(self):
@@ -1029,12 +1118,14 @@ class DbHelper:
         """
         if not path:
             return False
-        count = self._db.query(SYNCHISTORY).filter(SYNCHISTORY.PATH == os.path.normpath(path),
-                                                   SYNCHISTORY.DEST == os.path.normpath(dest)).count()
-        if count > 0:
-            return True
-        else:
-            return False
+        path = os.path.normpath(path)
+        dest = os.path.normpath(dest)
+        return self.__is_exists(
+            "sync_history",
+            (path, dest),
+            lambda: self._db.query(SYNCHISTORY).filter(SYNCHISTORY.PATH == path,
+                                                       SYNCHISTORY.DEST == dest).count() > 0
+        )
 
     @DbPersist(_db)
     def insert_sync_history(self, path, src, dest):
@@ -1051,6 +1142,8 @@ class DbHelper:
                 SRC=os.path.normpath(src),
                 DEST=os.path.normpath(dest)
             ))
+            self._db.on_commit(lambda: ExistsCache.set("sync_history",
+                                                       (os.path.normpath(path), os.path.normpath(dest)), True))
 
     def get_users(self, uid=None, name=None):
         """
@@ -1099,15 +1192,17 @@ class DbHelper:
 
     def get_transfer_statistics(self, days=30):
         """
-        查询历史记录统计
+        查询历史记录统计，读取按天汇总的统计表
+        :return: [(类型, 日期, 数量)]，按日期排序
         """
-        begin_date = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
-        return self._db.query(TRANSFERHISTORY.TYPE,
-                              func.substr(TRANSFERHISTORY.DATE, 1, 10),
-                              func.count('*')
-                              ).filter(TRANSFERHISTORY.DATE > begin_date).group_by(
-            TRANSFERHISTORY.TYPE, func.substr(TRANSFERHISTORY.DATE, 1, 10)
-        ).order_by(TRANSFERHISTORY.DATE).all()
+        begin_date = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+        return self._db.query(TRANSFERSTATISTICSDAILY.TYPE,
+                              TRANSFERSTATISTICSDAILY.DATE,
+                              TRANSFERSTATISTICSDAILY.COUNT
+                              ).filter(TRANSFERSTATISTICSDAILY.DATE >= begin_date,
+                                       TRANSFERSTATISTICSDAILY.COUNT > 0).order_by(
+            TRANSFERSTATISTICSDAILY.DATE, TRANSFERSTATISTICSDAILY.TYPE
+        ).all()
 
     @DbPersist(_db)
     def update_site_user_statistics_site_name(self, new_name, old_name):
@@ -1125,58 +1220,42 @@ class DbHelper:
         """
         更新站点用户粒度数据
         """
+        self.__upsert_site_user_statistics(site_user_infos)
+
+    def __upsert_site_user_statistics(self, site_user_infos: list):
+        """
+        批量插入或更新站点用户粒度数据，按URL唯一索引判断是否已存在
+        """
         if not site_user_infos:
             return
         update_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
-        for site_user_info in site_user_infos:
-            site = site_user_info.site_name
-            username = site_user_info.username
-            user_level = site_user_info.user_level
-            join_at = site_user_info.join_at
-            upload = site_user_info.upload
-            download = site_user_info.download
-            ratio = site_user_info.ratio
-            seeding = site_user_info.seeding
-            seeding_size = site_user_info.seeding_size
-            leeching = site_user_info.leeching
-            bonus = site_user_info.bonus
-            url = site_user_info.site_url
-            msg_unread = site_user_info.message_unread
-            if not self.is_exists_site_user_statistics(url):
-                self._db.insert(SITEUSERINFOSTATS(
-                    SITE=site,
-                    USERNAME=username,
-                    USER_LEVEL=user_level,
-                    JOIN_AT=join_at,
-                    UPDATE_AT=update_at,
-                    UPLOAD=upload,
-                    DOWNLOAD=download,
-                    RATIO=ratio,
-                    SEEDING=seeding,
-                    LEECHING=leeching,
-                    SEEDING_SIZE=seeding_size,
-                    BONUS=bonus,
-                    URL=url,
-                    MSG_UNREAD=msg_unread
-                ))
-            else:
-                self._db.query(SITEUSERINFOSTATS).filter(SITEUSERINFOSTATS.URL == url).update(
-                    {
-                        "SITE": site,
-                        "USERNAME": username,
-                        "USER_LEVEL": user_level,
-                        "JOIN_AT": join_at,
-                        "UPDATE_AT": update_at,
-                        "UPLOAD": upload,
-                        "DOWNLOAD": download,
-                        "RATIO": ratio,
-                        "SEEDING": seeding,
-                        "LEECHING": leeching,
-                        "SEEDING_SIZE": seeding_size,
-                        "BONUS": bonus,
-                        "MSG_UNREAD": msg_unread
-                    }
-                )
+        self._db.upsert(SITEUSERINFOSTATS,
+                        rows=[{
+                            "SITE": site_user_info.site_name,
+                            "USERNAME": site_user_info.username,
+                            "USER_LEVEL": site_user_info.user_level,
+                            "JOIN_AT": site_user_info.join_at,
+                            "UPDATE_AT": update_at,
+                            "UPLOAD": site_user_info.upload,
+                            "DOWNLOAD": site_user_info.download,
+                            "RATIO": site_user_info.ratio,
+                            "SEEDING": site_user_info.seeding,
+                            "LEECHING": site_user_info.leeching,
+                            "SEEDING_SIZE": site_user_info.seeding_size,
+                            "BONUS": site_user_info.bonus,
+                            "URL": site_user_info.site_url,
+                            "MSG_UNREAD": site_user_info.message_unread
+                        } for site_user_info in site_user_infos],
+                        index_elements=["URL"])
+
+    @DbPersist(_db)
+    def refresh_site_statistics(self, site_user_infos: list):
+        """
+        刷新站点数据：用户数据、做种数据、当日历史数据在同一个事务中批量写入
+        """
+        self.__upsert_site_user_statistics(site_user_infos)
+        self.__upsert_site_seed_info(site_user_infos)
+        self.__upsert_site_statistics_history(site_user_infos)
 
     def is_exists_site_user_statistics(self, url):
         """
@@ -1251,25 +1330,23 @@ class DbHelper:
         """
         更新站点做种数据
         """
+        self.__upsert_site_seed_info(site_user_infos)
+
+    def __upsert_site_seed_info(self, site_user_infos: list):
+        """
+        批量插入或更新站点做种数据，按URL唯一索引判断是否已存在
+        """
         if not site_user_infos:
             return
         update_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
-        for site_user_info in site_user_infos:
-            if not self.is_site_seeding_info_exist(url=site_user_info.site_url):
-                self._db.insert(SITEUSERSEEDINGINFO(
-                    SITE=site_user_info.site_name,
-                    UPDATE_AT=update_at,
-                    SEEDING_INFO=site_user_info.seeding_info,
-                    URL=site_user_info.site_url
-                ))
-            else:
-                self._db.query(SITEUSERSEEDINGINFO).filter(SITEUSERSEEDINGINFO.URL == site_user_info.site_url).update(
-                    {
-                        "SITE": site_user_info.site_name,
-                        "UPDATE_AT": update_at,
-                        "SEEDING_INFO": site_user_info.seeding_info
-                    }
-                )
+        self._db.upsert(SITEUSERSEEDINGINFO,
+                        rows=[{
+                            "SITE": site_user_info.site_name,
+                            "UPDATE_AT": update_at,
+                            "SEEDING_INFO": site_user_info.seeding_info,
+                            "URL": site_user_info.site_url
+                        } for site_user_info in site_user_infos],
+                        index_elements=["URL"])
 
     def is_site_user_statistics_exists(self, url):
         """
@@ -1328,49 +1405,30 @@ class DbHelper:
         """
         插入站点数据
         """
+        self.__upsert_site_statistics_history(site_user_infos)
+
+    def __upsert_site_statistics_history(self, site_user_infos: list):
+        """
+        批量插入或更新当日站点数据，按UN_INDX_SITE_STATISTICS_HISTORY_DS(DATE, URL)唯一索引判断是否已存在
+        """
         if not site_user_infos:
             return
         date_now = time.strftime('%Y-%m-%d', time.localtime(time.time()))
-        for site_user_info in site_user_infos:
-            site = site_user_info.site_name
-            upload = site_user_info.upload
-            user_level = site_user_info.user_level
-            download = site_user_info.download
-            ratio = site_user_info.ratio
-            seeding = site_user_info.seeding
-            seeding_size = site_user_info.seeding_size
-            leeching = site_user_info.leeching
-            bonus = site_user_info.bonus
-            url = site_user_info.site_url
-            if not self.is_site_statistics_history_exists(date=date_now, url=url):
-                self._db.insert(SITESTATISTICSHISTORY(
-                    SITE=site,
-                    USER_LEVEL=user_level,
-                    DATE=date_now,
-                    UPLOAD=upload,
-                    DOWNLOAD=download,
-                    RATIO=ratio,
-                    SEEDING=seeding,
-                    LEECHING=leeching,
-                    SEEDING_SIZE=seeding_size,
-                    BONUS=bonus,
-                    URL=url
-                ))
-            else:
-                self._db.query(SITESTATISTICSHISTORY).filter(SITESTATISTICSHISTORY.DATE == date_now,
-                                                             SITESTATISTICSHISTORY.URL == url).update(
-                    {
-                        "SITE": site,
-                        "USER_LEVEL": user_level,
-                        "UPLOAD": upload,
-                        "DOWNLOAD": download,
-                        "RATIO": ratio,
-                        "SEEDING": seeding,
-                        "LEECHING": leeching,
-                        "SEEDING_SIZE": seeding_size,
-                        "BONUS": bonus
-                    }
-                )
+        self._db.upsert(SITESTATISTICSHISTORY,
+                        rows=[{
+                            "SITE": site_user_info.site_name,
+                            "USER_LEVEL": site_user_info.user_level,
+                            "DATE": date_now,
+                            "UPLOAD": site_user_info.upload,
+                            "DOWNLOAD": site_user_info.download,
+                            "RATIO": site_user_info.ratio,
+                            "SEEDING": site_user_info.seeding,
+                            "LEECHING": site_user_info.leeching,
+                            "SEEDING_SIZE": site_user_info.seeding_size,
+                            "BONUS": site_user_info.bonus,
+                            "URL": site_user_info.site_url
+                        } for site_user_info in site_user_infos],
+                        index_elements=["DATE", "URL"])
 
     def get_site_statistics_history(self, site, days=30):
         """
@@ -1407,7 +1465,6 @@ class DbHelper:
         :param strict_urls 需要的站点URL的列表
         传入 7,"2020-01-01" 表示需要从2020-01-01之前6天的数据
         """
-        # 查询最大最小日期
         if strict_urls is None:
             strict_urls = []
         end = datetime.datetime.now()
@@ -1421,151 +1478,243 @@ class DbHelper:
         b_date = (end - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
         # 结束时间
         e_date = end.strftime("%Y-%m-%d")
-        # 大于开始时间范围里的最大日期与最小日期
-        date_ret = self._db.query(func.max(SITESTATISTICSHISTORY.DATE),
-                                  func.MIN(SITESTATISTICSHISTORY.DATE)).filter(
-            SITESTATISTICSHISTORY.DATE > b_date, SITESTATISTICSHISTORY.DATE <= e_date).all()
-        if date_ret and date_ret[0][0]:
-            total_upload = 0
-            total_download = 0
-            ret_site_uploads = []
-            ret_site_downloads = []
-            min_date = date_ret[0][1]
-            max_date = date_ret[0][0]
-            # 查询开始值
-            if strict_urls:
-                subquery = self._db.query(SITESTATISTICSHISTORY.SITE.label("SITE"),
-                                          SITESTATISTICSHISTORY.DATE.label("DATE"),
-                                          func.sum(SITESTATISTICSHISTORY.UPLOAD).label("UPLOAD"),
-                                          func.sum(SITESTATISTICSHISTORY.DOWNLOAD).label("DOWNLOAD")).filter(
-                    SITESTATISTICSHISTORY.DATE >= min_date,
-                    SITESTATISTICSHISTORY.DATE <= max_date,
-                    SITESTATISTICSHISTORY.URL.in_(tuple(strict_urls + ["__DUMMY__"]))
-                ).group_by(SITESTATISTICSHISTORY.SITE, SITESTATISTICSHISTORY.DATE).subquery()
-            else:
-                subquery = self._db.query(SITESTATISTICSHISTORY.SITE.label("SITE"),
-                                          SITESTATISTICSHISTORY.DATE.label("DATE"),
-                                          func.sum(SITESTATISTICSHISTORY.UPLOAD).label("UPLOAD"),
-                                          func.sum(SITESTATISTICSHISTORY.DOWNLOAD).label("DOWNLOAD")).filter(
-                    SITESTATISTICSHISTORY.DATE >= min_date,
-                    SITESTATISTICSHISTORY.DATE <= max_date
-                ).group_by(SITESTATISTICSHISTORY.SITE, SITESTATISTICSHISTORY.DATE).subquery()
-            # 查询大于开始时间范围里的单日,单站点 最大值与最小值
-            rets = self._db.query(subquery.c.SITE,
-                                  func.min(subquery.c.UPLOAD),
-                                  func.min(subquery.c.DOWNLOAD),
-                                  func.max(subquery.c.UPLOAD),
-                                  func.max(subquery.c.DOWNLOAD)).group_by(subquery.c.SITE).all()
-            ret_sites = []
-            for ret_b in rets:
-                # 如果最小值都是0，可能时由于近几日没有更新数据，或者cookie过期，正常有数据的话，第二天能正常
-                ret_b = list(ret_b)
-                if ret_b[1] == 0 and ret_b[2] == 0:
-                    ret_b[1] = ret_b[3]
-                    ret_b[2] = ret_b[4]
-                ret_sites.append(ret_b[0])
-                if int(ret_b[1]) < int(ret_b[3]):
-                    total_upload += int(ret_b[3]) - int(ret_b[1])
-                    ret_site_uploads.append(int(ret_b[3]) - int(ret_b[1]))
-                else:
-                    ret_site_uploads.append(0)
-                if int(ret_b[2]) < int(ret_b[4]):
-                    total_download += int(ret_b[4]) - int(ret_b[2])
-                    ret_site_downloads.append(int(ret_b[4]) - int(ret_b[2]))
-                else:
-                    ret_site_downloads.append(0)
-            return total_upload, total_download, ret_sites, ret_site_uploads, ret_site_downloads
-        else:
+        # 同名站点的多个地址按天合计
+        query = self._db.query(SITESTATISTICSHISTORY.SITE.label("SITE"),
+                               func.sum(SITESTATISTICSHISTORY.UPLOAD).label("UPLOAD"),
+                               func.sum(SITESTATISTICSHISTORY.DOWNLOAD).label("DOWNLOAD")).filter(
+            SITESTATISTICSHISTORY.DATE > b_date,
+            SITESTATISTICSHISTORY.DATE <= e_date)
+        if strict_urls:
+            query = query.filter(SITESTATISTICSHISTORY.URL.in_(strict_urls))
+        subquery = query.group_by(SITESTATISTICSHISTORY.SITE, SITESTATISTICSHISTORY.DATE).subquery()
+        # 在同一条语句中计算单站点时间范围内的最小值与最大值，每个站点只返回一行
+        rets = self._db.query(subquery.c.SITE,
+                              func.min(subquery.c.UPLOAD),
+                              func.min(subquery.c.DOWNLOAD),
+                              func.max(subquery.c.UPLOAD),
+                              func.max(subquery.c.DOWNLOAD)).group_by(subquery.c.SITE
+                                                                      ).order_by(subquery.c.SITE).all()
+        if not rets:
             return 0, 0, [], [], []
+        total_upload = 0
+        total_download = 0
+        ret_sites = []
+        ret_site_uploads = []
+        ret_site_downloads = []
+        for site, min_upload, min_download, max_upload, max_download in rets:
+            min_upload, min_download = int(min_upload or 0), int(min_download or 0)
+            max_upload, max_download = int(max_upload or 0), int(max_download or 0)
+            # 如果最小值都是0，可能时由于近几日没有更新数据，或者cookie过期，正常有数据的话，第二天能正常
+            if min_upload == 0 and min_download == 0:
+                min_upload, min_download = max_upload, max_download
+            ret_sites.append(site)
+            if min_upload < max_upload:
+                total_upload += max_upload - min_upload
+                ret_site_uploads.append(max_upload - min_upload)
+            else:
+                ret_site_uploads.append(0)
+            if min_download < max_download:
+                total_download += max_download - min_download
+                ret_site_downloads.append(max_download - min_download)
+            else:
+                ret_site_downloads.append(0)
+        return total_upload, total_download, ret_sites, ret_site_uploads, ret_site_downloads
 
     def is_exists_download_history(self, enclosure, downloader, download_id):
         """
         查询下载历史是否存在
         """
         if enclosure:
-            count = self._db.query(DOWNLOADHISTORY).filter(
-                DOWNLOADHISTORY.ENCLOSURE == enclosure
-            ).count()
-        else:
-            count = self._db.query(DOWNLOADHISTORY).filter(
-                DOWNLOADHISTORY.DOWNLOADER == downloader,
-                DOWNLOADHISTORY.DOWNLOAD_ID == download_id
-            ).count()
-        if count > 0:
-            return True
+            return self.__is_exists(
+                "download_history",
+                enclosure,
+                lambda: self._db.query(DOWNLOADHISTORY).filter(
+                    DOWNLOADHISTORY.ENCLOSURE == enclosure
+                ).count() > 0
+            )
         else:
-            return False
+            return self.__is_exists(
+                "download_history",
+                (str(downloader), str(download_id)),
+                lambda: self._db.query(DOWNLOADHISTORY).filter(
+                    DOWNLOADHISTORY.DOWNLOADER == downloader,
+                    DOWNLOADHISTORY.DOWNLOAD_ID == download_id
+                ).count() > 0
+            )
 
     @DbPersist(_db)
     def insert_download_history(self, media_info, downloader, download_id, save_dir):
         """
         新增下载历史
         """
-        if not media_info:
+        download_history = self.__save_download_history(media_info, downloader, download_id, save_dir)
+        if download_history:
+            self._db.insert(download_history)
+
+    @DbPersist(_db)
+    def insert_download_histories(self, histories: list):
+        """
+        批量新增下载历史，在同一个事务中写入：已存在的记录按批次用IN一次查出，新记录一次批量插入，已存在的记录批量更新
+        :param histories: 字典列表，键同insert_download_history的参数
+        """
+        if not histories:
             return
-        if not media_info.title or not media_info.tmdb_id:
+        # 存在性判断的键：有下载链接时按链接，否则按下载器任务，与is_exists_download_history一致；同一批次中重复的只登记一次
+        items = {}
+        for history in histories:
+            media_info = history.get("media_info")
+            if not media_info or not media_info.title or not media_info.tmdb_id:
+                continue
+            key = media_info.enclosure or (str(history.get("downloader")), str(history.get("download_id")))
+            if key not in items:
+                items[key] = history
+        if not items:
             return
+        exists_keys = set()
+        exists_ids = {}
+        for hid, enclosure, downloader, download_id in self.__query_download_histories(
+                enclosures=[key for key in items if not isinstance(key, tuple)],
+                tasks=[key for key in items if isinstance(key, tuple)]):
+            task = (str(downloader), str(download_id))
+            exists_keys.update((enclosure, task))
+            exists_ids.setdefault((enclosure, task), []).append(hid)
+        download_histories = []
+        updates = []
+        for key, history in items.items():
+            media_info = history.get("media_info")
+            downloader = history.get("downloader")
+            download_id = history.get("download_id")
+            save_dir = history.get("save_dir")
+            self._db.on_commit(
+                lambda m=media_info, d=downloader, i=download_id: self.__set_download_history_cache(m.enclosure, d, i))
+            if key not in exists_keys:
+                download_histories.append(self.__get_download_history(media_info, downloader, download_id, save_dir))
+                continue
+            # 与单条登记一致，只更新下载链接及下载器任务都相同的记录
+            values = self.__get_download_history_updates(media_info, save_dir)
+            for hid in exists_ids.get((media_info.enclosure, (str(downloader), str(download_id))), []):
+                updates.append(dict(values, ID=hid))
+        if download_histories:
+            self._db.bulk_insert(DOWNLOADHISTORY, download_histories)
+        if updates:
+            self._db.bulk_update(DOWNLOADHISTORY, updates)
+
+    def __query_download_histories(self, enclosures, tasks):
+        """
+        按批次使用IN查询已存在的下载历史
+        :param enclosures: 下载链接列表
+        :param tasks: (下载器, 任务ID)列表
+        :return: (ID, ENCLOSURE, DOWNLOADER, DOWNLOAD_ID)列表
+        """
+        columns = (DOWNLOADHISTORY.ID, DOWNLOADHISTORY.ENCLOSURE, DOWNLOADHISTORY.DOWNLOADER,
+                   DOWNLOADHISTORY.DOWNLOAD_ID)
+        rows = {}
+        for values, column in ((enclosures, DOWNLOADHISTORY.ENCLOSURE),
+                               (tasks, tuple_(DOWNLOADHISTORY.DOWNLOADER, DOWNLOADHISTORY.DOWNLOAD_ID))):
+            for i in range(0, len(values), self._query_chunk_size):
+                chunk = values[i:i + self._query_chunk_size]
+                for row in self._db.query(*columns).filter(column.in_(chunk)):
+                    rows[row[0]] = tuple(row)
+        return list(rows.values())
+
+    def __save_download_history(self, media_info, downloader, download_id, save_dir):
+        """
+        下载历史已存在时更新，否则返回待插入的记录，由调用方插入
+        """
+        if not media_info:
+            return None
+        if not media_info.title or not media_info.tmdb_id:
+            return None
+        self._db.on_commit(lambda: self.__set_download_history_cache(media_info.enclosure, downloader, download_id))
         if self.is_exists_download_history(enclosure=media_info.enclosure,
                                            downloader=downloader,
                                            download_id=download_id):
             self._db.query(DOWNLOADHISTORY).filter(DOWNLOADHISTORY.ENCLOSURE == media_info.enclosure,
                                                    DOWNLOADHISTORY.DOWNLOADER == downloader,
                                                    DOWNLOADHISTORY.DOWNLOAD_ID == download_id).update(
-                {
-                    "TORRENT": media_info.org_string,
-                    "ENCLOSURE": media_info.enclosure,
-                    "DESC": media_info.description,
-                    "SITE": media_info.site,
-                    "DOWNLOADER": downloader,
-                    "DOWNLOAD_ID": download_id,
-                    "SAVE_PATH": save_dir,
-                    "SE": media_info.get_season_episode_string(),
-                    "DATE": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time())),
-                }
+                self.__get_download_history_updates(media_info, save_dir)
             )
-        else:
-            self._db.insert(DOWNLOADHISTORY(
-                TITLE=media_info.title,
-                YEAR=media_info.year,
-                TYPE=media_info.type.value,
-                TMDBID=media_info.tmdb_id,
-                VOTE=media_info.vote_average,
-                POSTER=media_info.get_poster_image(),
-                OVERVIEW=media_info.overview,
-                TORRENT=media_info.org_string,
-                ENCLOSURE=media_info.enclosure,
-                DESC=media_info.description,
-                DATE=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time())),
-                SITE=media_info.site,
-                DOWNLOADER=downloader,
-                DOWNLOAD_ID=download_id,
-                SAVE_PATH=save_dir,
-                SE=media_info.get_season_episode_string()
-            ))
+            return None
+        return DOWNLOADHISTORY(**self.__get_download_history(media_info, downloader, download_id, save_dir))
+
+    @staticmethod
+    def __get_download_history_updates(media_info, save_dir):
+        """
+        下载历史已存在时需更新的字段
+        """
+        return {
+            "TORRENT": media_info.org_string,
+            "DESC": media_info.description,
+            "SITE": media_info.site,
+            "SAVE_PATH": save_dir,
+            "SE": media_info.get_season_episode_string(),
+            "DATE": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time())),
+        }
+
+    @staticmethod
+    def __get_download_history(media_info, downloader, download_id, save_dir):
+        """
+        待插入的下载历史记录的字段
+        """
+        return {
+            "TITLE": media_info.title,
+            "YEAR": media_info.year,
+            "TYPE": media_info.type.value,
+            "TMDBID": media_info.tmdb_id,
+            "VOTE": media_info.vote_average,
+            "POSTER": media_info.get_poster_image(),
+            "OVERVIEW": media_info.overview,
+            "TORRENT": media_info.org_string,
+            "ENCLOSURE": media_info.enclosure,
+            "DESC": media_info.description,
+            "DATE": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time())),
+            "SITE": media_info.site,
+            "DOWNLOADER": downloader,
+            "DOWNLOAD_ID": download_id,
+            "SAVE_PATH": save_dir,
+            "SE": media_info.get_season_episode_string()
+        }
+
+    @staticmethod
+    def __set_download_history_cache(enclosure, downloader, download_id):
+        """
+        登记下载历史的存在性缓存，下载链接及下载器任务两种键都会命中
+        """
+        if enclosure:
+            ExistsCache.set("download_history", enclosure, True)
+        ExistsCache.set("download_history", (str(downloader), str(download_id)), True)
 
-    def get_download_history(self, date=None, hid=None, num=30, page=1):
+    def get_download_history(self, date=None, hid=None, num=30, page=1, last_date=None, last_id=None):
         """
-        查询下载历史
+        查询下载历史，同一标题只返回最新的一条，按(DATE, ID)倒序
+        :param date: 只查询该时间之后的记录，不分页
+        :param hid: 按ID查询
+        :param num: 每页条数
+        :param page: 页码，未传入last_id时按页码偏移
+        :param last_date: 上一页最后一条记录的DATE，可为空
+        :param last_id: 上一页最后一条记录的ID，传入时从该记录之后开始查询，不再使用偏移
         """
         if hid:
             return self._db.query(DOWNLOADHISTORY).filter(DOWNLOADHISTORY.ID == int(hid)).all()
-        sub_query = self._db.query(DOWNLOADHISTORY,
-                                   func.max(DOWNLOADHISTORY.DATE)
-                                   ).group_by(DOWNLOADHISTORY.TITLE).subquery()
+        # 不存在同标题更新的记录，即为该标题最新的一条
+        # 标题用IS比较，使空标题与分组时一样归为一组；空日期按最早处理，与倒序排序时排在最后一致
+        newer = aliased(DOWNLOADHISTORY)
+        query = self._db.query(DOWNLOADHISTORY).filter(~exists().where(
+            newer.TITLE.is_(DOWNLOADHISTORY.TITLE),
+            tuple_(func.coalesce(newer.DATE, ""), newer.ID)
+            > tuple_(func.coalesce(DOWNLOADHISTORY.DATE, ""), DOWNLOADHISTORY.ID)
+        ))
         if date:
-            return self._db.query(DOWNLOADHISTORY).filter(
-                DOWNLOADHISTORY.DATE > date).join(
-                sub_query,
-                and_(sub_query.c.ID == DOWNLOADHISTORY.ID)
-            ).order_by(DOWNLOADHISTORY.DATE.desc()).all()
-        else:
-            offset = (int(page) - 1) * int(num)
-            return self._db.query(DOWNLOADHISTORY).join(
-                sub_query,
-                and_(sub_query.c.ID == DOWNLOADHISTORY.ID)
-            ).order_by(
-                DOWNLOADHISTORY.DATE.desc()
-            ).limit(num).offset(offset).all()
+            return query.filter(DOWNLOADHISTORY.DATE > date).order_by(DOWNLOADHISTORY.DATE.desc(),
+                                                                      DOWNLOADHISTORY.ID.desc()).all()
+        offset = 0
+        if last_id is not None:
+            query = query.filter(tuple_(func.coalesce(DOWNLOADHISTORY.DATE, ""), DOWNLOADHISTORY.ID)
+                                 < tuple_(last_date or "", int(last_id)))
+        else:
+            offset = (max(int(page), 1) - 1) * int(num)
+        return query.order_by(DOWNLOADHISTORY.DATE.desc(),
+                              DOWNLOADHISTORY.ID.desc()).offset(offset).limit(int(num)).all()
 
     def get_download_history_by_title(self, title):
         """
@@ -1645,6 +1794,7 @@ class DbHelper:
         """
         self._db.query(SITEBRUSHTASK).filter(SITEBRUSHTASK.ID == int(brush_id)).delete()
         self._db.query(SITEBRUSHTORRENTS).filter(SITEBRUSHTORRENTS.TASK_ID == brush_id).delete()
+        self._db.on_commit(lambda: ExistsCache.clear("brushtask_torrent"))
 
     def get_brushtasks(self, brush_id=None):
         """
@@ -1757,6 +1907,7 @@ class DbHelper:
             DOWNLOAD_ID=download_id,
             LST_MOD_DATE=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
         ))
+        self._db.on_commit(lambda: ExistsCache.set("brushtask_torrent", (str(brush_id), title, enclosure), True))
 
     def get_brushtask_torrents(self, brush_id, active=True):
         """
@@ -1787,13 +1938,13 @@ class DbHelper:
         """
         if not brush_id:
             return False
-        count = self._db.query(SITEBRUSHTORRENTS).filter(SITEBRUSHTORRENTS.TASK_ID == brush_id,
-                                                         SITEBRUSHTORRENTS.TORRENT_NAME == title,
-                                                         SITEBRUSHTORRENTS.ENCLOSURE == enclosure).count()
-        if count > 0:
-            return True
-        else:
-            return False
+        return self.__is_exists(
+            "brushtask_torrent",
+            (str(brush_id), title, enclosure),
+            lambda: self._db.query(SITEBRUSHTORRENTS).filter(SITEBRUSHTORRENTS.TASK_ID == brush_id,
+                                                             SITEBRUSHTORRENTS.TORRENT_NAME == title,
+                                                             SITEBRUSHTORRENTS.ENCLOSURE == enclosure).count() > 0
+        )
 
     @DbPersist(_db)
     def update_brushtask_torrent_state(self, ids: list):
@@ -1820,6 +1971,7 @@ class DbHelper:
             return
         self._db.query(SITEBRUSHTORRENTS).filter(SITEBRUSHTORRENTS.TASK_ID == brush_id,
                                                  SITEBRUSHTORRENTS.DOWNLOAD_ID == download_id).delete()
+        self._db.on_commit(lambda: ExistsCache.clear("brushtask_torrent"))
 
     @DbPersist(_db)
     def add_filter_group(self, name, default='N'):
@@ -2604,6 +2756,23 @@ class DbHelper:
             DATE=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
         ))
 
+    @DbPersist(_db)
+    def insert_indexer_statistics_batch(self, statistics: list):
+        """
+        批量插入索引器统计，一次搜索的全部统计在同一个事务中写入
+        :param statistics: 字典列表，键同insert_indexer_statistics的参数
+        """
+        if not statistics:
+            return
+        date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
+        self._db.insert([INDEXERSTATISTICS(
+            INDEXER=statistic.get("indexer"),
+            TYPE=statistic.get("itype"),
+            SECONDS=statistic.get("seconds"),
+            RESULT=statistic.get("result"),
+            DATE=date
+        ) for statistic in statistics])
+
     def get_indexer_statistics(self, client_id):
         """
         查询索引器统计
@@ -2619,6 +2788,18 @@ class DbHelper:
         ).filter(INDEXERSTATISTICS.TYPE == client_id
                  ).group_by(INDEXERSTATISTICS.INDEXER).all()
 
+    def get_indexer_statistics_history(self, client_id, limit=2000):
+        """
+        查询最近的索引器统计，用于初始化Indexer健康度
+        :return: 按时间先后排列的(INDEXER, SECONDS)列表
+        """
+        rows = self._db.query(
+            INDEXERSTATISTICS.INDEXER,
+            INDEXERSTATISTICS.SECONDS
+        ).filter(INDEXERSTATISTICS.TYPE == client_id
+                 ).order_by(INDEXERSTATISTICS.ID.desc()).limit(limit).all()
+        return [(row.INDEXER, row.SECONDS) for row in reversed(rows)]
+
     @DbPersist(_db)
     def insert_plugin_history(self, plugin_id, key, value):
         """
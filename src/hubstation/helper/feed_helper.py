@@ -0,0 +1,103 @@
+import hashlib
+
+import requests
+
+from hubstation.config.config import Config
+from hubstation.utils.cache_manager import FeedStateCache
+from hubstation.utils.commons import singleton
+from hubstation.utils.http_utils import ResponseText, SessionPool
+
+
+class FeedResponse(ResponseText):
+    """
+    订阅源的抓取结果
+    """
+    # 内容编码：XML声明 > Content-Type的charset > 检测内容开头部分 > UTF-8
+    _xml_encoding_first = True
+
+    def __init__(self, url, status_code, content, headers, digest, changed):
+        """
+        :param status_code: 200或304
+        :param content: 响应内容，304时为空
+        :param digest: 内容摘要，304时为上次抓取的摘要
+        :param changed: 内容与上次抓取相比是否有变化
+        """
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.digest = digest
+        self.changed = changed
+        self._text = None
+
+    @property
+    def not_modified(self):
+        return self.status_code == 304
+
+
+@singleton
+class FeedHelper:
+    """
+    订阅源抓取：通过SessionPool复用站点的连接，按上次返回的ETag/Last-Modified发送条件请求，
+    304或内容摘要未变化时返回changed=False，调用方可直接复用上次的解析结果
+    """
+    _timeout = 20
+
+    def fetch(self, url, headers=None, proxies=None, timeout=None, conditional=True):
+        """
+        抓取订阅源
+        :param url: 订阅地址
+        :param headers: 请求头，默认只设置User-Agent
+        :param proxies: 代理
+        :param timeout: 超时时间，单位秒
+        :param conditional: 是否按上次抓取的结果发送条件请求
+        :return: FeedResponse，请求失败返回None
+        """
+        if not url:
+            return None
+        state = FeedStateCache.get(url) if conditional else None
+        req_headers = {"User-Agent": Config().get_ua()} if headers is None else dict(headers)
+        if state:
+            if state.get("etag"):
+                req_headers["If-None-Match"] = state.get("etag")
+            if state.get("last_modified"):
+                req_headers["If-Modified-Since"] = state.get("last_modified")
+        pool = SessionPool()
+        try:
+            with pool.limit(url, timeout=timeout or self._timeout):
+                res = pool.get_session(url, proxies=proxies).get(url,
+                                                                 headers=req_headers,
+                                                                 proxies=proxies,
+                                                                 timeout=timeout or self._timeout,
+                                                                 verify=False)
+        except requests.exceptions.RequestException:
+            return None
+        if res.status_code == 304 and state:
+            return FeedResponse(url=url,
+                                status_code=304,
+                                content=b"",
+                                headers=res.headers,
+                                digest=state.get("digest"),
+                                changed=False)
+        if not res.ok:
+            return None
+        content = res.content
+        digest = hashlib.sha1(content).hexdigest()
+        changed = not state or state.get("digest") != digest
+        FeedStateCache.set(url, {
+            "etag": res.headers.get("ETag"),
+            "last_modified": res.headers.get("Last-Modified"),
+            "digest": digest
+        })
+        return FeedResponse(url=url,
+                            status_code=res.status_code,
+                            content=content,
+                            headers=res.headers,
+                            digest=digest,
+                            changed=changed)
+
+    def forget(self, url):
+        """
+        清除订阅源的抓取状态，下次抓取时不发送条件请求
+        """
+        FeedStateCache.delete(url)
@@ -4,6 +4,7 @@ from urllib import parse
 
 import requests
 
+from hubstation.utils.cache_manager import PanPathCache
 from hubstation.utils.exception_utils import ExceptionUtils
 from hubstation.utils.http_utils import RequestUtils
 
@@ -82,28 +83,37 @@ class PanHelper:
 
     # 获取任务列表
     def gettasklist(self, page=1):
-        try:
-            tasks = []
-            url = "https://115.com/web/lixian/?ct=lixian&ac=task_lists"
-            while True:
+        tasks = list(self.itertasklist(page=page))
+        if self.err:
+            return False, tasks
+        return True, tasks
+
+    # 逐页获取任务列表，出错时停止并记录err
+    def itertasklist(self, page=1):
+        self.err = None
+        url = "https://115.com/web/lixian/?ct=lixian&ac=task_lists"
+        while True:
+            try:
                 postdata = "page={}&uid={}&sign={}&time={}".format(page, self.uid, self.sign,
                                                                    str(round(time.time() * 1000)))
                 p = self.req.post_res(url=url, params=postdata.encode('utf-8'))
-                if p:
-                    rootobject = p.json()
-                    if not rootobject.get("state"):
-                        self.err = "获取任务列表错误：{}".format(rootobject["error"])
-                        return False, tasks
-                    if rootobject.get("count") == 0:
-                        break
-                    tasks += rootobject.get("tasks") or []
-                    if page >= rootobject.get("page_count"):
-                        break
-            return True, tasks
-        except Exception as result:
-            ExceptionUtils.exception_traceback(result)
-            self.err = "异常错误：{}".format(result)
-        return False, []
+                if not p:
+                    self.err = "获取任务列表错误：第{}页请求失败".format(page)
+                    return
+                rootobject = p.json()
+            except Exception as result:
+                ExceptionUtils.exception_traceback(result)
+                self.err = "异常错误：{}".format(result)
+                return
+            if not rootobject.get("state"):
+                self.err = "获取任务列表错误：{}".format(rootobject.get("error"))
+                return
+            if rootobject.get("count") == 0:
+                return
+            yield from rootobject.get("tasks") or []
+            if page >= (rootobject.get("page_count") or 0):
+                return
+            page += 1
 
     # 添加任务
     def addtask(self, tdir, content):
@@ -156,8 +166,18 @@ class PanHelper:
             self.err = "异常错误：{}".format(result)
         return False
 
-    # 根据ID获取文件夹路径
+    # 根据ID获取文件夹路径，成功的结果缓存一段时间
     def getiddir(self, tid):
+        cache_key = f"{self.uid}:{tid}"
+        path = PanPathCache.get(cache_key)
+        if path:
+            return True, path
+        ret, path = self.__getiddir(tid)
+        if ret:
+            PanPathCache.set(cache_key, path)
+        return ret, path
+
+    def __getiddir(self, tid):
         try:
             path = '/'
             url = "https://aps.115.com/natsort/files.php?aid=1&cid={}&o=file_name&asc=1&offset=0&show_dir=1&limit=40&code=&scid=&snap=0&natsort=1&record_open_time=1&source=&format=json&fc_mix=0&type=&star=&is_share=&suffix=&custom_order=0".format(
@@ -166,7 +186,7 @@ class PanHelper:
             if p:
                 rootobject = p.json()
                 if not rootobject.get("state"):
-                    self.err = "获取 ID[{}]路径 错误：{}".format(id, rootobject["error"])
+                    self.err = "获取 ID[{}]路径 错误：{}".format(tid, rootobject["error"])
                     return False, path
                 patharray = rootobject["path"]
                 for pathobject in patharray:
@@ -1,5 +1,6 @@
 import re
-import xml.dom.minidom
+import threading
+from xml.etree.ElementTree import ParseError
 
 # from app.db import MainDb, DbPersist
 # from app.db.models import RSSTORRENTS
@@ -8,102 +9,149 @@ import xml.dom.minidom
 from hubstation.config.config import Config
 from hubstation.db.main_db import MainDb
 from hubstation.db.models import RSSTORRENTS
+from hubstation.helper.feed_helper import FeedHelper
+from hubstation.utils.cache_manager import RssItemsCache
 from hubstation.utils.commons import DbPersist
-from hubstation.utils.dom_utils import DomUtils
 from hubstation.utils.exception_utils import ExceptionUtils
-from hubstation.utils.http_utils import RequestUtils
 from hubstation.utils.string_utils import StringUtils
+from hubstation.utils.xml_utils import XmlUtils
+
+lock = threading.Lock()
 
 
 class RssHelper:
     _db = MainDb()
+    # 已处理过的RSS下载链接、种子名称缓存，启动时从RSS_TORRENTS预热，命中即视为已处理
+    _rssd_enclosures = set()
+    _rssd_names = set()
+    _rssd_cache_inited = False
+    # 缓存代次，删除记录时递增；查询数据库前后代次不同时，查到的结果可能已被删除，不再写入缓存
+    _rssd_generation = 0
+    # 批量查询时每批的数量，SQLite单条语句的变量数上限为999
+    _query_chunk_size = 500
 
     @staticmethod
     def parse_rssxml(url, proxy=False):
         """
         解析RSS订阅URL，获取RSS中的种子信息
+        订阅内容未变化（304或内容摘要相同）时不再解析，直接返回上次的解析结果
         :param url: RSS地址
         :param proxy: 是否使用代理
         :return: 种子信息列表，如为None代表Rss过期
         """
-        _special_title_sites = {
-            'pt.keepfrds.com': url.keepfriends_title
-        }
+        if not url:
+            return []
+        proxies = Config().get_proxies() if proxy else None
+        ret = FeedHelper().fetch(url, proxies=proxies)
+        if not ret:
+            return []
+        cached = RssItemsCache.get(url)
+        if not ret.changed:
+            if cached and cached[0] == ret.digest:
+                return [dict(item) for item in cached[1]]
+            if ret.not_modified:
+                # 解析结果已被淘汰，重新抓取完整内容
+                ret = FeedHelper().fetch(url, proxies=proxies, conditional=False)
+                if not ret:
+                    return []
+        ret_array = RssHelper.__parse_rss_items(url, ret)
+        if ret_array is not None:
+            RssItemsCache.set(url, (ret.digest, [dict(item) for item in ret_array]))
+        return ret_array
 
+    def get_rss_updates(self, url, proxy=False, simple=False):
+        """
+        解析RSS订阅并批量过滤已处理过的条目，RSS检查的入口
+        :param url: RSS地址
+        :param proxy: 是否使用代理
+        :param simple: 去重规则，同get_unrssd_items
+        :return: 未处理过的种子信息列表，如为None代表Rss过期
+        """
+        rss_items = self.parse_rssxml(url, proxy=proxy)
+        if rss_items is None:
+            return None
+        return self.get_unrssd_items(rss_items, simple=simple)
+
+    @staticmethod
+    def __parse_rss_items(url, ret):
+        """
+        解析RSS内容
+        :param ret: FeedResponse
+        :return: 种子信息列表，如为None代表Rss过期
+        """
         _rss_expired_msg = [
             "RSS 链接已过期, 您需要获得一个新的!",
             "RSS Link has expired, You need to get a new one!"
         ]
 
-        # 开始处理
-        ret_array = []
-        if not url:
-            return []
         site_domain = StringUtils.get_url_domain(url)
         try:
-            ret = RequestUtils(proxies=Config().get_proxies() if proxy else None).get_res(url)
-            if not ret:
-                return []
-            ret.encoding = ret.apparent_encoding
+            # 按XML声明的编码直接解析字节内容，无法解析时再按检测的编码解码后重新解析
+            try:
+                return list(RssHelper.iter_rss_items(ret.content, site_domain))
+            except ParseError:
+                return list(RssHelper.iter_rss_items(ret.text, site_domain))
         except Exception as e2:
+            # RSS过期 观众RSS 链接已过期，您需要获得一个新的！  pthome RSS Link has expired, You need to get a new one!
+            if ret.text in _rss_expired_msg:
+                return None
             ExceptionUtils.exception_traceback(e2)
-            return []
-        if ret:
-            ret_xml = ret.text
+        return []
+
+    @staticmethod
+    def iter_rss_items(content, site_domain=None):
+        """
+        增量解析RSS内容，逐个返回种子信息
+        :param content: RSS内容，bytes或str
+        :param site_domain: 站点域名，用于标题特殊处理
+        :return: 种子信息生成器，XML格式错误时抛出ParseError
+        """
+        _special_title_sites = {
+            'pt.keepfrds.com': RssHelper.keepfriends_title
+        }
+
+        for item, _ in XmlUtils.iter_items(content):
             try:
-                # 解析XML
-                dom_tree = xml.dom.minidom.parseString(ret_xml)
-                rootNode = dom_tree.documentElement
-                items = rootNode.getElementsByTagName("item")
-                for item in items:
-                    try:
-                        # 标题
-                        title = DomUtils.tag_value(item, "title", default="")
-                        if not title:
-                            continue
-                        # 标题特殊处理
-                        if site_domain and site_domain in _special_title_sites:
-                            title = _special_title_sites.get(site_domain)(title)
-                        # 描述
-                        description = DomUtils.tag_value(item, "description", default="")
-                        # 种子页面
-                        link = DomUtils.tag_value(item, "link", default="")
-                        # 种子链接
-                        enclosure = DomUtils.tag_value(item, "enclosure", "url", default="")
-                        if not enclosure and not link:
-                            continue
-                        # 部分RSS只有link没有enclosure
-                        if not enclosure and link:
-                            enclosure = link
-                            link = None
-                        # 大小
-                        size = DomUtils.tag_value(item, "enclosure", "length", default=0)
-                        if size and str(size).isdigit():
-                            size = int(size)
-                        else:
-                            size = 0
-                        # 发布日期
-                        pubdate = DomUtils.tag_value(item, "pubDate", default="")
-                        if pubdate:
-                            # 转换为时间
-                            pubdate = StringUtils.get_time_stamp(pubdate)
-                        # 返回对象
-                        tmp_dict = {'title': title,
-                                    'enclosure': enclosure,
-                                    'size': size,
-                                    'description': description,
-                                    'link': link,
-                                    'pubdate': pubdate}
-                        ret_array.append(tmp_dict)
-                    except Exception as e1:
-                        ExceptionUtils.exception_traceback(e1)
-                        continue
-            except Exception as e2:
-                # RSS过期 观众RSS 链接已过期，您需要获得一个新的！  pthome RSS Link has expired, You need to get a new one!
-                if ret_xml in _rss_expired_msg:
-                    return None
-                ExceptionUtils.exception_traceback(e2)
-        return ret_array
+                # 标题
+                title = XmlUtils.tag_value(item, "title", default="")
+                if not title:
+                    continue
+                # 标题特殊处理
+                if site_domain and site_domain in _special_title_sites:
+                    title = _special_title_sites.get(site_domain)(title)
+                # 描述
+                description = XmlUtils.tag_value(item, "description", default="")
+                # 种子页面
+                link = XmlUtils.tag_value(item, "link", default="")
+                # 种子链接
+                enclosure = XmlUtils.tag_value(item, "enclosure", "url", default="")
+                if not enclosure and not link:
+                    continue
+                # 部分RSS只有link没有enclosure
+                if not enclosure and link:
+                    enclosure = link
+                    link = None
+                # 大小
+                size = XmlUtils.tag_value(item, "enclosure", "length", default=0)
+                if size and str(size).isdigit():
+                    size = int(size)
+                else:
+                    size = 0
+                # 发布日期
+                pubdate = XmlUtils.tag_value(item, "pubDate", default="")
+                if pubdate:
+                    # 转换为时间
+                    pubdate = StringUtils.get_time_stamp(pubdate)
+                # 返回对象
+                yield {'title': title,
+                       'enclosure': enclosure,
+                       'size': size,
+                       'description': description,
+                       'link': link,
+                       'pubdate': pubdate}
+            except Exception as e1:
+                ExceptionUtils.exception_traceback(e1)
+                continue
 
     @DbPersist(_db)
     def insert_rss_torrents(self, media_info):
@@ -120,6 +168,121 @@ class RssHelper:
                 SEASON=media_info.get_season_string(),
                 EPISODE=media_info.get_episode_string()
             ))
+        self._db.on_commit(lambda: self.__add_rssd_cache(enclosure=media_info.enclosure,
+                                                         torrent_name=media_info.org_string))
+
+    def init_rssd_cache(self):
+        """
+        从RSS_TORRENTS预热已处理RSS的缓存；加载期间有记录被删除时重新加载，加载期间新增的记录合并保留
+        """
+        while True:
+            generation = RssHelper._rssd_generation
+            enclosures, names = set(), set()
+            for enclosure, torrent_name in self._db.query(RSSTORRENTS.ENCLOSURE,
+                                                          RSSTORRENTS.TORRENT_NAME).yield_per(5000):
+                if enclosure:
+                    enclosures.add(enclosure)
+                if torrent_name:
+                    names.add(torrent_name)
+            with lock:
+                if generation != RssHelper._rssd_generation:
+                    continue
+                RssHelper._rssd_enclosures = enclosures | RssHelper._rssd_enclosures
+                RssHelper._rssd_names = names | RssHelper._rssd_names
+                RssHelper._rssd_cache_inited = True
+                return
+
+    def __check_rssd_cache(self):
+        """
+        缓存未预热时先预热
+        """
+        if not self._rssd_cache_inited:
+            self.init_rssd_cache()
+
+    @staticmethod
+    def __add_rssd_cache(enclosure=None, torrent_name=None, generation=None):
+        """
+        登记已处理的RSS到缓存
+        :param generation: 查询数据库前的缓存代次，之后有记录被删除时不登记
+        """
+        with lock:
+            if generation is not None and generation != RssHelper._rssd_generation:
+                return
+            if enclosure:
+                RssHelper._rssd_enclosures.add(enclosure)
+            if torrent_name:
+                RssHelper._rssd_names.add(torrent_name)
+
+    @staticmethod
+    def __remove_rssd_cache(enclosures=None, torrent_names=None, clear=False):
+        """
+        从缓存中移除已删除的RSS记录，在删除的事务提交后调用
+        """
+        with lock:
+            RssHelper._rssd_generation += 1
+            if clear:
+                RssHelper._rssd_enclosures.clear()
+                RssHelper._rssd_names.clear()
+                return
+            for enclosure in enclosures or []:
+                RssHelper._rssd_enclosures.discard(enclosure)
+            for torrent_name in torrent_names or []:
+                RssHelper._rssd_names.discard(torrent_name)
+
+    def __query_rssd(self, column, values):
+        """
+        按批次使用IN查询已处理过的值
+        :param column: RSSTORRENTS.ENCLOSURE 或 RSSTORRENTS.TORRENT_NAME
+        :param values: 需要查询的值
+        :return: 数据库中存在的值集合
+        """
+        values = list(values)
+        exists = set()
+        for i in range(0, len(values), self._query_chunk_size):
+            chunk = values[i:i + self._query_chunk_size]
+            exists.update(row[0] for row in self._db.query(column).filter(column.in_(chunk)).distinct())
+        return exists
+
+    def get_unrssd_items(self, rss_items, simple=False):
+        """
+        批量过滤RSS条目，返回未处理过的部分。先查内存缓存，未命中的再按批次查询数据库
+        :param rss_items: parse_rssxml返回的种子信息列表
+        :param simple: 为True时按is_rssd_by_simple的规则（有下载链接按链接，否则按名称）判断，否则按is_rssd_by_enclosure
+        :return: 未处理过的种子信息列表，保持原有顺序
+        """
+        if not rss_items:
+            return []
+        self.__check_rssd_cache()
+        generation = self._rssd_generation
+        # 缓存未命中，需要查询数据库的下载链接和名称
+        enclosures, names = set(), set()
+        for item in rss_items:
+            enclosure, title = item.get("enclosure"), item.get("title")
+            if enclosure:
+                if enclosure not in self._rssd_enclosures:
+                    enclosures.add(enclosure)
+            elif simple and title and title not in self._rssd_names:
+                names.add(title)
+        # 数据库中已存在的，与缓存命中的一起视为已处理
+        rssd_enclosures, rssd_names = set(), set()
+        if enclosures:
+            rssd_enclosures = self.__query_rssd(RSSTORRENTS.ENCLOSURE, enclosures)
+            for enclosure in rssd_enclosures:
+                self.__add_rssd_cache(enclosure=enclosure, generation=generation)
+        if names:
+            rssd_names = self.__query_rssd(RSSTORRENTS.TORRENT_NAME, names)
+            for name in rssd_names:
+                self.__add_rssd_cache(torrent_name=name, generation=generation)
+        ret_items = []
+        for item in rss_items:
+            enclosure, title = item.get("enclosure"), item.get("title")
+            if enclosure:
+                if enclosure in self._rssd_enclosures or enclosure in rssd_enclosures:
+                    continue
+            elif not simple or not title or title in self._rssd_names or title in rssd_names:
+                continue
+            ret_items.append(item)
+        return ret_items
 
     def is_rssd_by_enclosure(self, enclosure):
         """
@@ -127,7 +290,12 @@ class RssHelper:
         """
         if not enclosure:
             return True
+        self.__check_rssd_cache()
+        if enclosure in self._rssd_enclosures:
+            return True
+        generation = self._rssd_generation
         if self._db.query(RSSTORRENTS).filter(RSSTORRENTS.ENCLOSURE == enclosure).count() > 0:
+            self.__add_rssd_cache(enclosure=enclosure, generation=generation)
             return True
         else:
             return False
@@ -139,10 +307,16 @@ class RssHelper:
         if not torrent_name and not enclosure:
             return True
         if enclosure:
-            ret = self._db.query(RSSTORRENTS).filter(RSSTORRENTS.ENCLOSURE == enclosure).count()
-        else:
-            ret = self._db.query(RSSTORRENTS).filter(RSSTORRENTS.TORRENT_NAME == torrent_name).count()
-        return True if ret > 0 else False
+            return self.is_rssd_by_enclosure(enclosure)
+        self.__check_rssd_cache()
+        if torrent_name in self._rssd_names:
+            return True
+        generation = self._rssd_generation
+        ret = self._db.query(RSSTORRENTS).filter(RSSTORRENTS.TORRENT_NAME == torrent_name).count()
+        if ret > 0:
+            self.__add_rssd_cache(torrent_name=torrent_name, generation=generation)
+            return True
+        return False
 
     @DbPersist(_db)
     def simple_insert_rss_torrents(self, title, enclosure):
@@ -154,6 +328,7 @@ class RssHelper:
                 TORRENT_NAME=title,
                 ENCLOSURE=enclosure
             ))
+        self._db.on_commit(lambda: self.__add_rssd_cache(enclosure=enclosure, torrent_name=title))
 
     @DbPersist(_db)
     def simple_delete_rss_torrents(self, title, enclosure=None):
@@ -163,8 +338,13 @@ class RssHelper:
         if enclosure:
             self._db.query(RSSTORRENTS).filter(RSSTORRENTS.TORRENT_NAME == title,
                                                RSSTORRENTS.ENCLOSURE == enclosure).delete()
+            enclosures = [enclosure]
         else:
+            # 按名称删除时，同时移除这些记录的下载链接缓存
+            enclosures = [row[0] for row in
+                          self._db.query(RSSTORRENTS.ENCLOSURE).filter(RSSTORRENTS.TORRENT_NAME == title)]
             self._db.query(RSSTORRENTS).filter(RSSTORRENTS.TORRENT_NAME == title).delete()
+        self._db.on_commit(lambda: self.__remove_rssd_cache(enclosures=enclosures, torrent_names=[title]))
 
     @DbPersist(_db)
     def truncate_rss_history(self):
@@ -172,6 +352,7 @@ class RssHelper:
         清空RSS历史记录
         """
         self._db.query(RSSTORRENTS).delete()
+        self._db.on_commit(lambda: self.__remove_rssd_cache(clear=True))
 
 
     @staticmethod
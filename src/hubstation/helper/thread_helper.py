@@ -2,10 +2,13 @@ from concurrent.futures import ThreadPoolExecutor
 
 from hubstation.utils.commons import singleton
 
+# 公共线程池的线程数
+THREAD_NUM = 100
+
 
 @singleton
 class ThreadHelper:
-    _thread_num = 100
+    _thread_num = THREAD_NUM
     executor = None
 
     def __init__(self):
@@ -1,2 +1,189 @@
+import concurrent.futures
 import datetime
+import logging
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from hubstation.constants import ProgressKey
+from hubstation.helper.thread_helper import ThreadHelper
+from hubstation.indexer.health import IndexerHealth
+from hubstation.utils.exception_utils import ExceptionUtils
+
+logger = logging.getLogger(__name__)
+
+
+class Indexer:
+    """
+    聚合搜索：关键字并发发送到检索器的全部Indexer，按返回顺序逐个返回结果，
+    整体耗时受全局截止时间限制，不随Indexer数量累加；索引统计在搜索结束后批量登记；
+    按健康度排序发起搜索，熔断中的Indexer不参与搜索，熔断到期后在后台探测
+    """
+    # 全局截止时间，单位秒
+    _search_deadline = 30
+    # 单个Indexer的超时时间，单位秒
+    _indexer_timeout = 10
+    # 最大并发数
+    _max_workers = 16
+    # 各检索器共用的Indexer健康度
+    _health = IndexerHealth()
+    # 已用历史统计初始化健康度的检索器
+    _seeded_clients = set()
+
+    def __init__(self, client, search_deadline=None, indexer_timeout=None, max_workers=None, health=None):
+        """
+        :param client: 检索器实例，需实现search_indexer、filter_search_results
+        :param search_deadline: 全局截止时间，单位秒
+        :param indexer_timeout: 单个Indexer的超时时间，单位秒，不超过全局截止时间
+        :param max_workers: 最大并发数
+        :param health: Indexer健康度，默认使用共用的健康度并用INDEXER_STATISTICS的历史记录初始化
+        """
+        self._client = client
+        if search_deadline:
+            self._search_deadline = search_deadline
+        if indexer_timeout:
+            self._indexer_timeout = indexer_timeout
+        self._indexer_timeout = min(self._indexer_timeout, self._search_deadline)
+        if max_workers:
+            self._max_workers = max_workers
+        if health:
+            self._health = health
+        elif client.client_id not in self._seeded_clients:
+            self._seeded_clients.add(client.client_id)
+            self._health.seed(statistics=client.dbhelper.get_indexer_statistics_history(client.client_id),
+                              timeout=self._indexer_timeout)
+
+    def get_health(self):
+        """
+        查询各Indexer的健康度，用于查看拖慢搜索的站点
+        """
+        return self._health.get_scores()
+
+    def search_by_keyword(self, key_word, filter_args: dict = None, match_media=None, indexers=None):
+        """
+        并发搜索全部Indexer
+        :param key_word: 关键字
+        :param filter_args: 过滤条件，同BaseIndex.search
+        :param match_media: 需要匹配的媒体信息
+        :param indexers: 参与搜索的Indexer，默认为检索器的全部Indexer
+        :return: 生成器，按返回顺序返回：Indexer, 过滤后的结果列表；超时的Indexer不返回
+        """
+        if not key_word:
+            return
+        if filter_args is None:
+            filter_args = {}
+        if indexers is None:
+            indexers = self._client.get_indexers() or []
+        # 不在设定搜索范围的站点过滤掉
+        if filter_args.get("site"):
+            indexers = [indexer for indexer in indexers if indexer.name in filter_args.get("site")]
+        # 站点优先级按配置顺序，不随健康度排序变化
+        order_seqs = {indexer.name: 100 - index for index, indexer in enumerate(indexers)}
+        # 熔断中的Indexer不参与搜索，到期的在后台探测
+        indexers = [indexer for indexer in indexers if not self.__skip_indexer(indexer, key_word)]
+        if not indexers:
+            return
+        indexers = self._health.order(indexers)
+        deadline = time.monotonic() + self._search_deadline
+        statistics = []
+        executor = ThreadPoolExecutor(max_workers=min(len(indexers), self._max_workers),
+                                      thread_name_prefix="indexer")
+        futures = {executor.submit(self.__search_indexer,
+                                   order_seq=order_seqs.get(indexer.name),
+                                   indexer=indexer,
+                                   key_word=key_word,
+                                   filter_args=filter_args,
+                                   match_media=match_media): indexer
+                   for indexer in indexers}
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+                pending.discard(future)
+                indexer = futures[future]
+                try:
+                    success, count, seconds, results = future.result()
+                except Exception as e:
+                    ExceptionUtils.exception_traceback(e)
+                    success, count, seconds, results = False, 0, self._indexer_timeout, []
+                self._health.record(indexer.name, seconds, success)
+                statistics.append(self.__statistic(indexer, seconds, count))
+                if count:
+                    text = f"{indexer.name} 返回 {count} 条数据"
+                else:
+                    text = f"{indexer.name} 未搜索到数据"
+                self._client.progress.update(ptype=ProgressKey.Search, text=text)
+                yield indexer, results or []
+        except concurrent.futures.TimeoutError:
+            logger.warning(f"【Indexer】搜索超过 {self._search_deadline} 秒，"
+                           f"未返回：{'、'.join(futures[future].name for future in pending)}")
+        finally:
+            # 超时或调用方提前结束迭代时不再等待未返回的Indexer，未返回的按失败统计
+            for future in pending:
+                future.cancel()
+                self._health.record(futures[future].name, self._search_deadline, False)
+                statistics.append(self.__statistic(futures[future], self._search_deadline, 0))
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._client.dbhelper.insert_indexer_statistics_batch(statistics)
+
+    def search(self, key_word, filter_args: dict = None, match_media=None, indexers=None):
+        """
+        并发搜索全部Indexer，返回合并后的结果列表
+        """
+        ret_array = []
+        for _, results in self.search_by_keyword(key_word=key_word,
+                                                 filter_args=filter_args,
+                                                 match_media=match_media,
+                                                 indexers=indexers):
+            ret_array.extend(results)
+        return ret_array
+
+    def __skip_indexer(self, indexer, key_word):
+        """
+        熔断中的Indexer跳过，熔断到期的在后台用本次关键字探测一次，探测期间也跳过
+        """
+        if self._health.claim_probe(indexer.name):
+            logger.info(f"【Indexer】{indexer.name} 熔断到期，后台探测中")
+            ThreadHelper().executor.submit(self.__probe_indexer, indexer, key_word)
+            return True
+        return self._health.is_open(indexer.name)
+
+    def __probe_indexer(self, indexer, key_word):
+        """
+        探测熔断的Indexer，不使用搜索结果缓存，结果只用于更新健康度
+        """
+        start = time.monotonic()
+        try:
+            success = self._client.search_indexer(indexer=indexer,
+                                                  key_word=key_word,
+                                                  timeout=self._indexer_timeout,
+                                                  cache=False) is not None
+        except Exception as e:
+            ExceptionUtils.exception_traceback(e)
+            success = False
+        self._health.record(indexer.name, time.monotonic() - start, success)
+
+    def __search_indexer(self, order_seq, indexer, key_word, filter_args, match_media):
+        """
+        在线程池中查询单个Indexer并过滤结果
+        :return: 是否成功返回, 未过滤的结果数, 查询耗时, 过滤后的结果列表
+        """
+        start_time = datetime.datetime.now()
+        result_array = self._client.search_indexer(indexer=indexer,
+                                                   key_word=key_word,
+                                                   timeout=self._indexer_timeout)
+        seconds = (datetime.datetime.now() - start_time).total_seconds()
+        if not result_array:
+            return result_array is not None, 0, seconds, []
+        return True, len(result_array), seconds, self._client.filter_search_results(result_array=result_array,
+                                                                              order_seq=order_seq,
+                                                                              indexer=indexer,
+                                                                              filter_args=filter_args,
+                                                                              match_media=match_media,
+                                                                              start_time=start_time)
+
+    def __statistic(self, indexer, seconds, count):
+        return {
+            "indexer": indexer.name,
+            "itype": self._client.client_id,
+            "seconds": int(seconds),
+            "result": "Y" if count else "N"
+        }
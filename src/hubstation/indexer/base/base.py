@@ -1,13 +1,16 @@
 import datetime
-import xml.dom.minidom
 from abc import ABCMeta, abstractmethod
 
 from hubstation import log
 from hubstation.constants import MediaType, SearchType, ProgressKey
-from hubstation.utils.dom_utils import DomUtils
+from hubstation.indexer.search_cache import SearchCache
 from hubstation.utils.exception_utils import ExceptionUtils
 from hubstation.utils.http_utils import RequestUtils
 from hubstation.utils.string_utils import StringUtils
+from hubstation.utils.xml_utils import XmlUtils
+
+# torznab:attr标签的完整名称
+TORZNAB_ATTR = "{http://torznab.com/schemas/2015/feed}attr"
 
 
 class BaseIndex(metaclass=ABCMeta):
@@ -76,16 +79,11 @@ class BaseIndex(metaclass=ABCMeta):
         # 计算耗时
         start_time = datetime.datetime.now()
         log.info(f"【{self.index_type}】开始搜索Indexer：{indexer.name} ...")
-        # 特殊符号处理
-        search_word = StringUtils.handler_special_chars(text=key_word,
-                                                        replace_word=" ",
-                                                        allow_space=True)
-        api_url = f"{indexer.domain}?apikey={self.api_key}&t=search&q={search_word}"
-        result_array = self.__parse_torznabxml(api_url)
+        result_array = self.search_indexer(indexer=indexer, key_word=key_word)
 
         # 索引花费时间
         seconds = (datetime.datetime.now() - start_time).seconds
-        if len(result_array) == 0:
+        if not result_array:
             log.warn(f"【{self.index_type}】{indexer.name} 未搜索到数据")
             self.progress.update(ptype=ProgressKey.Search, text=f"{indexer.name} 未搜索到数据")
 
@@ -112,108 +110,137 @@ class BaseIndex(metaclass=ABCMeta):
                                               match_media=match_media,
                                               start_time=start_time)
 
+    def search_indexer(self, indexer, key_word, timeout=None, category=None, imdb_id=None, cache=True):
+        """
+        查询单个Indexer，不登记索引统计，统计由调用方登记；
+        结果按Indexer、规范化的关键字、分类及IMDBID缓存，相同的并发搜索只请求一次
+        :param indexer: Indexer信息
+        :param key_word: 关键字
+        :param timeout: 请求超时时间，单位秒，默认10秒
+        :param category: Torznab分类
+        :param imdb_id: IMDBID
+        :param cache: 是否使用缓存，为False时总是请求Indexer
+        :return: 未过滤的种子信息列表，请求失败或返回内容无法解析时为None
+        """
+        # 特殊符号处理
+        search_word = StringUtils.handler_special_chars(text=key_word,
+                                                        replace_word=" ",
+                                                        allow_space=True)
+        api_url = f"{indexer.domain}?apikey={self.api_key}&t=search&q={search_word}"
+        if category:
+            api_url = f"{api_url}&cat={category}"
+        if imdb_id:
+            api_url = f"{api_url}&imdbid={imdb_id}"
+        if not cache:
+            return self.__parse_torznabxml(api_url, timeout=timeout)
+        return SearchCache.get_or_search(key=SearchCache.make_key(indexer=indexer.id,
+                                                                  key_word=key_word,
+                                                                  category=category,
+                                                                  imdb_id=imdb_id),
+                                         search_func=lambda: self.__parse_torznabxml(api_url, timeout=timeout))
+
     @staticmethod
-    def __parse_torznabxml(url):
+    def __parse_torznabxml(url, timeout=None):
         """
         从torznab xml中解析种子信息
         :param url: URL地址
-        :return: 解析出来的种子信息列表
+        :param timeout: 请求超时时间，单位秒
+        :return: 解析出来的种子信息列表，请求失败或内容无法解析时为None
         """
         if not url:
             return []
         try:
-            ret = RequestUtils(timeout=10).get_res(url)
+            ret = RequestUtils(timeout=timeout or 10).get_res(url)
         except Exception as e2:
             ExceptionUtils.exception_traceback(e2)
-            return []
+            return None
         if not ret:
+            return None
+        if not ret.content:
             return []
-        xmls = ret.text
-        if not xmls:
-            return []
-
-        torrents = []
         try:
-            # 解析XML
-            dom_tree = xml.dom.minidom.parseString(xmls)
-            root_node = dom_tree.documentElement
-            items = root_node.getElementsByTagName("item")
-            for item in items:
-                try:
-                    # indexer id
-                    indexer_id = DomUtils.tag_value(item, "jackettindexer", "id",
-                                                    default=DomUtils.tag_value(item, "prowlarrindexer", "id", ""))
-                    # indexer
-                    indexer = DomUtils.tag_value(item, "jackettindexer",
-                                                 default=DomUtils.tag_value(item, "prowlarrindexer", default=""))
+            # 按XML声明的编码直接解析字节内容
+            return list(BaseIndex.iter_torznab_items(ret.content))
+        except Exception as e2:
+            ExceptionUtils.exception_traceback(e2)
+            return None
 
-                    # 标题
-                    title = DomUtils.tag_value(item, "title", default="")
-                    if not title:
-                        continue
-                    # 种子链接
-                    enclosure = DomUtils.tag_value(item, "enclosure", "url", default="")
-                    if not enclosure:
-                        continue
-                    # 描述
-                    description = DomUtils.tag_value(item, "description", default="")
-                    # 种子大小
-                    size = DomUtils.tag_value(item, "size", default=0)
-                    # 种子页面
-                    page_url = DomUtils.tag_value(item, "comments", default="")
+    @staticmethod
+    def iter_torznab_items(content):
+        """
+        增量解析torznab xml，逐个返回种子信息
+        :param content: xml内容，bytes、str或bytes块的可迭代对象
+        :return: 种子信息生成器，XML格式错误时抛出ParseError
+        """
+        for item, torznab_attrs in XmlUtils.iter_items(content, attr_tag=TORZNAB_ATTR):
+            try:
+                # indexer id
+                indexer_id = XmlUtils.tag_value(item, "jackettindexer", "id",
+                                                default=XmlUtils.tag_value(item, "prowlarrindexer", "id", ""))
+                # indexer
+                indexer = XmlUtils.tag_value(item, "jackettindexer",
+                                             default=XmlUtils.tag_value(item, "prowlarrindexer", default=""))
 
-                    # 做种数
-                    seeders = 0
-                    # 下载数
-                    peers = 0
-                    # 是否免费
-                    freeleech = False
-                    # 下载因子
-                    downloadvolumefactor = 1.0
-                    # 上传因子
-                    uploadvolumefactor = 1.0
-                    # imdbid
-                    imdbid = ""
+                # 标题
+                title = XmlUtils.tag_value(item, "title", default="")
+                if not title:
+                    continue
+                # 种子链接
+                enclosure = XmlUtils.tag_value(item, "enclosure", "url", default="")
+                if not enclosure:
+                    continue
+                # 描述
+                description = XmlUtils.tag_value(item, "description", default="")
+                # 种子大小
+                size = XmlUtils.tag_value(item, "size", default=0)
+                # 种子页面
+                page_url = XmlUtils.tag_value(item, "comments", default="")
 
-                    torznab_attrs = item.getElementsByTagName("torznab:attr")
-                    for torznab_attr in torznab_attrs:
-                        name = torznab_attr.getAttribute('name')
-                        value = torznab_attr.getAttribute('value')
-                        if name == "seeders":
-                            seeders = value
-                        if name == "peers":
-                            peers = value
-                        if name == "downloadvolumefactor":
-                            downloadvolumefactor = value
-                            if float(downloadvolumefactor) == 0:
-                                freeleech = True
-                        if name == "uploadvolumefactor":
-                            uploadvolumefactor = value
-                        if name == "imdbid":
-                            imdbid = value
+                # 做种数
+                seeders = 0
+                # 下载数
+                peers = 0
+                # 是否免费
+                freeleech = False
+                # 下载因子
+                downloadvolumefactor = 1.0
+                # 上传因子
+                uploadvolumefactor = 1.0
+                # imdbid
+                imdbid = ""
 
-                    tmp_dict = {'indexer_id': indexer_id,
-                                'indexer': indexer,
-                                'title': title,
-                                'enclosure': enclosure,
-                                'description': description,
-                                'size': size,
-                                'seeders': seeders,
-                                'peers': peers,
-                                'freeleech': freeleech,
-                                'downloadvolumefactor': downloadvolumefactor,
-                                'uploadvolumefactor': uploadvolumefactor,
-                                'page_url': page_url,
-                                'imdbid': imdbid}
-                    torrents.append(tmp_dict)
-                except Exception as e:
-                    ExceptionUtils.exception_traceback(e)
-                    continue
-        except Exception as e2:
-            ExceptionUtils.exception_traceback(e2)
-            pass
+                for torznab_attr in torznab_attrs:
+                    name = torznab_attr.get('name')
+                    value = torznab_attr.get('value', '')
+                    if name == "seeders":
+                        seeders = value
+                    if name == "peers":
+                        peers = value
+                    if name == "downloadvolumefactor":
+                        downloadvolumefactor = value
+                        if float(downloadvolumefactor) == 0:
+                            freeleech = True
+                    if name == "uploadvolumefactor":
+                        uploadvolumefactor = value
+                    if name == "imdbid":
+                        imdbid = value
 
-        return torrents
+                yield {'indexer_id': indexer_id,
+                       'indexer': indexer,
+                       'title': title,
+                       'enclosure': enclosure,
+                       'description': description,
+                       'size': size,
+                       'seeders': seeders,
+                       'peers': peers,
+                       'freeleech': freeleech,
+                       'downloadvolumefactor': downloadvolumefactor,
+                       'uploadvolumefactor': uploadvolumefactor,
+                       'page_url': page_url,
+                       'imdbid': imdbid}
+            except Exception as e:
+                ExceptionUtils.exception_traceback(e)
+                continue
 
     def filter_search_results(self, result_array: list,
                               order_seq,
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import deque
+
+
+class IndexerState:
+    """
+    单个Indexer的健康状态
+    """
+    __slots__ = ("name", "latency", "success_rate", "samples", "latencies",
+                 "failures", "open_until", "open_seconds", "probing")
+
+    def __init__(self, name, window):
+        self.name = name
+        # 耗时的指数移动平均，单位秒
+        self.latency = None
+        # 成功率的指数移动平均
+        self.success_rate = 1.0
+        self.samples = 0
+        # 最近的耗时，用于计算p95
+        self.latencies = deque(maxlen=window)
+        # 连续失败次数
+        self.failures = 0
+        # 熔断截止时间，为0时未熔断
+        self.open_until = 0
+        # 当前熔断时长
+        self.open_seconds = 0
+        # 是否正在探测
+        self.probing = False
+
+    @property
+    def p95(self):
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+
+
+class IndexerHealth:
+    """
+    Indexer健康度：按每次搜索的耗时和成败维护耗时EWMA、成功率和p95，
+    用于聚合搜索时排序，连续超时或出错的Indexer熔断一段时间，到期后在后台探测，探测成功后恢复
+    """
+    # EWMA平滑系数
+    _alpha = 0.3
+    # 计算p95的样本数
+    _window = 50
+    # 连续失败多少次后熔断
+    _failure_threshold = 3
+    # 首次熔断时长，单位秒，探测失败后加倍
+    _open_seconds = 60
+    # 最长熔断时长，单位秒
+    _max_open_seconds = 1800
+
+    def __init__(self, failure_threshold=None, open_seconds=None, max_open_seconds=None):
+        if failure_threshold:
+            self._failure_threshold = failure_threshold
+        if open_seconds:
+            self._open_seconds = open_seconds
+        if max_open_seconds:
+            self._max_open_seconds = max_open_seconds
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def __get_state(self, name):
+        state = self._states.get(name)
+        if not state:
+            state = self._states[name] = IndexerState(name, self._window)
+        return state
+
+    def record(self, name, seconds, success, now=None):
+        """
+        登记一次搜索
+        :param name: Indexer名称
+        :param seconds: 耗时，单位秒
+        :param success: 是否成功返回（无结果也算成功），超时或出错为False
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self.__get_state(name)
+            self.__update_stats(state, seconds, success)
+            state.probing = False
+            if success:
+                state.open_until = 0
+                state.open_seconds = 0
+                return
+            if state.open_seconds:
+                # 探测失败，熔断时长加倍
+                state.open_seconds = min(state.open_seconds * 2, self._max_open_seconds)
+                state.open_until = now + state.open_seconds
+            elif state.failures >= self._failure_threshold:
+                state.open_seconds = self._open_seconds
+                state.open_until = now + state.open_seconds
+
+    def __update_stats(self, state, seconds, success):
+        """
+        更新耗时EWMA、p95样本、成功率及连续失败次数
+        """
+        state.samples += 1
+        state.latencies.append(seconds)
+        if state.latency is None:
+            state.latency = seconds
+        else:
+            state.latency += self._alpha * (seconds - state.latency)
+        state.success_rate += self._alpha * ((1.0 if success else 0.0) - state.success_rate)
+        state.failures = 0 if success else state.failures + 1
+
+    def seed(self, statistics, timeout):
+        """
+        用INDEXER_STATISTICS的历史记录初始化耗时、成功率及连续失败次数，耗时达到超时时间的按失败计；
+        历史记录没有可用的时间，不据此熔断，连续失败已达阈值的在下一次实际失败时熔断
+        :param statistics: 按时间先后排列的(INDEXER, SECONDS)列表
+        :param timeout: 单个Indexer的超时时间，单位秒
+        """
+        with self._lock:
+            for name, seconds in statistics:
+                seconds = seconds or 0
+                self.__update_stats(self.__get_state(name), seconds, seconds < timeout)
+
+    def is_open(self, name, now=None):
+        """
+        是否处于熔断中
+        """
+        now = time.monotonic() if now is None else now
+        state = self._states.get(name)
+        return bool(state and state.open_until and (state.probing or now < state.open_until))
+
+    def claim_probe(self, name, now=None):
+        """
+        熔断到期时认领一次探测，同一时间只有一个调用方能认领
+        :return: 是否需要由调用方发起探测
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._states.get(name)
+            if not state or not state.open_until or state.probing or now < state.open_until:
+                return False
+            state.probing = True
+            return True
+
+    def order(self, indexers):
+        """
+        按健康度排序：成功率高、耗时短的在前，没有记录的按耗时0排在前面
+        """
+        def __key(indexer):
+            state = self._states.get(indexer.name)
+            if not state:
+                return -1.0, 0
+            return -round(state.success_rate, 1), state.latency or 0
+
+        return sorted(indexers, key=__key)
+
+    def get_scores(self, now=None):
+        """
+        查询各Indexer的健康度，按耗时EWMA从高到低排列
+        :return: [{name, state, latency, p95, success_rate, samples, failures, retry_in}]
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            states = list(self._states.values())
+        scores = []
+        for state in states:
+            if not state.open_until:
+                status = "closed"
+            elif state.probing or now >= state.open_until:
+                status = "half_open"
+            else:
+                status = "open"
+            scores.append({
+                "name": state.name,
+                "state": status,
+                "latency": round(state.latency or 0, 3),
+                "p95": round(state.p95 or 0, 3),
+                "success_rate": round(state.success_rate, 3),
+                "samples": state.samples,
+                "failures": state.failures,
+                "retry_in": round(max(state.open_until - now, 0)) if state.open_until else 0
+            })
+        return sorted(scores, key=lambda score: score.get("latency"), reverse=True)
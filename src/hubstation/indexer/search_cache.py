@@ -0,0 +1,116 @@
+import threading
+import time
+
+from cacheout import LRUCache
+
+from hubstation.config import settings
+from hubstation.utils.string_utils import StringUtils
+
+
+class _Flight:
+    """
+    进行中的一次上游搜索，相同的并发请求等待其结果
+    """
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        # 搜索抛出的异常，等待的调用方同样抛出
+        self.error = None
+
+
+class SearchResultCache:
+    """
+    搜索结果缓存：按(Indexer, 规范化关键字, 分类, IMDBID)缓存未过滤的搜索结果，有效期内直接复用，超出数量时按LRU淘汰；
+    相同的并发搜索合并为一次上游请求；请求失败（结果为None）不缓存
+    """
+    _missing = object()
+
+    def __init__(self, maxsize=500, ttl=600):
+        """
+        :param maxsize: 最大缓存数量
+        :param ttl: 有效期，单位秒，为0时不缓存，只合并并发请求
+        """
+        self._ttl = ttl
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl, timer=time.time, enable_stats=True)
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    @staticmethod
+    def make_key(indexer, key_word, category=None, imdb_id=None):
+        """
+        生成缓存键，关键字去掉特殊字符、合并空格并忽略大小写
+        """
+        key_word = StringUtils.handler_special_chars(text=key_word or "",
+                                                     replace_word=" ",
+                                                     allow_space=True)
+        return indexer, key_word.lower(), str(category or ""), str(imdb_id or "").lower()
+
+    def get_or_search(self, key, search_func):
+        """
+        读取缓存，未命中时调用search_func搜索并写入缓存，相同键的并发调用只搜索一次
+        :param key: make_key生成的缓存键
+        :param search_func: 搜索函数，返回结果列表，失败时返回None
+        :return: 结果列表的副本，失败时为None；search_func抛出异常时，所有等待该次搜索的调用方都抛出该异常
+        """
+        if self._ttl:
+            result = self._cache.get(key, default=self._missing)
+            if result is not self._missing:
+                return self.__copy(result)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return self.__copy(flight.result)
+        try:
+            flight.result = search_func()
+            if self._ttl and flight.result is not None:
+                self._cache.set(key, flight.result)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+        return self.__copy(flight.result)
+
+    @staticmethod
+    def __copy(result):
+        """
+        返回结果的副本，避免调用方修改缓存内容
+        """
+        if result is None:
+            return None
+        return [dict(item) for item in result]
+
+    def invalidate(self, indexer=None):
+        """
+        清除缓存，指定Indexer时只清除该Indexer的结果
+        """
+        if indexer is None:
+            self._cache.clear()
+        else:
+            self._cache.delete_many(lambda key: key[0] == indexer)
+
+    def stats(self):
+        """
+        缓存数量及命中情况
+        """
+        info = self._cache.stats.info()
+        return {
+            "size": self._cache.size(),
+            "hits": info.hit_count,
+            "misses": info.miss_count,
+            "hit_rate": round(info.hit_rate, 4)
+        }
+
+
+SearchCache = SearchResultCache(maxsize=settings.get("PT.search_cache_size", 500),
+                                ttl=settings.get("PT.search_cache_ttl", 600))
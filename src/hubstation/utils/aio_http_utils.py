@@ -0,0 +1,166 @@
+import asyncio
+import json as jsonlib
+import weakref
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+
+from hubstation.utils.http_utils import BaseRequestUtils, ResponseText
+
+
+class AsyncResponse(ResponseText):
+    """
+    异步请求的响应，内容已读取完毕，属性与requests.Response一致，供原有处理响应的代码直接使用
+    """
+
+    def __init__(self, status_code, url, headers, content, cookies):
+        self.status_code = status_code
+        self.url = url
+        self.headers = headers
+        self.content = content
+        self.cookies = cookies
+        self._text = None
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def __bool__(self):
+        return self.ok
+
+    def json(self):
+        return jsonlib.loads(self.text)
+
+
+class AsyncRequestUtils(BaseRequestUtils):
+    """
+    RequestUtils的异步版本，请求头、Cookie、代理及超时的设置与RequestUtils共用，get/post/get_res/post_res为协程；
+    未传入会话时使用当前事件循环共用的会话，连接按站点复用，大量并发请求在一个事件循环中完成，不占用线程
+    只支持http代理，aiohttp不支持socks代理
+    """
+    # 共用会话的最大连接数
+    _connection_limit = 100
+    # 共用会话每个站点的最大连接数
+    _connection_limit_per_host = 8
+    # 事件循环-共用会话
+    _loop_sessions = weakref.WeakKeyDictionary()
+
+    @classmethod
+    async def get_session(cls):
+        """
+        获取当前事件循环的共用会话，不保存响应中的Cookie
+        """
+        loop = asyncio.get_running_loop()
+        session = cls._loop_sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=cls._connection_limit,
+                                             limit_per_host=cls._connection_limit_per_host,
+                                             ssl=False)
+            session = aiohttp.ClientSession(connector=connector,
+                                            cookie_jar=aiohttp.DummyCookieJar())
+            cls._loop_sessions[loop] = session
+        return session
+
+    @classmethod
+    async def close_session(cls):
+        """
+        关闭当前事件循环的共用会话，事件循环结束前调用
+        """
+        session = cls._loop_sessions.pop(asyncio.get_running_loop(), None)
+        if session and not session.closed:
+            await session.close()
+
+    async def __request(self, method, url, params=None, data=None, json=None, files=None,
+                        cookies=None, allow_redirects=True):
+        """
+        发送请求并读取响应内容
+        :return: AsyncResponse
+        """
+        # 与requests一致：值为None的请求头不发送，Cookie直接拼接到请求头中，不限制域名
+        headers = {key: value for key, value in (self._headers or {}).items() if value is not None}
+        if cookies:
+            headers["Cookie"] = "; ".join(f"{key}={value}" for key, value in cookies.items())
+        if files:
+            form = aiohttp.FormData()
+            for key, value in (data or {}).items():
+                form.add_field(key, str(value))
+            for key, value in files.items():
+                if isinstance(value, (tuple, list)):
+                    form.add_field(key, value[1], filename=value[0],
+                                   content_type=value[2] if len(value) > 2 else None)
+                else:
+                    form.add_field(key, value, filename=key)
+            data = form
+            # 由aiohttp生成multipart的Content-Type
+            headers.pop("Content-Type", None)
+        elif not data and json is not None:
+            data = jsonlib.dumps(json)
+            if not any(key.lower() == "content-type" for key in headers):
+                headers["Content-Type"] = "application/json"
+        # 与requests的timeout一致，分别限制连接和每次读取的时间
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self._timeout, sock_read=self._timeout)
+        session = self._session or await self.get_session()
+        async with session.request(method,
+                                   url,
+                                   params=params,
+                                   data=data,
+                                   headers=headers,
+                                   proxy=self.__get_proxy(url),
+                                   timeout=timeout,
+                                   allow_redirects=allow_redirects,
+                                   ssl=False) as res:
+            content = await res.read()
+            return AsyncResponse(status_code=res.status,
+                                 url=str(res.url),
+                                 headers=res.headers,
+                                 content=content,
+                                 cookies={name: morsel.value for name, morsel in res.cookies.items()})
+
+    def __get_proxy(self, url):
+        """
+        按请求协议选择代理
+        """
+        if not self._proxies:
+            return None
+        return self._proxies.get(urlparse(url).scheme) or self._proxies.get("http")
+
+    async def post(self, url, data=None, json=None):
+        if json is None:
+            json = {}
+        try:
+            return await self.__request("post", url, data=data, json=json)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def get(self, url, params=None):
+        try:
+            res = await self.__request("get", url, params=params)
+            return str(res.content, 'utf-8')
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def get_res(self, url, params=None, allow_redirects=True, raise_exception=False):
+        try:
+            return await self.__request("get",
+                                        url,
+                                        params=params,
+                                        cookies=self._cookies,
+                                        allow_redirects=allow_redirects)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if raise_exception:
+                raise requests.exceptions.RequestException from e
+            return None
+
+    async def post_res(self, url, data=None, params=None, allow_redirects=True, files=None, json=None):
+        try:
+            return await self.__request("post",
+                                        url,
+                                        params=params,
+                                        data=data,
+                                        json=json,
+                                        files=files,
+                                        cookies=self._cookies,
+                                        allow_redirects=allow_redirects)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import threading
 import time
 
 from cacheout import CacheManager, LRUCache, Cache
@@ -16,3 +17,96 @@ ConfigLoadCache = Cache(maxsize=1, ttl=10, timer=time.time, default=None)
 CategoryLoadCache = Cache(maxsize=2, ttl=3, timer=time.time, default=None)
 
 OpenAISessionCache = Cache(maxsize=100, ttl=3600, timer=time.time, default=None)
+
+# 115网盘目录ID-路径
+PanPathCache = Cache(maxsize=10000, ttl=3600, timer=time.time, default=None)
+
+# 种子内容摘要-种子元数据
+TorrentMetaCache = LRUCache(maxsize=512, default=None)
+
+# 订阅源地址-上次抓取的ETag、Last-Modified及内容摘要
+FeedStateCache = LRUCache(maxsize=1000, default=None)
+
+# RSS地址-(内容摘要, 解析结果)
+RssItemsCache = LRUCache(maxsize=200, default=None)
+
+
+class MembershipCache:
+    """
+    存在性检查的读穿缓存，按命名空间缓存查询结果（True/False），LRU淘汰并统计命中情况
+    写操作提交后通过set/delete/clear更新，每次更新递增命名空间的版本号，
+    查询期间版本号发生变化的结果不写入缓存，避免并发写入后缓存旧值
+    """
+    _missing = object()
+
+    def __init__(self, maxsize=50000):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._generations = {}
+        self._hits = {}
+        self._misses = {}
+
+    def get_or_load(self, namespace, key, loader):
+        """
+        读取缓存，未命中时调用loader查询并写入缓存
+        :param namespace: 命名空间
+        :param key: 缓存键
+        :param loader: 未命中时的查询函数，返回True/False
+        """
+        value = self._cache.get((namespace, key), default=self._missing)
+        if value is not self._missing:
+            with self._lock:
+                self._hits[namespace] = self._hits.get(namespace, 0) + 1
+            return value
+        with self._lock:
+            self._misses[namespace] = self._misses.get(namespace, 0) + 1
+            generation = self._generations.get(namespace, 0)
+        value = loader()
+        with self._lock:
+            if self._generations.get(namespace, 0) == generation:
+                self._cache.set((namespace, key), value)
+        return value
+
+    def set(self, namespace, key, value):
+        """
+        写入缓存
+        """
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._cache.set((namespace, key), value)
+
+    def delete(self, namespace, key):
+        """
+        删除一个缓存键
+        """
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._cache.delete((namespace, key))
+
+    def clear(self, namespace):
+        """
+        清空命名空间下的所有缓存
+        """
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._cache.delete_many(lambda cache_key: cache_key[0] == namespace)
+
+    def stats(self):
+        """
+        各命名空间的命中、未命中次数及命中率
+        """
+        with self._lock:
+            namespaces = set(self._hits) | set(self._misses)
+            ret = {}
+            for namespace in namespaces:
+                hits = self._hits.get(namespace, 0)
+                misses = self._misses.get(namespace, 0)
+                ret[namespace] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0
+                }
+            return ret
+
+
+ExistsCache = MembershipCache(maxsize=50000)
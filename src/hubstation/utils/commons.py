@@ -31,7 +31,8 @@ def singleton(cls):
 
 class DbPersist(object):
     """
-    数据库持久化装饰器
+    数据库持久化装饰器：被装饰的函数交给写线程执行，可能与其它写操作合并为一个事务，
+    合并的事务失败时会被重新执行，函数中只能包含数据库操作，其它副作用通过MainDb.on_commit登记
     """
 
     def __init__(self, db):
@@ -40,12 +41,10 @@ class DbPersist(object):
     def __call__(self, f):
         def persist(*args, **kwargs):
             try:
-                ret = f(*args, **kwargs)
-                self.db.commit()
+                ret = self.db.submit(f, *args, **kwargs).result()
                 return True if ret is None else ret
             except Exception as e:
                 ExceptionUtils.exception_traceback(e)
-                self.db.rollback()
                 return False
 
         return persist
@@ -1,12 +1,136 @@
+import re
+import threading
+from contextlib import contextmanager
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
 from urllib3.exceptions import InsecureRequestWarning
 from hubstation.config.config import Config
+from hubstation.utils.commons import singleton
 
 urllib3.disable_warnings(InsecureRequestWarning)
 
 
-class RequestUtils:
+@singleton
+class SessionPool:
+    """
+    进程内共用的HTTP会话：按(站点, 代理)复用会话及其连接池，保持长连接，避免每次请求重新建立TCP及TLS连接；
+    每个站点限制同时进行的请求数，不超过连接池大小，连接用完后归还复用
+    共用会话不保存服务端下发的Cookie，每个请求只携带调用方传入的Cookie，与不使用会话时一致
+    """
+    # 每个站点连接池的最大连接数
+    _pool_maxsize = 8
+    # 每个站点同时进行的最大请求数
+    _host_concurrency = 8
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._semaphores = {}
+
+    @staticmethod
+    def __get_host(url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+    def get_session(self, url, proxies=None):
+        """
+        获取站点的会话
+        :param url: 请求地址
+        :param proxies: 代理，不同的代理使用不同的会话
+        """
+        key = (self.__get_host(url), tuple(sorted((proxies or {}).items())))
+        session = self._sessions.get(key)
+        if session:
+            return session
+        with self._lock:
+            session = self._sessions.get(key)
+            if not session:
+                session = requests.Session()
+                # 不保存响应中的Cookie，避免不同调用方之间串用
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[key] = session
+        return session
+
+    @contextmanager
+    def limit(self, url, timeout=None):
+        """
+        占用站点的一个并发名额，用于with语句，退出时归还
+        :param url: 请求地址
+        :param timeout: 等待名额的最长时间，与请求超时一致，可为(连接超时, 读取超时)，为None时一直等待
+        :raise requests.exceptions.Timeout: 超时仍未获得名额
+        """
+        host = self.__get_host(url)
+        semaphore = self._semaphores.get(host)
+        if not semaphore:
+            with self._lock:
+                semaphore = self._semaphores.get(host)
+                if not semaphore:
+                    semaphore = self._semaphores[host] = threading.BoundedSemaphore(self._host_concurrency)
+        if isinstance(timeout, tuple):
+            timeout = None if None in timeout else sum(timeout)
+        if not semaphore.acquire(timeout=timeout):
+            raise requests.exceptions.Timeout(f"等待站点并发名额超时：{host}")
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def close(self):
+        """
+        关闭所有会话
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+class ResponseText:
+    """
+    响应内容解码，供已读取完内容的响应对象使用，需有content、headers属性
+    编码：Content-Type的charset > 检测内容开头部分 > UTF-8，_xml_encoding_first为True时XML声明优先
+    """
+    # 未声明编码时，只取内容开头的部分检测编码
+    _detect_size = 64 * 1024
+    # 是否优先使用XML声明的编码
+    _xml_encoding_first = False
+    _text = None
+
+    @property
+    def encoding(self):
+        if self._xml_encoding_first:
+            match = re.match(rb"\s*<\?xml[^>]*?encoding=[\"']([\w.-]+)[\"']", self.content[:200])
+            if match:
+                return match.group(1).decode()
+        match = re.search(r"charset=[\"']?([\w.-]+)", self.headers.get("Content-Type") or "", re.IGNORECASE)
+        if match:
+            return match.group(1)
+        if not self.content:
+            return "utf-8"
+        return chardet.detect(self.content[:self._detect_size]).get("encoding") or "utf-8"
+
+    @property
+    def text(self):
+        if self._text is None:
+            try:
+                self._text = self.content.decode(self.encoding, errors="replace")
+            except LookupError:
+                self._text = self.content.decode("utf-8", errors="replace")
+        return self._text
+
+
+class BaseRequestUtils:
+    """
+    请求头、Cookie、代理、会话及超时的设置，RequestUtils与AsyncRequestUtils共用
+    """
     _headers = None
     _cookies = None
     _proxies = None
@@ -55,69 +179,82 @@ class RequestUtils:
         if timeout:
             self._timeout = timeout
 
+    @staticmethod
+    def cookie_parse(cookies_str, array=False):
+        """
+        解析cookie，转化为字典或者数组
+        :param cookies_str: cookie字符串
+        :param array: 是否转化为数组
+        :return: 字典或者数组
+        """
+        if not cookies_str:
+            return {}
+        cookie_dict = {}
+        cookies = cookies_str.split(';')
+        for cookie in cookies:
+            cstr = cookie.split('=')
+            if len(cstr) > 1:
+                cookie_dict[cstr[0].strip()] = cstr[1].strip()
+        if array:
+            cookiesList = []
+            for cookieName, cookieValue in cookie_dict.items():
+                cookies = {'name': cookieName, 'value': cookieValue}
+                cookiesList.append(cookies)
+            return cookiesList
+        return cookie_dict
+
+
+class RequestUtils(BaseRequestUtils):
+
+    def __request(self, method, url, **kwargs):
+        """
+        发送请求：调用方传入会话时使用该会话，否则使用SessionPool中站点的共用会话并限制站点并发数
+        """
+        if self._session:
+            return self._session.request(method, url, **kwargs)
+        pool = SessionPool()
+        with pool.limit(url, timeout=kwargs.get("timeout")):
+            return pool.get_session(url, proxies=self._proxies).request(method, url, **kwargs)
+
     def post(self, url, data=None, json=None):
         if json is None:
             json = {}
         try:
-            if self._session:
-                return self._session.post(url,
-                                          data=data,
-                                          verify=False,
-                                          headers=self._headers,
-                                          proxies=self._proxies,
-                                          timeout=self._timeout,
-                                          json=json)
-            else:
-                return requests.post(url,
-                                     data=data,
-                                     verify=False,
-                                     headers=self._headers,
-                                     proxies=self._proxies,
-                                     timeout=self._timeout,
-                                     json=json)
+            return self.__request("post",
+                                  url,
+                                  data=data,
+                                  verify=False,
+                                  headers=self._headers,
+                                  proxies=self._proxies,
+                                  timeout=self._timeout,
+                                  json=json)
         except requests.exceptions.RequestException:
             return None
 
     def get(self, url, params=None):
         try:
-            if self._session:
-                r = self._session.get(url,
-                                      verify=False,
-                                      headers=self._headers,
-                                      proxies=self._proxies,
-                                      timeout=self._timeout,
-                                      params=params)
-            else:
-                r = requests.get(url,
-                                 verify=False,
-                                 headers=self._headers,
-                                 proxies=self._proxies,
-                                 timeout=self._timeout,
-                                 params=params)
+            r = self.__request("get",
+                               url,
+                               verify=False,
+                               headers=self._headers,
+                               proxies=self._proxies,
+                               timeout=self._timeout,
+                               params=params)
             return str(r.content, 'utf-8')
         except requests.exceptions.RequestException:
             return None
 
     def get_res(self, url, params=None, allow_redirects=True, raise_exception=False):
         try:
-            if self._session:
-                return self._session.get(url,
-                                         params=params,
-                                         verify=False,
-                                         headers=self._headers,
-                                         proxies=self._proxies,
-                                         cookies=self._cookies,
-                                         timeout=self._timeout,
-                                         allow_redirects=allow_redirects)
-            else:
-                return requests.get(url,
-                                    params=params,
-                                    verify=False,
-                                    headers=self._headers,
-                                    proxies=self._proxies,
-                                    cookies=self._cookies,
-                                    timeout=self._timeout,
-                                    allow_redirects=allow_redirects)
+            return self.__request("get",
+                                  url,
+                                  params=params,
+                                  verify=False,
+                                  headers=self._headers,
+                                  proxies=self._proxies,
+                                  cookies=self._cookies,
+                                  timeout=self._timeout,
+                                  allow_redirects=allow_redirects)
         except requests.exceptions.RequestException:
             if raise_exception:
                 raise requests.exceptions.RequestException
@@ -125,53 +262,17 @@ class RequestUtils:
 
     def post_res(self, url, data=None, params=None, allow_redirects=True, files=None, json=None):
         try:
-            if self._session:
-                return self._session.post(url,
-                                          data=data,
-                                          params=params,
-                                          verify=False,
-                                          headers=self._headers,
-                                          proxies=self._proxies,
-                                          cookies=self._cookies,
-                                          timeout=self._timeout,
-                                          allow_redirects=allow_redirects,
-                                          files=files,
-                                          json=json)
-            else:
-                return requests.post(url,
-                                     data=data,
-                                     params=params,
-                                     verify=False,
-                                     headers=self._headers,
-                                     proxies=self._proxies,
-                                     cookies=self._cookies,
-                                     timeout=self._timeout,
-                                     allow_redirects=allow_redirects,
-                                     files=files,
-                                     json=json)
+            return self.__request("post",
+                                  url,
+                                  data=data,
+                                  params=params,
+                                  verify=False,
+                                  headers=self._headers,
+                                  proxies=self._proxies,
+                                  cookies=self._cookies,
+                                  timeout=self._timeout,
+                                  allow_redirects=allow_redirects,
+                                  files=files,
+                                  json=json)
         except requests.exceptions.RequestException:
             return None
-
-    @staticmethod
-    def cookie_parse(cookies_str, array=False):
-        """
-        解析cookie，转化为字典或者数组
-        :param cookies_str: cookie字符串
-        :param array: 是否转化为数组
-        :return: 字典或者数组
-        """
-        if not cookies_str:
-            return {}
-        cookie_dict = {}
-        cookies = cookies_str.split(';')
-        for cookie in cookies:
-            cstr = cookie.split('=')
-            if len(cstr) > 1:
-                cookie_dict[cstr[0].strip()] = cstr[1].strip()
-        if array:
-            cookiesList = []
-            for cookieName, cookieValue in cookie_dict.items():
-                cookies = {'name': cookieName, 'value': cookieValue}
-                cookiesList.append(cookies)
-            return cookiesList
-        return cookie_dict
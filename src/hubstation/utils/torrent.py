@@ -1,17 +1,18 @@
+import base64
 import datetime
 import os.path
 import time
 import re
 import tempfile
-from urllib.parse import unquote
+from urllib.parse import unquote, urlparse, parse_qs
 
 # import libtorrent
-from bencode import bdecode
 
 from hubstation import log
 from hubstation.config.config import Config
 from hubstation.utils.http_utils import RequestUtils
 from hubstation.utils.string_utils import StringUtils
+from hubstation.utils.torrent_meta import get_torrent_meta, read_torrent_meta
 
 
 class Torrent:
@@ -106,7 +107,7 @@ class Torrent:
                             ).post_res(url=action, data=data)
                             if req and req.status_code == 200:
                                 # 检查是不是种子文件，如果不是抛出异常
-                                bdecode(req.content)
+                                get_torrent_meta(req.content)
                                 # 跳过成功
                                 log.info(f"【Downloader】触发了站点首次种子下载，已自动跳过：{url}")
                                 skip_flag = True
@@ -123,7 +124,7 @@ class Torrent:
             else:
                 # 检查是不是种子文件，如果不是仍然抛出异常
                 try:
-                    bdecode(req.content)
+                    get_torrent_meta(req.content)
                 except Exception as err:
                     print(str(err))
                     return None, None, "种子数据有误，请确认链接是否正确"
@@ -153,22 +154,11 @@ class Torrent:
         """
         if not path or not os.path.exists(path):
             return "", [], f"种子文件不存在：{path}"
-        file_names = []
-        file_folder = ""
         try:
-            torrent = bdecode(open(path, 'rb').read())
-            if torrent.get("info"):
-                files = torrent.get("info", {}).get("files") or []
-                if files:
-                    for item in files:
-                        if item.get("path"):
-                            file_names.append(item["path"][0])
-                    file_folder = torrent.get("info", {}).get("name")
-                else:
-                    file_names.append(torrent.get("info", {}).get("name"))
+            meta, _ = read_torrent_meta(path)
         except Exception as err:
-            return file_folder, file_names, "解析种子文件异常：%s" % str(err)
-        return file_folder, file_names, ""
+            return "", [], "解析种子文件异常：%s" % str(err)
+        return meta.file_folder, meta.file_names, ""
 
     def read_torrent_content(self, path):
         """
@@ -179,15 +169,61 @@ class Torrent:
             return None, "", [], "种子文件不存在：%s" % path
         content, retmsg, file_folder, files = None, "", "", []
         try:
-            # 读取种子文件内容
+            # 读取种子文件内容，只读取一次
             with open(path, 'rb') as f:
                 content = f.read()
-            # 解析种子文件
-            file_folder, files, retmsg = self.get_torrent_files(path)
         except Exception as e:
-            retmsg = "读取种子文件出错：%s" % str(e)
+            return content, file_folder, files, "读取种子文件出错：%s" % str(e)
+        try:
+            # 解析种子文件
+            meta = get_torrent_meta(content)
+            file_folder, files = meta.file_folder, meta.file_names
+        except Exception as err:
+            retmsg = "解析种子文件异常：%s" % str(err)
         return content, file_folder, files, retmsg
 
+    @staticmethod
+    def get_info_hash(content):
+        """
+        根据种子内容或磁力链接计算种子的info-hash，与下载器中的种子ID一致
+        v1及混合种子为info字典的SHA1，纯v2种子为info字典的SHA256截取前40位（qBittorrent的种子ID）
+        :param content: 种子文件内容或磁力链接
+        :return: 小写十六进制info-hash，无法计算时返回None
+        """
+        if not content:
+            return None
+        if isinstance(content, str):
+            return Torrent.get_magnet_info_hash(content)
+        try:
+            return get_torrent_meta(content).info_hash
+        except Exception:
+            # 种子内容不完整或格式错误，解析时可能抛出IndexError、ValueError、TypeError等，统一按无法计算处理
+            return None
+
+    @staticmethod
+    def get_magnet_info_hash(url):
+        """
+        从磁力链接的xt参数中获取info-hash
+        :return: 小写十六进制info-hash，不是有效磁力链接时返回None
+        """
+        if not url or not url.startswith("magnet:"):
+            return None
+        v2_hash = None
+        for xt in parse_qs(urlparse(url).query).get("xt") or []:
+            if xt.startswith("urn:btih:"):
+                value = xt[9:]
+                if len(value) == 40 and re.fullmatch(r"[0-9a-fA-F]{40}", value):
+                    return value.lower()
+                if len(value) == 32:
+                    try:
+                        return base64.b32decode(value.upper()).hex()
+                    except ValueError:
+                        continue
+            elif xt.startswith("urn:btmh:1220") and len(xt) == 77:
+                # multihash格式的SHA256，混合种子优先使用btih
+                v2_hash = xt[13:53].lower()
+        return v2_hash
+
     @staticmethod
     def __get_url_torrent_filename(req, url):
         """
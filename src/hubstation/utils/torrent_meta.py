@@ -0,0 +1,288 @@
+import hashlib
+import mmap
+import os
+
+from hubstation.utils.cache_manager import TorrentMetaCache
+
+# 解析时跳过的键：v1的pieces（每个分块20字节SHA1）及v2的piece layers，体积占种子文件的绝大部分且用不到
+SKIP_KEYS = frozenset([b"pieces", b"piece layers"])
+
+
+class BencodeSpan:
+    """
+    跳过解析的值，只记录其在原始内容中的字节范围
+    """
+    __slots__ = ("start", "end")
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"BencodeSpan({self.start}, {self.end})"
+
+
+def bdecode(buf, pos=0, skip_keys=SKIP_KEYS):
+    """
+    解析bencode内容，字典中skip_keys对应的值不解码，以BencodeSpan代替
+    :param buf: bytes、bytearray或mmap，按下标读取单个字节
+    :param pos: 起始位置
+    :param skip_keys: 跳过的字典键
+    :return: 解析结果, 结束位置
+    """
+    c = buf[pos]
+    # 字符串
+    if 48 <= c <= 57:
+        colon = buf.find(b":", pos)
+        if colon < 0:
+            raise ValueError(f"invalid bencode string at {pos}")
+        start = colon + 1
+        end = start + int(buf[pos:colon])
+        if end > len(buf):
+            raise ValueError(f"bencode string at {pos} exceeds content")
+        return bytes(buf[start:end]), end
+    # 整数 i
+    if c == 105:
+        end = buf.find(b"e", pos)
+        if end < 0:
+            raise ValueError(f"invalid bencode integer at {pos}")
+        return int(buf[pos + 1:end]), end + 1
+    # 列表 l
+    if c == 108:
+        pos += 1
+        items = []
+        while buf[pos] != 101:
+            item, pos = bdecode(buf, pos, skip_keys)
+            items.append(item)
+        return items, pos + 1
+    # 字典 d
+    if c == 100:
+        pos += 1
+        items = {}
+        while buf[pos] != 101:
+            key, pos = bdecode(buf, pos, skip_keys)
+            if key in skip_keys:
+                end = bskip(buf, pos)
+                items[key] = BencodeSpan(pos, end)
+                pos = end
+            else:
+                items[key], pos = bdecode(buf, pos, skip_keys)
+        return items, pos + 1
+    raise ValueError(f"invalid bencode type {chr(c)!r} at {pos}")
+
+
+def bskip(buf, pos):
+    """
+    跳过一个bencode值，字符串直接按长度跳过，不复制内容
+    :return: 结束位置
+    """
+    c = buf[pos]
+    if 48 <= c <= 57:
+        colon = buf.find(b":", pos)
+        if colon < 0:
+            raise ValueError(f"invalid bencode string at {pos}")
+        end = colon + 1 + int(buf[pos:colon])
+        if end > len(buf):
+            raise ValueError(f"bencode string at {pos} exceeds content")
+        return end
+    if c == 105:
+        end = buf.find(b"e", pos)
+        if end < 0:
+            raise ValueError(f"invalid bencode integer at {pos}")
+        return end + 1
+    if c in (100, 108):
+        pos += 1
+        while buf[pos] != 101:
+            pos = bskip(buf, pos)
+        return pos + 1
+    raise ValueError(f"invalid bencode type {chr(c)!r} at {pos}")
+
+
+def _to_str(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value) if value is not None else ""
+
+
+class TorrentMeta:
+    """
+    种子元数据：名称、文件清单及info-hash，不包含pieces
+    """
+    __slots__ = ("name", "total_size", "piece_length", "info_hash", "is_v2", "_files", "_raw_files",
+                 "_info_span", "_has_pieces")
+
+    def __init__(self, name, files, total_size, piece_length, is_v2, info_span, has_pieces, raw_files=None):
+        """
+        :param files: [(路径各级名称列表, 大小)]，单文件种子为空
+        :param info_span: info字典在种子内容中的字节范围
+        :param has_pieces: info字典是否含pieces（v1及混合种子）
+        :param raw_files: 未解码的v1文件列表，用到文件清单时才解码
+        """
+        self.name = name
+        self.total_size = total_size
+        self.piece_length = piece_length
+        # 未计算时为None，由hash_info计算
+        self.info_hash = None
+        self.is_v2 = is_v2
+        self._files = files
+        self._raw_files = raw_files
+        self._info_span = info_span
+        self._has_pieces = has_pieces
+
+    def hash_info(self, buf):
+        """
+        按info字典的原始字节计算info-hash，重新编码可能改变非规范种子的字节，需直接截取原始内容
+        v1及混合种子为SHA1，纯v2种子为SHA256截取前40位（qBittorrent的种子ID）
+        :param buf: 解析时的种子内容
+        """
+        with memoryview(buf) as view:
+            info_bytes = view[self._info_span[0]:self._info_span[1]]
+            if self._has_pieces:
+                self.info_hash = hashlib.sha1(info_bytes).hexdigest()
+            else:
+                self.info_hash = hashlib.sha256(info_bytes).hexdigest()[:40]
+            info_bytes.release()
+        return self.info_hash
+
+    @property
+    def files(self):
+        """
+        文件清单：[(路径各级名称列表, 大小)]，单文件种子为空
+        """
+        if self._files is None:
+            self._files = [([_to_str(p) for p in self.__get_path(item)], item.get(b"length") or 0)
+                           for item in self._raw_files]
+        return self._files
+
+    @property
+    def file_folder(self):
+        """
+        种子文件列表主目录，单文件种子为空
+        """
+        return self.name if self._raw_files or self.files else ""
+
+    @property
+    def file_names(self):
+        """
+        种子文件列表，多文件种子为各文件的第一级名称，与Torrent.get_torrent_files一致
+        """
+        if self._files is None:
+            return [_to_str(path[0]) for path in map(self.__get_path, self._raw_files) if path]
+        if not self._files:
+            return [self.name]
+        return [path[0] for path, _ in self._files if path]
+
+    @staticmethod
+    def __get_path(item):
+        return item.get(b"path.utf-8") or item.get(b"path") or []
+
+    @classmethod
+    def parse(cls, buf, info_hash=True):
+        """
+        解析种子内容
+        :param buf: 种子内容，bytes或mmap
+        :param info_hash: 是否计算info-hash，只需要文件清单时可不计算
+        """
+        if not buf or buf[0] != 100:
+            raise ValueError("not a bencode dict")
+        pos = 1
+        info = None
+        info_span = None
+        while buf[pos] != 101:
+            key, pos = bdecode(buf, pos)
+            if key == b"info":
+                info, end = bdecode(buf, pos)
+                info_span = (pos, end)
+                pos = end
+            else:
+                pos = bskip(buf, pos)
+        if not isinstance(info, dict):
+            raise ValueError("torrent has no info dict")
+        name = _to_str(info.get(b"name.utf-8") or info.get(b"name"))
+        files = []
+        raw_files = None
+        if info.get(b"files"):
+            raw_files = info[b"files"]
+            files = None
+            total_size = sum(item.get(b"length") or 0 for item in raw_files)
+        elif b"file tree" in info and b"length" not in info:
+            cls.__walk_file_tree(info.get(b"file tree"), [], files)
+            total_size = sum(length for _, length in files)
+            # 只有一个文件且与名称相同时视为单文件种子
+            if len(files) == 1 and files[0][0] == [name]:
+                files = []
+        else:
+            total_size = info.get(b"length") or 0
+        meta = cls(name=name,
+                   files=files,
+                   total_size=total_size,
+                   piece_length=info.get(b"piece length") or 0,
+                   is_v2=info.get(b"meta version") == 2,
+                   info_span=info_span,
+                   has_pieces=b"pieces" in info,
+                   raw_files=raw_files)
+        if info_hash:
+            meta.hash_info(buf)
+        return meta
+
+    @classmethod
+    def __walk_file_tree(cls, tree, path, files):
+        """
+        展开v2种子的file tree，文件节点为{"": {"length": ...}}
+        """
+        for key, node in (tree or {}).items():
+            if not isinstance(node, dict):
+                continue
+            if b"" in node and isinstance(node[b""], dict):
+                files.append((path + [_to_str(key)], node[b""].get(b"length") or 0))
+            else:
+                cls.__walk_file_tree(node, path + [_to_str(key)], files)
+
+
+def content_digest(buf):
+    """
+    种子内容摘要，作为元数据缓存的键
+    """
+    return hashlib.sha256(buf).digest()
+
+
+def get_torrent_meta(content):
+    """
+    解析种子内容，相同内容的解析结果从LRU缓存中获取
+    :param content: 种子内容
+    :return: TorrentMeta，含info-hash
+    """
+    key = content_digest(content)
+    meta = TorrentMetaCache.get(key)
+    if meta is None:
+        meta = TorrentMeta.parse(content)
+        TorrentMetaCache.set(key, meta)
+    elif meta.info_hash is None:
+        meta.hash_info(content)
+    return meta
+
+
+def read_torrent_meta(path, with_content=False, info_hash=False):
+    """
+    通过mmap读取本地种子文件并解析，不把文件内容复制到内存中
+    :param path: 种子文件路径
+    :param with_content: 是否同时返回种子内容
+    :param info_hash: 是否计算info-hash，未计算时之后按内容调用get_torrent_meta会补充计算
+    :return: TorrentMeta, 种子内容（with_content为False时为None）
+    """
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            raise ValueError(f"empty torrent file: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            key = content_digest(buf)
+            meta = TorrentMetaCache.get(key)
+            if meta is None:
+                meta = TorrentMeta.parse(buf, info_hash=info_hash)
+                TorrentMetaCache.set(key, meta)
+            elif info_hash and meta.info_hash is None:
+                meta.hash_info(buf)
+            content = buf[:] if with_content else None
+    return meta, content
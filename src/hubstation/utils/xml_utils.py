@@ -0,0 +1,114 @@
+import codecs
+import re
+from xml.etree.ElementTree import XMLPullParser
+
+
+class XmlUtils:
+    # 每次送入解析器的内容长度
+    _chunk_size = 64 * 1024
+    # expat可直接解析的编码，其它编码（如GBK）需先解码为文本
+    _expat_encodings = {"utf-8", "utf-16", "utf-16-le", "utf-16-be", "iso8859-1", "ascii"}
+
+    @staticmethod
+    def iter_items(source, item_tag="item", attr_tag=None):
+        """
+        增量解析XML，逐个返回条目，每个条目只遍历一次，处理完后即从树中移除，不保留整个文档
+        :param source: bytes、str，或bytes块的可迭代对象（如Response.iter_content）
+        :param item_tag: 条目的标签名，不含命名空间，如RSS 1.0默认命名空间下的item同样匹配
+        :param attr_tag: 需要收集全部属性的标签，带命名空间时为{命名空间}标签名，如torznab:attr
+        :return: 生成器，每个条目为 (字段, 属性列表)
+                 字段：{标签名: (文本, 属性字典)}，标签名不含命名空间，同名标签只取第一个；
+                       与条目不在同一命名空间的标签（如media:title）不覆盖条目自身的同名标签
+                 属性列表：条目中所有attr_tag标签的属性字典
+        """
+        parser = XMLPullParser(events=("start", "end"))
+        stack = []
+        for chunk in XmlUtils.__iter_chunks(source):
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    stack.append(elem)
+                    continue
+                stack.pop()
+                namespace, tag = XmlUtils.__split_tag(elem.tag)
+                if tag != item_tag:
+                    continue
+                fields = {}
+                foreign_fields = {}
+                attrs = []
+                for child in elem.iter():
+                    if child is elem:
+                        continue
+                    child_namespace, child_tag = XmlUtils.__split_tag(child.tag)
+                    target = fields if child_namespace == namespace else foreign_fields
+                    if child_tag not in target:
+                        target[child_tag] = (child.text, child.attrib)
+                    if attr_tag and child.tag == attr_tag:
+                        attrs.append(child.attrib)
+                for child_tag, value in foreign_fields.items():
+                    fields.setdefault(child_tag, value)
+                # 释放已处理的条目
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+                yield fields, attrs
+        parser.close()
+
+    @staticmethod
+    def __split_tag(tag):
+        """
+        拆分ElementTree的标签名{命名空间}标签名
+        :return: (命名空间, 标签名)，无命名空间时命名空间为空字符串
+        """
+        if tag[:1] == "{":
+            namespace, _, tag = tag[1:].partition("}")
+            return namespace, tag
+        return "", tag
+
+    @staticmethod
+    def __iter_chunks(source):
+        """
+        分块返回内容，XML声明的编码expat不支持时按该编码增量解码为文本
+        """
+        if isinstance(source, (bytes, bytearray, str)):
+            chunks = (source[i:i + XmlUtils._chunk_size] for i in range(0, len(source), XmlUtils._chunk_size))
+        else:
+            chunks = (chunk for chunk in source if chunk)
+        decoder = None
+        for chunk in chunks:
+            if decoder is None:
+                decoder = XmlUtils.__get_decoder(chunk) or False
+            yield decoder.decode(chunk) if decoder else chunk
+        if decoder:
+            yield decoder.decode(b"", final=True)
+
+    @staticmethod
+    def __get_decoder(chunk):
+        if isinstance(chunk, str):
+            return None
+        match = re.match(rb"\s*<\?xml[^>]*?encoding=[\"']([\w.-]+)[\"']", chunk[:200])
+        if not match:
+            return None
+        try:
+            codec = codecs.lookup(match.group(1).decode())
+        except LookupError:
+            return None
+        if codec.name in XmlUtils._expat_encodings:
+            return None
+        return codec.incrementaldecoder(errors="replace")
+
+    @staticmethod
+    def tag_value(fields, tag_name, attname="", default=None):
+        """
+        读取iter_items返回的条目中的标签值，与DomUtils.tag_value一致
+        """
+        field = fields.get(tag_name)
+        if field:
+            text, attrib = field
+            if attname:
+                attvalue = attrib.get(attname)
+                if attvalue:
+                    return attvalue
+            elif text:
+                return text
+        return default
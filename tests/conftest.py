@@ -1,7 +1,16 @@
 """Test config"""
+import os
+import tempfile
+
 import pytest
 from click.testing import CliRunner
 
+# hubstation.db opens its databases next to the config file on import; point it at a throwaway one
+_config_dir = tempfile.mkdtemp()
+with open(os.path.join(_config_dir, "config.yaml"), "w") as f:
+    f.write("app:\n  proxies: {}\n")
+os.environ.setdefault("HUBStation_SRC_CONFIG", os.path.join(_config_dir, "config.yaml"))
+
 
 @pytest.fixture()
 def clicker():
@@ -0,0 +1,226 @@
+"""Test async downloader clients against stand-in qBittorrent WebUI and Transmission RPC servers"""
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from hubstation.downloader.aio import (AsyncDownloaderPool, AsyncLoop,
+                                       AsyncQbittorrent, AsyncTransmission,
+                                       SyncDownloader)
+
+QB_TORRENTS = [
+    {"hash": "a" * 40, "name": "movie", "state": "downloading", "progress": 0.5, "dlspeed": 1024,
+     "upspeed": 0, "eta": 60, "tags": "HUB, movie", "category": "movie"},
+    {"hash": "b" * 40, "name": "show", "state": "pausedDL", "progress": 0.1, "dlspeed": 0,
+     "upspeed": 0, "eta": 0, "tags": "HUB", "category": "tv"},
+    {"hash": "c" * 40, "name": "done", "state": "uploading", "progress": 1, "dlspeed": 0,
+     "upspeed": 10, "eta": 0, "tags": "movie-extra", "category": "movie"},
+]
+QB_DOWNLOADING = {"downloading", "pausedDL"}
+
+
+class StandInServer:
+    """Stand-in HTTP server running on the AsyncLoop"""
+
+    def __init__(self, routes, delay=0.0):
+        self.delay = delay
+        self.peers = set()
+        self.requests = []
+        self.app = web.Application(middlewares=[self.track])
+        self.app.add_routes(routes(self))
+        self.runner = None
+        self.port = None
+
+    @web.middleware
+    async def track(self, request, handler):
+        self.peers.add(request.transport.get_extra_info("peername"))
+        self.requests.append(request.path)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return await handler(request)
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def qbittorrent_routes(server):
+    server.ignore_tag = False
+    server.sid = "sid-1"
+    server.added = []
+
+    def check(request):
+        if request.cookies.get("SID") != server.sid:
+            raise web.HTTPForbidden()
+
+    async def login(request):
+        data = await request.post()
+        if data.get("username") != "admin" or data.get("password") != "secret":
+            return web.Response(text="Fails.")
+        res = web.Response(text="Ok.")
+        res.set_cookie("SID", server.sid)
+        return res
+
+    async def info(request):
+        check(request)
+        torrents = QB_TORRENTS
+        if request.query.get("filter") == "downloading":
+            torrents = [t for t in torrents if t["state"] in QB_DOWNLOADING]
+        # qBittorrent before WebAPI 2.8.3 ignores the tag parameter
+        if request.query.get("tag") and not server.ignore_tag:
+            tag = request.query["tag"]
+            torrents = [t for t in torrents if tag in [x.strip() for x in t["tags"].split(",")]]
+        if request.query.get("category") is not None:
+            torrents = [t for t in torrents if t["category"] == request.query["category"]]
+        if request.query.get("hashes"):
+            hashes = request.query["hashes"].split("|")
+            torrents = [t for t in torrents if t["hash"] in hashes]
+        return web.json_response(torrents)
+
+    async def add(request):
+        check(request)
+        data = await request.post()
+        server.added.append(dict(data))
+        return web.Response(text="Ok.")
+
+    return [web.post("/api/v2/auth/login", login),
+            web.get("/api/v2/torrents/info", info),
+            web.post("/api/v2/torrents/add", add)]
+
+
+def transmission_routes(server):
+    server.session_id = "tr-session"
+
+    async def rpc(request):
+        if request.headers.get("X-Transmission-Session-Id") != server.session_id:
+            return web.Response(status=409, headers={"X-Transmission-Session-Id": server.session_id})
+        payload = await request.json()
+        if payload["method"] == "torrent-get":
+            torrents = [
+                {"id": 1, "hashString": "d" * 40, "name": "tr-movie", "status": 4, "labels": ["HUB"],
+                 "percentDone": 0.25, "rateDownload": 2048, "rateUpload": 0},
+                {"id": 2, "hashString": "e" * 40, "name": "tr-done", "status": 6, "labels": [],
+                 "percentDone": 1, "rateDownload": 0, "rateUpload": 0},
+                {"id": 4, "hashString": "g" * 40, "name": "tr-paused", "status": 0, "labels": ["HUB"],
+                 "percentDone": 0.5, "rateDownload": 0, "rateUpload": 0},
+                {"id": 5, "hashString": "h" * 40, "name": "tr-done-paused", "status": 0, "labels": ["HUB"],
+                 "percentDone": 1, "rateDownload": 0, "rateUpload": 0},
+            ]
+            fields = payload["arguments"]["fields"]
+            torrents = [{k: v for k, v in t.items() if k in fields} for t in torrents]
+            return web.json_response({"result": "success", "arguments": {"torrents": torrents}})
+        if payload["method"] == "torrent-add":
+            return web.json_response({"result": "success", "arguments": {
+                "torrent-added": {"id": 3, "hashString": "f" * 40, "name": "new"}}})
+        return web.json_response({"result": "success", "arguments": {}})
+
+    return [web.post("/transmission/rpc", rpc)]
+
+
+@pytest.fixture()
+def servers():
+    """start stand-in servers on the shared loop"""
+    started = []
+
+    def start(routes, delay=0.0):
+        server = AsyncLoop().run(StandInServer(routes, delay).start())
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        AsyncLoop().run(server.stop())
+
+
+def qb_conf(server):
+    return {"type": "qbittorrent", "name": "qb",
+            "config": {"host": "127.0.0.1", "port": server.port, "username": "admin", "password": "secret"}}
+
+
+def tr_conf(server):
+    return {"type": "transmission", "name": "tr", "config": {"host": "127.0.0.1", "port": server.port}}
+
+
+def test_qbittorrent_filters_and_progress(servers):
+    """qBittorrent: login, server-side filters, progress formatting and add"""
+    server = servers(qbittorrent_routes)
+    client = SyncDownloader(AsyncQbittorrent({"host": "127.0.0.1", "port": server.port,
+                                              "username": "admin", "password": "secret"}))
+    torrents, error = client.get_torrents(tag="movie")
+    assert not error
+    assert [t.hash for t in torrents] == ["a" * 40]
+    torrents, _ = client.get_torrents(tag=["HUB", "movie"], category="movie")
+    assert [t.name for t in torrents] == ["movie"]
+    server.ignore_tag = True
+    assert [t.hash for t in client.get_torrents(tag="movie")[0]] == ["a" * 40]
+    server.ignore_tag = False
+    progress = client.get_downloading_progress()
+    assert [(p["name"], p["state"], p["progress"]) for p in progress] == [
+        ("movie", "Downloading", 50.0), ("show", "Stoped", 10.0)]
+    assert client.add_torrent(b"d4:infod4:name1:xee", tag=["HUB", "NT"], download_dir="/data")
+    assert server.added[0]["tags"] == "HUB,NT"
+    assert server.added[0]["savepath"] == "/data"
+    client.close()
+
+
+def test_qbittorrent_relogin(servers):
+    """qBittorrent: an expired SID triggers one re-login"""
+    server = servers(qbittorrent_routes)
+    client = SyncDownloader(AsyncQbittorrent({"host": "127.0.0.1", "port": server.port,
+                                              "username": "admin", "password": "secret"}))
+    assert client.get_torrents()[0]
+    server.sid = "sid-2"
+    torrents, error = client.get_torrents()
+    assert not error and len(torrents) == 3
+    assert server.requests.count("/api/v2/auth/login") == 2
+    client.close()
+
+
+def test_transmission_session_and_status(servers):
+    """Transmission: session id handshake, status names and projections"""
+    server = servers(transmission_routes)
+    client = SyncDownloader(AsyncTransmission({"host": "127.0.0.1", "port": server.port}))
+    torrents, error = client.get_torrents(status="seeding", fields=["id", "hashString", "name", "status"])
+    assert not error
+    assert [t.name for t in torrents] == ["tr-done"]
+    assert "labels" not in torrents[0]
+    progress = client.get_downloading_progress(tag="HUB")
+    assert progress == [{"id": "d" * 40, "name": "tr-movie", "speed": progress[0]["speed"],
+                         "state": "Downloading", "progress": 25},
+                        {"id": "g" * 40, "name": "tr-paused", "speed": "已暂停", "state": "Stoped", "progress": 50}]
+    assert client.add_torrent("magnet:?xt=urn:btih:" + "f" * 40).hashString == "f" * 40
+    client.close()
+
+
+def test_pool_runs_clients_concurrently_over_keepalive(servers):
+    """Pool: all clients polled concurrently, each over a single reused connection"""
+    delay = 0.3
+    qb_servers = [servers(qbittorrent_routes, delay) for _ in range(3)]
+    tr_servers = [servers(transmission_routes, delay) for _ in range(3)]
+    confs = {}
+    for i, server in enumerate(qb_servers):
+        confs[f"qb{i}"] = qb_conf(server)
+    for i, server in enumerate(tr_servers):
+        confs[f"tr{i}"] = tr_conf(server)
+    pool = AsyncDownloaderPool(confs)
+    # warm up: login / session id handshake
+    pool.get_downloading_progress()
+    start = time.perf_counter()
+    for _ in range(3):
+        results = pool.get_downloading_progress()
+    elapsed = time.perf_counter() - start
+    assert set(results.keys()) == set(confs.keys())
+    assert all(results[did] for did in results)
+    # 3 rounds of 6 clients at 0.3s (qB round trip 1 request, TR 1 request) run concurrently per round
+    assert elapsed < 3 * delay * 2
+    for server in qb_servers + tr_servers:
+        assert len(server.peers) == 1
+    pool.close()
@@ -0,0 +1,84 @@
+"""Test the asyncio RequestUtils variant against a stand-in aiohttp server"""
+import asyncio
+
+from aiohttp import web
+
+from hubstation.utils.aio_http_utils import AsyncRequestUtils
+
+
+async def start_server(delay=0.0):
+    state = {"peers": set(), "requests": []}
+
+    async def echo(request):
+        state["peers"].add(request.transport.get_extra_info("peername"))
+        if delay:
+            await asyncio.sleep(delay)
+        body = await request.read()
+        state["requests"].append({
+            "method": request.method,
+            "headers": request.headers.copy(),
+            "query": dict(request.query),
+            "body": body,
+        })
+        res = web.Response(body="中文".encode("gbk"), content_type="text/plain", charset="gbk")
+        res.set_cookie("session", "server")
+        return res
+
+    async def redirect(request):
+        raise web.HTTPFound("/echo")
+
+    app = web.Application()
+    app.add_routes([web.route("*", "/echo", echo), web.get("/redirect", redirect)])
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}", state
+
+
+def test_headers_cookies_and_responses():
+    async def run():
+        runner, base_url, state = await start_server()
+        try:
+            req = AsyncRequestUtils(headers="test-ua", cookies="uid=1; pass=x", referer="https://site/")
+            res = await req.get_res(f"{base_url}/echo", params={"q": "a b"})
+            assert res and res.status_code == 200 and res.text == "中文"
+            assert res.cookies == {"session": "server"}
+            sent = state["requests"][-1]
+            assert sent["headers"]["User-Agent"] == "test-ua"
+            assert sent["headers"]["referer"] == "https://site/"
+            assert sent["headers"]["Cookie"] == "uid=1; pass=x"
+            assert sent["query"] == {"q": "a b"}
+            # cookies from responses are not replayed by the shared session
+            await AsyncRequestUtils(headers="test-ua").get_res(f"{base_url}/redirect")
+            assert "Cookie" not in state["requests"][-1]["headers"]
+            res = await AsyncRequestUtils(headers="test-ua").post_res(f"{base_url}/echo", data={"a": "1"})
+            assert res.ok and state["requests"][-1]["body"] == b"a=1"
+            await AsyncRequestUtils(headers={"User-Agent": "x"}).post_res(f"{base_url}/echo", json={"a": 1})
+            assert state["requests"][-1]["body"] == b'{"a": 1}'
+            assert state["requests"][-1]["headers"]["Content-Type"] == "application/json"
+            res = await AsyncRequestUtils(headers="x").post_res(f"{base_url}/echo", files={"torrent": (
+                "a.torrent", b"d4:infoe", "application/x-bittorrent")})
+            assert b'filename="a.torrent"' in state["requests"][-1]["body"]
+            assert not await AsyncRequestUtils(headers="x").get_res(f"{base_url}/missing")
+            assert await AsyncRequestUtils(headers="x", timeout=1).get_res("http://127.0.0.1:1/") is None
+        finally:
+            await AsyncRequestUtils.close_session()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_many_concurrent_fetches_share_connections():
+    async def run():
+        runner, base_url, state = await start_server(delay=0.05)
+        try:
+            req = AsyncRequestUtils(headers="test")
+            results = await asyncio.gather(*[req.get_res(f"{base_url}/echo?id={i}") for i in range(400)])
+            assert all(res.status_code == 200 for res in results)
+            assert len(state["peers"]) <= AsyncRequestUtils._connection_limit_per_host
+        finally:
+            await AsyncRequestUtils.close_session()
+            await runner.cleanup()
+
+    asyncio.run(run())
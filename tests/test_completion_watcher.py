@@ -0,0 +1,53 @@
+"""Test completion detection from qBittorrent sync/maindata deltas"""
+from hubstation.downloader.completion_watcher import CompletionWatcher
+from hubstation.downloader.torrent_snapshot import QbittorrentSnapshot
+
+
+class StandInSync:
+    """Stand-in qbittorrentapi client returning queued sync/maindata responses"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.rids = []
+
+    def sync_maindata(self, rid=0):
+        self.rids.append(rid)
+        return self.responses.pop(0) if self.responses else {"rid": rid}
+
+
+def test_new_completions_and_adaptive_interval():
+    """only newly completed hashes are reported; the interval shrinks when active and backs off when idle"""
+    client = StandInSync([
+        {"rid": 1, "full_update": True, "torrents": {
+            "a": {"state": "downloading"}, "b": {"state": "uploading"}, "c": {"state": "pausedDL"}}},
+        {"rid": 2, "torrents": {"a": {"state": "stalledUP"}}},
+        {"rid": 3},
+        {"rid": 4},
+        {"rid": 5, "torrents": {"c": {"state": "pausedUP"}}, "torrents_removed": ["b"]},
+    ])
+    watcher = CompletionWatcher(QbittorrentSnapshot(client, max_age=0),
+                                min_interval=10, max_interval=40, reconcile_interval=1000)
+    # first poll is a full reconciliation pass
+    assert watcher.poll(now=1) == ([], True)
+    assert watcher.interval == 10
+    assert not watcher.due(now=5) and watcher.due(now=11)
+    assert watcher.poll(now=11) == (["a"], False)
+    assert watcher.interval == 10
+    # nothing downloading: back off up to max_interval
+    assert watcher.poll(now=21) == ([], False)
+    assert watcher.interval == 20
+    assert watcher.poll(now=41) == ([], False)
+    assert watcher.interval == 40
+    assert watcher.poll(now=81) == (["c"], False)
+    assert watcher.interval == 10
+    assert client.rids == [0, 1, 2, 3, 4]
+    # periodic reconciliation
+    assert watcher.poll(now=1001)[1]
+
+
+def test_unsupported_client_falls_back_to_full_scan():
+    """clients without incremental state are fully scanned every max_interval"""
+    watcher = CompletionWatcher(object(), min_interval=10, max_interval=300)
+    assert watcher.poll(now=1) == ([], True)
+    assert watcher.interval == 300
+    assert not watcher.due(now=300)
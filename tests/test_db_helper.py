@@ -0,0 +1,31 @@
+"""Test the history paging queries of DbHelper"""
+from hubstation.db.main_db import MainDb
+from hubstation.db.models import DOWNLOADHISTORY
+from hubstation.helper.db_helper import DbHelper
+
+
+def test_download_history_with_null_title_and_date():
+    db = MainDb()
+    db.init_db()
+    db.query(DOWNLOADHISTORY).delete()
+    for title, date in [("a", "2024-01-01"), ("a", "2024-02-01"), ("a", None),
+                        (None, "2024-01-05"), (None, "2024-03-01"), (None, None),
+                        ("b", None), ("b", None), ("c", "2024-01-01"), ("c", "2024-01-01")]:
+        db.insert(DOWNLOADHISTORY(TITLE=title, DATE=date))
+    db.commit()
+    helper = DbHelper()
+    # one row per title, NULL titles form one group and NULL dates sort last
+    histories = [(h.TITLE, h.DATE) for h in helper.get_download_history(num=100)]
+    assert histories == [(None, "2024-03-01"), ("a", "2024-02-01"), ("c", "2024-01-01"), ("b", None)]
+    # the cursor also walks past rows without a date
+    paged, last = [], None
+    while True:
+        page = helper.get_download_history(num=1, last_date=last.DATE if last else None,
+                                           last_id=last.ID if last else None)
+        if not page:
+            break
+        paged += [(h.TITLE, h.DATE) for h in page]
+        last = page[-1]
+    assert paged == histories
+    db.query(DOWNLOADHISTORY).delete()
+    db.commit()
@@ -0,0 +1,122 @@
+"""Test the group-committing single writer thread"""
+import os
+import tempfile
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from hubstation.db.writer import DbWriter
+
+
+@pytest.fixture()
+def db():
+    path = os.path.join(tempfile.mkdtemp(), "writer.db")
+    engine = create_engine(f"sqlite:///{path}?check_same_thread=False")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE T (NAME TEXT UNIQUE)"))
+    session_factory = scoped_session(sessionmaker(bind=engine))
+    writer = DbWriter(session_factory, window=0.2)
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(threading.current_thread().name))
+    yield engine, session_factory, writer, commits
+    writer.stop()
+    engine.dispose()
+
+
+def names(engine):
+    with engine.connect() as conn:
+        return sorted(row[0] for row in conn.execute(text("SELECT NAME FROM T")))
+
+
+def insert(session_factory, name):
+    session_factory().execute(text("INSERT INTO T (NAME) VALUES (:name)"), {"name": name})
+    return name
+
+
+def hold_writer(writer):
+    """occupy the writer thread so that the next submits queue up into one batch"""
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    writer.submit(blocker)
+    started.wait(5)
+    return release
+
+
+def test_queued_writes_commit_in_one_transaction(db):
+    engine, session_factory, writer, commits = db
+    release = hold_writer(writer)
+    futures = [writer.submit(insert, session_factory, f"n{i}") for i in range(20)]
+    del commits[:]
+    release.set()
+    assert [future.result(5) for future in futures] == [f"n{i}" for i in range(20)]
+    assert commits == ["DbWriter"]
+    assert len(names(engine)) == 20
+
+
+def test_failed_write_is_isolated_and_batch_replayed(db):
+    engine, session_factory, writer, _ = db
+    calls = []
+
+    def counted(name):
+        calls.append(name)
+        return insert(session_factory, name)
+
+    insert(session_factory, "dup")
+    session_factory().commit()
+    release = hold_writer(writer)
+    ok1 = writer.submit(counted, "a")
+    bad = writer.submit(counted, "dup")
+    ok2 = writer.submit(counted, "b")
+    release.set()
+    assert ok1.result(5) == "a" and ok2.result(5) == "b"
+    with pytest.raises(Exception):
+        bad.result(5)
+    assert names(engine) == ["a", "b", "dup"]
+    # after the batch is rolled back every write runs again on its own, which is why
+    # persisted functions may only do database work
+    assert calls == ["a", "dup", "a", "dup", "b"]
+
+
+def test_nested_submit_runs_inline_in_the_same_transaction(db):
+    engine, session_factory, writer, _ = db
+    inner = []
+
+    def outer(fail):
+        future = writer.submit(insert, session_factory, f"inner-{fail}")
+        inner.append(future.done())
+        insert(session_factory, f"outer-{fail}")
+        if fail:
+            raise ValueError("outer failed")
+
+    writer.submit(outer, False).result(5)
+    with pytest.raises(ValueError):
+        writer.submit(outer, True).result(5)
+    assert inner == [True, True]
+    # the nested write is rolled back together with the failed outer write
+    assert names(engine) == ["inner-False", "outer-False"]
+
+
+def test_on_commit_runs_after_commit_only(db):
+    engine, session_factory, writer, _ = db
+    seen = []
+
+    def write(name, fail):
+        insert(session_factory, name)
+        writer.on_commit(lambda: seen.append((name, names(engine))))
+        if fail:
+            raise ValueError(name)
+
+    writer.submit(write, "x", False).result(5)
+    with pytest.raises(ValueError):
+        writer.submit(write, "y", True).result(5)
+    # the callback sees the committed row from another connection; the rolled back write never calls back
+    assert seen == [("x", ["x"])]
+    # outside the writer thread the callback runs at once
+    writer.on_commit(lambda: seen.append("now"))
+    assert seen[-1] == "now"
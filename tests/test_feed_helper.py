@@ -0,0 +1,78 @@
+"""Test conditional feed fetching against a stand-in HTTP server"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from hubstation.helper.feed_helper import FeedHelper
+
+HEADERS = {"User-Agent": "test"}
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.peers.add(self.client_address)
+        server.conditional.append(self.headers.get("If-None-Match"))
+        if server.etag and self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.send_header("Content-Length", str(len(server.body)))
+        if server.etag:
+            self.send_header("ETag", server.etag)
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def feed_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    server.body = "<?xml version='1.0' encoding='gbk'?><rss><channel><title>测试</title></channel></rss>".encode("gbk")
+    server.etag = '"v1"'
+    server.peers = set()
+    server.conditional = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_etag_and_connection_reuse(feed_server):
+    url = f"http://127.0.0.1:{feed_server.server_port}/rss?passkey=1"
+    helper = FeedHelper()
+    helper.forget(url)
+    first = helper.fetch(url, headers=HEADERS)
+    assert first.changed and first.status_code == 200
+    assert first.encoding == "gbk" and "测试" in first.text
+    second = helper.fetch(url, headers=HEADERS)
+    assert second.not_modified and not second.changed
+    assert second.digest == first.digest
+    assert feed_server.conditional == [None, '"v1"']
+    # new content with a new etag
+    feed_server.body = b"<rss><channel></channel></rss>"
+    feed_server.etag = '"v2"'
+    third = helper.fetch(url, headers=HEADERS)
+    assert third.changed and third.digest != first.digest
+    assert len(feed_server.peers) == 1
+
+
+def test_unchanged_body_without_validators(feed_server):
+    url = f"http://127.0.0.1:{feed_server.server_port}/rss?passkey=2"
+    feed_server.etag = None
+    helper = FeedHelper()
+    helper.forget(url)
+    assert helper.fetch(url, headers=HEADERS).changed
+    unchanged = helper.fetch(url, headers=HEADERS)
+    assert unchanged.status_code == 200 and not unchanged.changed
+    # an unconditional fetch always hands back content to parse
+    assert helper.fetch(url, headers=HEADERS, conditional=False).changed
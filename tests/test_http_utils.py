@@ -0,0 +1,90 @@
+"""Test shared keep-alive sessions and per-host limits in RequestUtils"""
+import threading
+import time
+from contextlib import ExitStack
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from hubstation.utils.http_utils import RequestUtils, SessionPool
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.peers.add(self.client_address)
+            server.cookies.append(self.headers.get("Cookie"))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(server.delay)
+        body = b"d4:infod4:name4:testee"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "session=server; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    httpd.lock = threading.Lock()
+    httpd.peers = set()
+    httpd.cookies = []
+    httpd.active = 0
+    httpd.max_active = 0
+    httpd.delay = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_connections_are_reused_without_leaking_cookies(server):
+    url = f"http://127.0.0.1:{server.server_port}/dl"
+    for _ in range(5):
+        assert RequestUtils(headers="test").get_res(url).content == b"d4:infod4:name4:testee"
+    res = RequestUtils(headers="test", cookies="uid=1; pass=x").get_res(url)
+    assert res.cookies.get("session") == "server"
+    assert len(server.peers) == 1
+    # cookies set by the server are not replayed to later callers
+    assert server.cookies == [None] * 5 + ["uid=1; pass=x"]
+    assert not SessionPool().get_session(url).cookies
+
+
+def test_per_host_concurrency(server):
+    server.delay = 0.05
+    url = f"http://127.0.0.1:{server.server_port}/dl"
+    threads = [threading.Thread(target=RequestUtils(headers="test").get_res, args=(url,)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 1 < server.max_active <= SessionPool()._host_concurrency
+    assert len(server.peers) <= SessionPool()._pool_maxsize
+
+
+def test_waiting_for_a_host_slot_is_bounded_by_the_timeout(server):
+    url = f"http://127.0.0.1:{server.server_port}/dl"
+    pool = SessionPool()
+    with ExitStack() as stack:
+        # every slot of the host is taken, so a request can only wait
+        for _ in range(pool._host_concurrency):
+            stack.enter_context(pool.limit(url))
+        start = time.monotonic()
+        assert RequestUtils(headers="test", timeout=0.2).get_res(url) is None
+        assert time.monotonic() - start < 2
+        with pytest.raises(requests.exceptions.RequestException):
+            RequestUtils(headers="test", timeout=0.2).get_res(url, raise_exception=True)
+    # the slots are returned on exit
+    assert RequestUtils(headers="test", timeout=5).get_res(url).status_code == 200
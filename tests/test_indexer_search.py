@@ -0,0 +1,111 @@
+"""Test concurrent indexer search with a global deadline"""
+import time
+from types import SimpleNamespace
+
+from hubstation.indexer.health import IndexerHealth
+from hubstation.indexer.Indexer import Indexer
+
+
+class StandInClient:
+    """Stand-in indexer client whose indexers answer after a fixed delay"""
+    client_id = "builtin"
+
+    def __init__(self, delays):
+        self.indexers = [SimpleNamespace(name=name, delay=delay) for name, delay in delays.items()]
+        self.statistics = []
+        self.progress = SimpleNamespace(update=lambda **kwargs: None)
+        self.dbhelper = SimpleNamespace(insert_indexer_statistics_batch=self.statistics.append)
+
+    def get_indexers(self):
+        return self.indexers
+
+    @staticmethod
+    def search_indexer(indexer, key_word, timeout=None, cache=True):
+        # "hung" keeps trickling data past the request timeout
+        time.sleep(indexer.delay if indexer.name == "hung" else min(indexer.delay, timeout))
+        if indexer.delay > timeout:
+            return None
+        return [{"title": f"{key_word} {indexer.name}"}] if indexer.delay else []
+
+    @staticmethod
+    def filter_search_results(result_array, indexer, **kwargs):
+        return [item["title"] for item in result_array]
+
+
+def test_results_stream_in_answer_order_within_deadline():
+    client = StandInClient({"slow": 0.6, "fast": 0.05, "empty": 0, "hung": 5, "medium": 0.3, "late": 0.9})
+    start = time.monotonic()
+    answers = []
+    indexer_search = Indexer(client, search_deadline=1, indexer_timeout=0.8, health=IndexerHealth())
+    for indexer, results in indexer_search.search_by_keyword("kw"):
+        answers.append((indexer.name, results, round(time.monotonic() - start, 1)))
+    elapsed = time.monotonic() - start
+    # bounded by the deadline, not by the sum of the delays
+    assert elapsed < 1.5
+    assert [name for name, _, _ in answers] == ["empty", "fast", "medium", "slow", "late"]
+    assert answers[1][1] == ["kw fast"] and answers[1][2] < 0.3
+    # statistics written once, late indexers recorded as failures
+    assert len(client.statistics) == 1
+    assert {s["indexer"]: s["result"] for s in client.statistics[0]} == {
+        "empty": "N", "fast": "Y", "medium": "Y", "slow": "Y", "late": "N", "hung": "N"}
+
+
+def test_site_filter_and_early_stop():
+    client = StandInClient({"a": 0.01, "b": 0.2, "c": 0.01})
+    search = Indexer(client, health=IndexerHealth()).search_by_keyword("kw", filter_args={"site": ["a", "b"]})
+    indexer, results = next(search)
+    assert indexer.name == "a" and results == ["kw a"]
+    search.close()
+    assert [s["indexer"] for s in client.statistics[0]] == ["a", "b"]
+
+
+def test_health_orders_and_breaks_circuit():
+    health = IndexerHealth(failure_threshold=2, open_seconds=10)
+    for seconds in (1, 2, 40):
+        health.record("slow", seconds, True, now=0)
+    health.record("fast", 0.2, True, now=0)
+    health.record("dead", 10, False, now=0)
+    assert not health.is_open("dead", now=1)
+    health.record("dead", 10, False, now=1)
+    assert health.is_open("dead", now=5)
+    indexers = [SimpleNamespace(name=name) for name in ("dead", "slow", "new", "fast")]
+    assert [i.name for i in health.order(indexers)] == ["new", "fast", "slow", "dead"]
+    scores = {score["name"]: score for score in health.get_scores(now=5)}
+    assert scores["slow"]["p95"] == 40 and scores["dead"]["state"] == "open"
+    assert health.get_scores(now=5)[0]["name"] == "slow"
+    # a single probe is claimed once the breaker expires; a failed probe doubles the open time
+    assert not health.claim_probe("dead", now=5)
+    assert health.claim_probe("dead", now=11) and not health.claim_probe("dead", now=11)
+    assert health.is_open("dead", now=12)
+    health.record("dead", 10, False, now=12)
+    assert {score["name"]: score["retry_in"] for score in health.get_scores(now=12)}["dead"] == 20
+    assert health.claim_probe("dead", now=32)
+    health.record("dead", 1, True, now=33)
+    assert not health.is_open("dead", now=33)
+
+
+def test_seed_fills_stats_without_opening_circuits():
+    health = IndexerHealth(open_seconds=10)
+    health.seed([("a", 10)] * 3 + [("b", 1), ("b", None)], timeout=10)
+    assert not health.is_open("a") and not health.claim_probe("a")
+    scores = {score["name"]: score for score in health.get_scores()}
+    assert scores["a"]["p95"] == 10 and scores["a"]["state"] == "closed"
+    assert scores["b"]["samples"] == 2
+    # the failure streak from history carries over to the next live failure
+    health.record("a", 10, False)
+    assert health.is_open("a")
+
+
+def test_open_indexers_are_skipped_and_probed():
+    health = IndexerHealth(failure_threshold=1, open_seconds=0.2)
+    client = StandInClient({"ok": 0.01, "down": 0.01})
+    health.record("down", 10, False)
+    names = [indexer.name for indexer, _ in Indexer(client, health=health).search_by_keyword("kw")]
+    assert names == ["ok"]
+    time.sleep(0.25)
+    # the expired breaker is probed in the background instead of joining the search
+    names = [indexer.name for indexer, _ in Indexer(client, health=health).search_by_keyword("kw")]
+    assert names == ["ok"]
+    time.sleep(0.1)
+    assert not health.is_open("down")
+    assert [s["indexer"] for s in client.statistics[1]] == ["ok"]
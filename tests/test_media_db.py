@@ -0,0 +1,32 @@
+"""Test that media library items written by MediaDb.insert are found by the in-memory index"""
+from hubstation.db.media_db import MediaDb
+
+
+def test_insert_then_query():
+    db = MediaDb()
+    db.init_db()
+    db.empty()
+    db.rebuild_index()
+    assert db.insert("emby", {"id": "10", "library": "1", "type": "Movie", "title": "B", "originalTitle": "B",
+                              "year": 2021, "tmdbid": 56, "imdbid": "tt1", "path": "/b"}, {})
+    for year in (2021, "2021"):
+        item = db.query("emby", "B", year, None)
+        assert item and item.ITEM_ID == "10" and item.YEAR == "2021" and item.TMDBID == "56"
+    assert db.query("emby", "B", None, 56).ITEM_ID == "10"
+    assert db.query("emby", "B", "2021", "56").ITEM_ID == "10"
+    assert not db.query("emby", "B", 2020, None)
+    assert not db.query("emby", "B", 2021, 57)
+    # the rebuilt index holds the same values as the one patched on insert
+    db.rebuild_index()
+    assert db.query("emby", "B", 2021, 56) == item
+
+
+def test_resync_unchanged_library_with_integer_values():
+    db = MediaDb()
+    db.init_db()
+    items = [({"id": str(i), "type": "Movie", "title": f"T{i}", "year": 2000 + i, "tmdbid": 100 + i}, {})
+             for i in range(100)]
+    assert db.sync_items("jellyfin", "lib", items)["inserted"] == 100
+    result = db.sync_items("jellyfin", "lib", items, diff_only=True)
+    assert result["updated"] == 0 and result["unchanged"] == 100 and result["deleted"] == 0
+    assert db.query("jellyfin", "T5", 2005, 105).ITEM_ID == "5"
@@ -0,0 +1,91 @@
+"""Test the RSS seen-set: bulk dedup, cache coherence with deletes and the RSS check entry point"""
+import pytest
+from sqlalchemy import event
+
+from hubstation.db import main_db
+from hubstation.db.main_db import MainDb
+from hubstation.helper.rss_helper import RssHelper
+
+
+@pytest.fixture()
+def helper():
+    MainDb().init_db()
+    rss = RssHelper()
+    rss.truncate_rss_history()
+    rss.init_rssd_cache()
+    yield rss
+    rss.truncate_rss_history()
+
+
+def items(*names):
+    return [{"title": name, "enclosure": f"https://site/dl/{name}" if name else ""} for name in names]
+
+
+def test_unrssd_items_in_bulk(helper):
+    for i in range(0, 600, 2):
+        helper.simple_insert_rss_torrents(f"t{i}", f"https://site/dl/t{i}")
+    # start from a cold cache so every lookup misses and goes to the database
+    RssHelper._rssd_enclosures, RssHelper._rssd_names = set(), set()
+    statements = []
+
+    def listener(*args):
+        statements.append(args[2])
+
+    event.listen(main_db._Engine, "before_cursor_execute", listener)
+    try:
+        new = helper.get_unrssd_items(items(*[f"t{i}" for i in range(600)]))
+    finally:
+        event.remove(main_db._Engine, "before_cursor_execute", listener)
+    assert [item["title"] for item in new] == [f"t{i}" for i in range(1, 600, 2)]
+    # one IN query per 500 values
+    assert len(statements) == 2
+    assert helper.get_unrssd_items(items("t0", "t1")) == items("t1")
+    # without an enclosure only the simple rule checks the name
+    assert helper.get_unrssd_items([{"title": "t0", "enclosure": ""}]) == []
+    assert helper.get_unrssd_items([{"title": "t0", "enclosure": ""}], simple=True) == []
+    assert helper.get_unrssd_items([{"title": "t1", "enclosure": ""}], simple=True) == [
+        {"title": "t1", "enclosure": ""}]
+
+
+def test_deleted_items_are_seen_as_new_again(helper):
+    helper.simple_insert_rss_torrents("a", "https://site/dl/a")
+    helper.simple_insert_rss_torrents("b", "https://site/dl/b")
+    assert helper.get_unrssd_items(items("a", "b", "c")) == items("c")
+    helper.simple_delete_rss_torrents("a", "https://site/dl/a")
+    helper.simple_delete_rss_torrents("b")
+    assert helper.get_unrssd_items(items("a", "b", "c")) == items("a", "b", "c")
+    assert not helper.is_rssd_by_enclosure("https://site/dl/a")
+    assert not helper.is_rssd_by_simple("b", None)
+
+
+def test_cache_load_does_not_keep_rows_deleted_meanwhile(helper, monkeypatch):
+    helper.simple_insert_rss_torrents("a", "https://site/dl/a")
+    db = RssHelper._db
+    query = db.query
+
+    class Loaded:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def yield_per(self, count):
+            return iter(self.rows)
+
+    def load_then_delete(*columns):
+        # the rows are read before the delete commits, as in a load racing with a delete
+        rows = query(*columns).all()
+        monkeypatch.setattr(db, "query", query)
+        helper.simple_delete_rss_torrents("a", "https://site/dl/a")
+        return Loaded(rows)
+
+    monkeypatch.setattr(db, "query", load_then_delete)
+    helper.init_rssd_cache()
+    assert "https://site/dl/a" not in RssHelper._rssd_enclosures
+    assert helper.get_unrssd_items(items("a")) == items("a")
+
+
+def test_rss_updates(helper, monkeypatch):
+    helper.simple_insert_rss_torrents("a", "https://site/dl/a")
+    monkeypatch.setattr(RssHelper, "parse_rssxml", staticmethod(lambda url, proxy=False: items("a", "b")))
+    assert helper.get_rss_updates("https://site/rss") == items("b")
+    monkeypatch.setattr(RssHelper, "parse_rssxml", staticmethod(lambda url, proxy=False: None))
+    assert helper.get_rss_updates("https://site/rss") is None
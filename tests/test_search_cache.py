@@ -0,0 +1,92 @@
+"""Test the search result cache and request coalescing"""
+import threading
+import time
+
+from hubstation.indexer.search_cache import SearchResultCache
+
+
+def test_normalized_key_ttl_and_lru():
+    cache = SearchResultCache(maxsize=2, ttl=0.2)
+    calls = []
+
+    def search(result):
+        def __search():
+            calls.append(result)
+            return [{"title": result}]
+        return __search
+
+    key = cache.make_key("site1", "Spider-Man: No Way Home")
+    assert key == cache.make_key("site1", "spider man  no way home")
+    assert key != cache.make_key("site1", "spider man no way home", imdb_id="tt10872600")
+    first = cache.get_or_search(key, search("a"))
+    first[0]["title"] = "changed"
+    assert cache.get_or_search(key, search("b")) == [{"title": "a"}]
+    # failures are not cached
+    other = cache.make_key("site2", "x")
+    assert cache.get_or_search(other, lambda: None) is None
+    assert cache.get_or_search(other, search("c")) == [{"title": "c"}]
+    # LRU eviction keeps the most recently used entries
+    cache.get_or_search(key, search("b"))
+    cache.get_or_search(cache.make_key("site3", "x"), search("d"))
+    assert cache.get_or_search(other, search("e")) == [{"title": "e"}]
+    time.sleep(0.25)
+    assert cache.get_or_search(key, search("f")) == [{"title": "f"}]
+    assert calls == ["a", "c", "d", "e", "f"]
+    cache.invalidate("site1")
+    assert cache.get_or_search(key, search("g")) == [{"title": "g"}]
+
+
+def test_concurrent_identical_searches_share_one_call():
+    cache = SearchResultCache(maxsize=10, ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def search():
+        calls.append(1)
+        release.wait(1)
+        return [{"title": "t"}]
+
+    key = cache.make_key("site1", "keyword")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_search(key, search)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [[{"title": "t"}]] * 8
+
+
+def test_failed_search_is_raised_in_every_concurrent_caller():
+    cache = SearchResultCache(maxsize=10, ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def search():
+        calls.append(1)
+        release.wait(1)
+        raise ConnectionError("indexer down")
+
+    key = cache.make_key("site1", "keyword")
+    errors = []
+
+    def __call():
+        try:
+            cache.get_or_search(key, search)
+        except ConnectionError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=__call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert errors == ["indexer down"] * 8
+    # the failure is not cached, the next call searches again
+    assert cache.get_or_search(key, lambda: [{"title": "t"}]) == [{"title": "t"}]
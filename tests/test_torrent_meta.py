@@ -0,0 +1,92 @@
+"""Test lazy torrent metadata parsing and its digest-keyed cache"""
+import hashlib
+
+import pytest
+
+from hubstation.utils.cache_manager import TorrentMetaCache
+from hubstation.utils.torrent import Torrent
+from hubstation.utils.torrent_meta import (BencodeSpan, TorrentMeta, bdecode,
+                                           get_torrent_meta, read_torrent_meta)
+
+
+def bencode(value):
+    if isinstance(value, int):
+        return b"i%de" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"%d:%s" % (len(value), value)
+    if isinstance(value, list):
+        return b"l" + b"".join(bencode(v) for v in value) + b"e"
+    return b"d" + b"".join(bencode(k) + bencode(value[k]) for k in sorted(value)) + b"e"
+
+
+def season_pack(episodes=3):
+    info = {
+        "name": "Show.S01.1080p",
+        "piece length": 4 * 1024 * 1024,
+        "pieces": b"\x01" * 20 * 100,
+        "files": [{"path": [f"Show.S01E{i:02d}.mkv"], "length": 1000 + i} for i in range(1, episodes + 1)]
+                 + [{"path": ["Extras", "behind.mkv"], "length": 7}],
+    }
+    info_bytes = bencode(info)
+    content = b"d8:announce" + bencode("http://tracker/announce") + b"4:info" + info_bytes + b"e"
+    return content, info_bytes
+
+
+def test_parse_skips_pieces_and_hashes_raw_info():
+    content, info_bytes = season_pack()
+    value, end = bdecode(content)
+    assert end == len(content)
+    assert isinstance(value[b"info"][b"pieces"], BencodeSpan)
+    assert len(value[b"info"][b"pieces"]) == len(bencode(b"\x01" * 2000))
+    meta = TorrentMeta.parse(content)
+    assert meta.info_hash == hashlib.sha1(info_bytes).hexdigest()
+    assert meta.file_folder == "Show.S01.1080p"
+    assert meta.file_names == ["Show.S01E01.mkv", "Show.S01E02.mkv", "Show.S01E03.mkv", "Extras"]
+    assert meta.total_size == 1001 + 1002 + 1003 + 7
+    assert not meta.is_v2
+
+
+def test_v2_single_file():
+    info = {"name": "movie.mkv", "meta version": 2, "piece length": 16384,
+            "file tree": {"movie.mkv": {"": {"length": 42, "pieces root": b"\x00" * 32}}}}
+    info_bytes = bencode(info)
+    content = b"d4:info" + info_bytes + b"12:piece layersde" + b"e"
+    meta = TorrentMeta.parse(content)
+    assert meta.is_v2
+    assert meta.info_hash == hashlib.sha256(info_bytes).hexdigest()[:40]
+    assert meta.file_folder == "" and meta.file_names == ["movie.mkv"]
+    assert meta.total_size == 42
+
+
+def test_cache_and_mmap_file(tmp_path):
+    TorrentMetaCache.clear()
+    content, info_bytes = season_pack(episodes=5)
+    path = tmp_path / "pack.torrent"
+    path.write_bytes(content)
+    meta, data = read_torrent_meta(str(path), with_content=True)
+    assert data == content
+    # the file listing does not hash the info dict; it is filled in on the first lookup by content
+    assert meta.info_hash is None
+    assert get_torrent_meta(content) is meta
+    assert meta.info_hash == hashlib.sha1(info_bytes).hexdigest()
+    assert read_torrent_meta(str(path))[0] is meta
+    assert len(TorrentMetaCache) == 1
+
+
+@pytest.mark.parametrize("content", [b"", b"le", b"d4:infoi1ee", b"d4:info", b"d4:name99:xe", b"<html></html>"])
+def test_invalid_content(content):
+    with pytest.raises((ValueError, IndexError)):
+        TorrentMeta.parse(content)
+
+
+def test_info_hash_of_truncated_or_malformed_content():
+    content, info_bytes = season_pack()
+    assert Torrent.get_info_hash(content) == hashlib.sha1(info_bytes).hexdigest()
+    # every truncation of a valid torrent and wrongly typed info fields give None instead of raising
+    for end in range(1, len(content)):
+        assert Torrent.get_info_hash(content[:end]) is None
+    for malformed in (b"d4:infod5:filesi1eee", b"d4:infod5:filesli1eeee",
+                      b"d4:infod9:file treei1e12:meta versioni2eee"):
+        assert Torrent.get_info_hash(malformed) is None
@@ -0,0 +1,81 @@
+"""Test incremental RSS/Torznab parsing"""
+from xml.etree.ElementTree import ParseError
+
+import pytest
+
+from hubstation.indexer.base.base import TORZNAB_ATTR, BaseIndex
+from hubstation.utils.xml_utils import XmlUtils
+
+TORZNAB = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" xmlns:torznab="http://torznab.com/schemas/2015/feed"
+  xmlns:media="http://search.yahoo.com/mrss/">
+<channel><atom:link href="http://jackett/api" rel="self" />
+<item>
+  <media:title>media title</media:title>
+  <title>Movie.2023.2160p</title>
+  <jackettindexer id="site1">Site 1</jackettindexer>
+  <comments>https://site1/details/1</comments>
+  <size>1024</size>
+  <description><![CDATA[官方 <b>4K</b>]]></description>
+  <enclosure url="https://jackett/dl/1" length="1024" />
+  <torznab:attr name="seeders" value="12" />
+  <torznab:attr name="peers" value="3" />
+  <torznab:attr name="downloadvolumefactor" value="0" />
+  <torznab:attr name="imdbid" value="tt1234567" />
+</item>
+<item><title>no enclosure</title></item>
+<item>
+  <title>Show.S01E01</title>
+  <prowlarrindexer id="7">Prowlarr Site</prowlarrindexer>
+  <enclosure url="https://prowlarr/dl/2" />
+</item>
+</channel></rss>""".encode()
+
+
+def test_iter_items_in_chunks():
+    chunks = [TORZNAB[i:i + 7] for i in range(0, len(TORZNAB), 7)]
+    items = list(XmlUtils.iter_items(iter(chunks), attr_tag=TORZNAB_ATTR))
+    assert len(items) == 3
+    fields, attrs = items[0]
+    # media:title comes first but does not shadow the item's own title
+    assert XmlUtils.tag_value(fields, "title") == "Movie.2023.2160p"
+    assert XmlUtils.tag_value(fields, "enclosure", "url") == "https://jackett/dl/1"
+    assert XmlUtils.tag_value(fields, "enclosure", "type", default="x") == "x"
+    assert XmlUtils.tag_value(fields, "description") == "官方 <b>4K</b>"
+    assert [a["name"] for a in attrs] == ["seeders", "peers", "downloadvolumefactor", "imdbid"]
+    # the channel's atom:link does not leak into items
+    assert XmlUtils.tag_value(items[1][0], "link") is None
+
+
+def test_default_namespace_feed():
+    rdf = b"""<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://purl.org/rss/1.0/"
+  xmlns:dc="http://purl.org/dc/elements/1.1/">
+<channel rdf:about="https://site/rss"><title>Site</title><link>https://site/</link></channel>
+<item rdf:about="https://site/1"><title>A</title><link>https://site/1</link><dc:date>2023-01-01</dc:date></item>
+</rdf:RDF>"""
+    items = list(XmlUtils.iter_items(rdf))
+    assert [XmlUtils.tag_value(fields, "title") for fields, _ in items] == ["A"]
+    assert XmlUtils.tag_value(items[0][0], "link") == "https://site/1"
+    assert XmlUtils.tag_value(items[0][0], "date") == "2023-01-01"
+
+
+def test_torznab_items():
+    items = list(BaseIndex.iter_torznab_items(TORZNAB))
+    assert items == [
+        {'indexer_id': 'site1', 'indexer': 'Site 1', 'title': 'Movie.2023.2160p', 'enclosure': 'https://jackett/dl/1',
+         'description': '官方 <b>4K</b>', 'size': '1024', 'seeders': '12', 'peers': '3', 'freeleech': True,
+         'downloadvolumefactor': '0', 'uploadvolumefactor': 1.0, 'page_url': 'https://site1/details/1',
+         'imdbid': 'tt1234567'},
+        {'indexer_id': '7', 'indexer': 'Prowlarr Site', 'title': 'Show.S01E01', 'enclosure': 'https://prowlarr/dl/2',
+         'description': '', 'size': 0, 'seeders': 0, 'peers': 0, 'freeleech': False, 'downloadvolumefactor': 1.0,
+         'uploadvolumefactor': 1.0, 'page_url': '', 'imdbid': ''},
+    ]
+
+
+def test_declared_encoding_and_errors():
+    content = "<?xml version='1.0' encoding='gbk'?><rss><channel><item><title>中文</title></item></channel></rss>"
+    items = list(XmlUtils.iter_items(content.encode("gbk")))
+    assert XmlUtils.tag_value(items[0][0], "title") == "中文"
+    with pytest.raises(ParseError):
+        list(XmlUtils.iter_items(b"RSS Link has expired, You need to get a new one!"))